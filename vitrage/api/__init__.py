@@ -29,4 +29,23 @@ OPTS = [
                                                          'noauth',
                                                          'keycloak'},
                help='Authentication mode to use.'),
+    cfg.BoolOpt('shared_graph', default=False,
+                help='If True, the api workers answer queries from a read '
+                     'only snapshot of the entity graph, memory mapped and '
+                     'shared by all of them, instead of holding their own '
+                     'copy of the graph.'),
+    cfg.StrOpt('shared_graph_dir', default='/dev/shm',
+               help='Directory for the shared entity graph snapshots. '
+                    'Should be on a memory backed file system.'),
+    cfg.IntOpt('shared_graph_max_changes', default=10000, min=1,
+               help='Number of entity graph changes after which a new '
+                    'snapshot is shared with the api workers. Until then, '
+                    'each api worker keeps the changes in its memory.'),
+    cfg.BoolOpt('alarm_counts_from_graph', default=False,
+                help='If True, the api workers count the active alarms of '
+                     'their entity graph, by project and severity, as the '
+                     'graph changes, and answer the alarm count requests '
+                     'without querying the database. The alarms are '
+                     'counted by their current severity, while the '
+                     'database has the severity they were raised with.'),
 ]
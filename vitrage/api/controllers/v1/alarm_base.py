@@ -41,6 +41,7 @@ class BaseAlarmsController(RootRestController):
         sort_dirs = kwargs.get('sort_dirs', ['asc', 'asc'])
         filter_by = kwargs.get('filter_by', [])
         filter_vals = kwargs.get('filter_vals', [])
+        filter_ops = kwargs.get('filter_ops', [])
         next_page = kwargs.get('next_page', True)
         marker = kwargs.get('marker')
         only_active_alarms = kwargs.get('only_active_alarms', False)
@@ -65,6 +66,7 @@ class BaseAlarmsController(RootRestController):
                                       sort_dirs=sort_dirs,
                                       filter_by=filter_by,
                                       filter_vals=filter_vals,
+                                      filter_ops=filter_ops,
                                       next_page=next_page,
                                       marker=marker,
                                       only_active_alarms=only_active_alarms
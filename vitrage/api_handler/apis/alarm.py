@@ -26,6 +26,7 @@ from vitrage.datasources.alarm_properties import AlarmProperties as AProps
 from vitrage.entity_graph.mappings.operational_alarm_severity import \
     OperationalAlarmSeverity
 from vitrage.storage import db_time
+from vitrage.storage import history_facade
 
 LOG = log.getLogger(__name__)
 
@@ -34,10 +35,11 @@ LOG = log.getLogger(__name__)
                     info={}, hide_args=False, trace_private=False)
 class AlarmApis(EntityGraphApisBase):
 
-    def __init__(self, entity_graph, conf, db):
+    def __init__(self, entity_graph, conf, db, alarms_counter=None):
         self.entity_graph = entity_graph
         self.conf = conf
         self.db = db
+        self.alarms_counter = alarms_counter
 
     def get_alarms(self, ctx, vitrage_id, all_tenants, *args, **kwargs):
 
@@ -50,8 +52,13 @@ class AlarmApis(EntityGraphApisBase):
                 kwargs['is_admin_project'] = \
                     ctx.get(TenantProps.IS_ADMIN, False)
         else:
-            kwargs.get('filter_by', []).append(VProps.VITRAGE_RESOURCE_ID)
-            kwargs.get('filter_vals', []).append(vitrage_id)
+            filter_by = kwargs.get('filter_by', [])
+            filter_vals = kwargs.get('filter_vals', [])
+            filter_ops = kwargs.get('filter_ops') or \
+                [history_facade.CONTAINS] * len(filter_by)
+            kwargs['filter_by'] = filter_by + [VProps.VITRAGE_RESOURCE_ID]
+            kwargs['filter_vals'] = filter_vals + [vitrage_id]
+            kwargs['filter_ops'] = filter_ops + [history_facade.EQ]
 
         alarms = self._get_alarms(*args, **kwargs)
         return json.dumps({'alarms': [v.payload for v in alarms]})
@@ -60,7 +67,7 @@ class AlarmApis(EntityGraphApisBase):
     def show_alarm(self, ctx, vitrage_id):
         LOG.debug('Show alarm with vitrage_id: %s', vitrage_id)
 
-        alarm = self.entity_graph.get_vertex(vitrage_id)
+        alarm = self.entity_graph.get_vertex(vitrage_id, read_only=True)
         if not alarm or alarm.get(VProps.VITRAGE_CATEGORY) != ECategory.ALARM:
             LOG.warning('Alarm show - Not found (%s)', vitrage_id)
             return None
@@ -80,11 +87,16 @@ class AlarmApis(EntityGraphApisBase):
         project_id = ctx.get(TenantProps.TENANT, None)
         is_admin_project = ctx.get(TenantProps.IS_ADMIN, False)
 
+        if self.alarms_counter:
+            count_active_alarms = self.alarms_counter.count
+        else:
+            count_active_alarms = self.db.history_facade.count_active_alarms
+
         if all_tenants:
-            counts = self.db.history_facade.count_active_alarms()
+            counts = count_active_alarms()
 
         else:
-            counts = self.db.history_facade.count_active_alarms(
+            counts = count_active_alarms(
                 project_id=project_id,
                 is_admin_project=is_admin_project)
 
@@ -139,5 +151,80 @@ class AlarmApis(EntityGraphApisBase):
         if kwargs.get('filter_vals') and type(
                 kwargs.get('filter_vals')) != list:
             kwargs['filter_vals'] = [kwargs.get('filter_vals')]
+        if kwargs.get('filter_ops') and type(kwargs.get('filter_ops')) != list:
+            kwargs['filter_ops'] = [kwargs.get('filter_ops')]
 
         return kwargs
+
+
+class ActiveAlarmsCounter(object):
+    """Counts the active alarms of the entity graph
+
+    The alarms are counted by their project, resource project and severity,
+    and the counts are updated with every alarm vertex change, so they are
+    read without a database query.
+    """
+
+    SEVERITIES = (OperationalAlarmSeverity.SEVERE,
+                  OperationalAlarmSeverity.CRITICAL,
+                  OperationalAlarmSeverity.WARNING,
+                  OperationalAlarmSeverity.OK,
+                  OperationalAlarmSeverity.NA)
+
+    def __init__(self, entity_graph):
+        self._counts = {}
+        self.reset(entity_graph)
+
+    def reset(self, entity_graph):
+        """Count the active alarms of the graph anew"""
+        self._counts = {}
+        for alarm in entity_graph.get_vertices(
+                vertex_attr_filter={VProps.VITRAGE_CATEGORY: ECategory.ALARM}):
+            self._add(alarm, 1)
+
+    def update(self, before, current):
+        """Update the counts with a change of a vertex
+
+        :param before: the vertex before the change, or None
+        :param current: the vertex after the change, or None
+        """
+        self._add(before, -1)
+        self._add(current, 1)
+
+    def count(self, project_id=None, is_admin_project=False):
+        """Same counts as HistoryFacadeConnection.count_active_alarms"""
+        counts = {severity: 0 for severity in self.SEVERITIES}
+        # the counts may change while iterating, by the graph updates thread
+        for (alarm_project, resource_project, severity), count in \
+                list(self._counts.items()):
+            if severity in counts and self._is_project_alarm(
+                    project_id, is_admin_project,
+                    alarm_project, resource_project):
+                counts[severity] += count
+        return counts
+
+    def _add(self, vertex, count):
+        if not vertex or \
+                vertex.get(VProps.VITRAGE_CATEGORY) != ECategory.ALARM or \
+                vertex.get(VProps.VITRAGE_IS_DELETED, False) or \
+                vertex.get(VProps.VITRAGE_IS_PLACEHOLDER, False):
+            return
+        key = (vertex.get(VProps.PROJECT_ID),
+               vertex.get(VProps.VITRAGE_RESOURCE_PROJECT_ID),
+               vertex.get(VProps.VITRAGE_OPERATIONAL_SEVERITY))
+        count += self._counts.get(key, 0)
+        if count:
+            self._counts[key] = count
+        else:
+            del self._counts[key]
+
+    @staticmethod
+    def _is_project_alarm(project_id, is_admin_project,
+                          alarm_project, resource_project):
+        if not project_id:
+            return True
+        if project_id in (alarm_project, resource_project):
+            return True
+        # alarms with no project are of the admin project
+        return is_admin_project and \
+            alarm_project is None and resource_project is None
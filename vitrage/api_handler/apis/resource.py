@@ -54,14 +54,15 @@ class ResourceApis(EntityGraphApisBase):
             type_query = {'==': {VProps.VITRAGE_TYPE: resource_type}}
             query['and'].append(type_query)
 
-        resources = self.entity_graph.get_vertices(query_dict=query)
+        resources = self.entity_graph.get_vertices(query_dict=query,
+                                                   read_only=True)
         return json.dumps({'resources': [resource.properties
                                          for resource in resources]})
 
     def show_resource(self, ctx, vitrage_id):
 
         LOG.debug('Show resource with vitrage_id: %s', vitrage_id)
-        resource = self.entity_graph.get_vertex(vitrage_id)
+        resource = self.entity_graph.get_vertex(vitrage_id, read_only=True)
         if not resource or resource.get(VProps.VITRAGE_CATEGORY) != \
                 EntityCategory.RESOURCE:
             LOG.warning('Resource show - Not found (%s)', vitrage_id)
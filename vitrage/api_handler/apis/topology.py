@@ -156,12 +156,14 @@ class TopologyApis(EntityGraphApisBase):
         :type is_admin_project: boolean
         """
 
-        for alarm in graph.get_vertices(query_dict=ALARMS_ALL_QUERY):
+        for alarm in graph.get_vertices(query_dict=ALARMS_ALL_QUERY,
+                                        read_only=True):
             if not alarm.get(VProps.PROJECT_ID, None):
                 cat_filter = {VProps.VITRAGE_CATEGORY: EntityCategory.RESOURCE}
                 resource_neighbors = \
                     self.entity_graph.neighbors(alarm.vertex_id,
-                                                vertex_attr_filter=cat_filter)
+                                                vertex_attr_filter=cat_filter,
+                                                read_only=True)
                 if len(resource_neighbors) > 0:
                     resource_proj_id = \
                         resource_neighbors[0].get(VProps.PROJECT_ID, None)
@@ -195,7 +197,7 @@ class TopologyApis(EntityGraphApisBase):
         entities = []
 
         root_vertex = \
-            self.entity_graph.get_vertex(root)
+            self.entity_graph.get_vertex(root, read_only=True)
 
         local_connected_component_subgraphs = \
             ga.connected_component_subgraphs(subgraph)
@@ -214,7 +216,8 @@ class TopologyApis(EntityGraphApisBase):
 
     def _default_root_id(self):
         tmp_vertices = self.entity_graph.get_vertices(
-            vertex_attr_filter={VProps.VITRAGE_TYPE: OPENSTACK_CLUSTER})
+            vertex_attr_filter={VProps.VITRAGE_TYPE: OPENSTACK_CLUSTER},
+            read_only=True)
         if not tmp_vertices:
             LOG.debug("No root vertex found")
             return None
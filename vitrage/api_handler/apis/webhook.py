@@ -19,8 +19,10 @@ from oslo_utils import uuidutils
 from osprofiler import profiler
 import re
 from six.moves.urllib.parse import urlparse
+from vitrage.common.constants import NotifierEventTypes
 from vitrage.common.constants import TenantProps
 from vitrage.common.constants import VertexProperties as Vprops
+from vitrage.messaging import VitrageNotifier
 from vitrage.notifier.plugins.webhook.utils import db_row_to_dict
 from vitrage import storage
 from vitrage.storage.sqlalchemy.models import Webhooks
@@ -38,6 +40,12 @@ class WebhookApis(object):
     def __init__(self, conf):
         self.conf = conf
         self.db_conn = storage.get_connection_from_config(conf)
+        self._notifier = None
+        # the webhook notifier caches the webhooks, until notified that
+        # they changed
+        if conf.notifiers and conf.entity_graph.notifier_topic:
+            self._notifier = VitrageNotifier(
+                conf, 'vitrage.api', [conf.entity_graph.notifier_topic])
 
     def delete_webhook(self, ctx, id):
 
@@ -47,6 +55,7 @@ class WebhookApis(object):
         deleted_rows_count = self.db_conn.webhooks.delete(id)
 
         if deleted_rows_count == self.DELETED_ROWS_SUCCESS:
+            self._notify_webhooks_changed(id)
             return {'SUCCESS': 'Webhook %s deleted' % id}
         else:
             return None
@@ -71,6 +80,7 @@ class WebhookApis(object):
         try:
             db_row = self._webhook_to_db_row(url, headers, regex_filter, ctx)
             self.db_conn.webhooks.create(db_row)
+            self._notify_webhooks_changed(db_row.id)
             return db_row_to_dict(db_row)
         except Exception as e:
             LOG.exception("Failed to add webhook to DB: %s", str(e))
@@ -96,6 +106,11 @@ class WebhookApis(object):
             LOG.exception("Failed to get webhook: %s", str(e))
             return {"ERROR": str(e)}
 
+    def _notify_webhooks_changed(self, id):
+        if self._notifier:
+            self._notifier.notify(NotifierEventTypes.CHANGE_IN_WEBHOOKS_EVENT,
+                                  {'id': id})
+
     def _webhook_to_db_row(self, url, headers, regex_filter, ctx):
         if not regex_filter:
             regex_filter = ""
@@ -26,6 +26,7 @@ class VertexProperties(ElementProperties):
     VITRAGE_STATE = 'vitrage_state'
     VITRAGE_IS_PLACEHOLDER = 'vitrage_is_placeholder'
     VITRAGE_SAMPLE_TIMESTAMP = 'vitrage_sample_timestamp'
+    VITRAGE_SAMPLE_TIMESTAMP_NS = 'vitrage_sample_timestamp_ns'
     VITRAGE_AGGREGATED_STATE = 'vitrage_aggregated_state'
     VITRAGE_OPERATIONAL_STATE = 'vitrage_operational_state'
     VITRAGE_AGGREGATED_SEVERITY = 'vitrage_aggregated_severity'
@@ -129,6 +130,7 @@ class NotifierEventTypes(object):
     EXECUTE_EXTERNAL_ACTION = 'vitrage.execute_external_action'
     ACTIVATE_CAUSAL_RELATION = 'vitrage.causal_relationship.activate'
     DEACTIVATE_CAUSAL_RELATION = 'vitrage.causal_relationship.deactivate'
+    CHANGE_IN_WEBHOOKS_EVENT = 'vitrage.webhook.change'
 
 
 class TemplateTopologyFields(object):
@@ -46,6 +46,11 @@ OPTS = [
                min=1,
                help='Time to wait until retrying to snapshot the datasource'
                     ' in case of fault'),
+    cfg.IntOpt('get_all_threads',
+               default=10,
+               min=1,
+               help='Number of data sources that are queried concurrently '
+                    'during a snapshot of all the data sources'),
     cfg.ListOpt('notification_topics',
                 default=['vitrage_notifications'],
                 help='Vitrage configured notifications topic',
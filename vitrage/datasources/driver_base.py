@@ -55,40 +55,43 @@ class DriverBase(object):
 
     @classmethod
     def make_pickleable(cls, entities, entity_type, datasource_action, *args):
-        pickleable_entities = cls.make_pickleable_without_end_msg(
-            entities, entity_type, datasource_action, *args)
-
-        if datasource_action == DatasourceAction.INIT_SNAPSHOT:
-            pickleable_entities.append(cls._get_end_message(entity_type))
-
-        return pickleable_entities
+        return list(cls.make_pickleable_iter(
+            entities, entity_type, datasource_action, *args))
 
     @classmethod
     def make_pickleable_without_end_msg(cls, entities, entity_type,
                                         datasource_action, *args):
-        pickleable_entities = []
-        for entity in entities:
-            for field in args:
-                entity.pop(field, None)
-
-            cls._add_entity_type(entity, entity_type)
-            cls._add_datasource_action(entity, datasource_action)
-            cls._add_sampling_time(entity)
-            entity[VProps.VITRAGE_DATASOURCE_NAME] = cls._datasource_name
-            pickleable_entities.append(entity)
-        return pickleable_entities
+        return [cls._make_pickleable_entity(
+                entity, entity_type, datasource_action, *args)
+                for entity in entities]
 
     @classmethod
     def make_pickleable_iter(cls, entities, entity_type,
                              datasource_action, *args):
+        """Same as make_pickleable, but yields one entity at a time
+
+        A driver can return it from get_all with entities that are fetched
+        lazily, e.g. page by page, so they are processed as they arrive
+        without holding all of them in memory.
+        """
         for entity in entities:
-            for field in args:
-                entity.pop(field, None)
+            yield cls._make_pickleable_entity(
+                entity, entity_type, datasource_action, *args)
+
+        if datasource_action == DatasourceAction.INIT_SNAPSHOT:
+            yield cls._get_end_message(entity_type)
+
+    @classmethod
+    def _make_pickleable_entity(cls, entity, entity_type,
+                                datasource_action, *args):
+        for field in args:
+            entity.pop(field, None)
 
-            cls._add_entity_type(entity, entity_type)
-            cls._add_datasource_action(entity, datasource_action)
-            cls._add_sampling_time(entity)
-            yield entity
+        cls._add_entity_type(entity, entity_type)
+        cls._add_datasource_action(entity, datasource_action)
+        cls._add_sampling_time(entity)
+        entity[VProps.VITRAGE_DATASOURCE_NAME] = cls._datasource_name
+        return entity
 
     @staticmethod
     def _add_entity_type(entity, entity_type):
@@ -115,6 +118,18 @@ class DriverBase(object):
 
         pass
 
+    def set_graph(self, graph):
+        """Give the driver read access to the entity graph
+
+        Called in the process of the entity graph, for the push drivers,
+        while no event is processed. The graph keeps changing while the
+        events are enriched, so a driver should not read it afterwards; it
+        can subscribe to the graph changes instead.
+        :param graph: the entity graph
+        """
+
+        pass
+
     @staticmethod
     def get_event_types():
         """Return a list of all event types relevant to this datasource
@@ -43,14 +43,19 @@ class PortDriver(NeutronBase):
         return ['manager', '_info']
 
     def get_all(self, datasource_action):
-        ports = self.client.list_ports()['ports']
-        ports = [p for p in ports if 'compute' in p.get('device_owner', '')]
-        return self.make_pickleable(
-            ports,
+        return self.make_pickleable_iter(
+            self._list_compute_ports(),
             NEUTRON_PORT_DATASOURCE,
             datasource_action,
             *self.properties_to_filter_out())
 
+    def _list_compute_ports(self):
+        """Yield the compute ports, one page of ports at a time"""
+        for page in self.client.list_ports(retrieve_all=False):
+            for port in page['ports']:
+                if 'compute' in port.get('device_owner', ''):
+                    yield port
+
     @staticmethod
     def should_delete_outdated_entities():
         return True
@@ -36,4 +36,9 @@ OPTS = [
                     'Push: updates by getting notifications from the'
                     ' datasource itself.',
                required=True),
+    cfg.IntOpt('page_size',
+               default=1000,
+               min=1,
+               help='Number of instances that are fetched from nova in a '
+                    'single request during get_all'),
 ]
@@ -30,13 +30,27 @@ class InstanceDriver(NovaDriverBase):
         return events
 
     def get_all(self, datasource_action):
-        return self.make_pickleable(
-            self.extract_events(self.client.servers.list(
-                search_opts={'all_tenants': 1})),
+        return self.make_pickleable_iter(
+            self._list_all_instances(),
             NOVA_INSTANCE_DATASOURCE,
             datasource_action,
             *self.properties_to_filter_out())
 
+    def _list_all_instances(self):
+        """Yield the events of all instances, one page at a time"""
+        page_size = self.conf[NOVA_INSTANCE_DATASOURCE].page_size
+        marker = None
+        while True:
+            instances = self.client.servers.list(
+                search_opts={'all_tenants': 1},
+                marker=marker,
+                limit=page_size)
+            if not instances:
+                return
+            marker = instances[-1].id
+            for event in self.extract_events(instances):
+                yield event
+
     def enrich_event(self, event, event_type):
         event[DSProps.EVENT_TYPE] = event_type
 
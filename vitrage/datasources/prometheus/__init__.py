@@ -36,4 +36,15 @@ OPTS = [
                     'Push: updates by getting notifications from the'
                     ' datasource itself.',
                required=True),
+    cfg.IntOpt('instance_cache_ttl',
+               default=300,
+               min=0,
+               help='Time in seconds to cache the nova instance id of an '
+                    'alert instance label (an ip or a hostname). 0 disables '
+                    'the cache'),
+    cfg.IntOpt('instance_cache_size',
+               default=10000,
+               min=1,
+               help='Maximal number of alert instance labels whose nova '
+                    'instance id is cached'),
 ]
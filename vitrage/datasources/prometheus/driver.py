@@ -12,13 +12,23 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import defaultdict
 from collections import namedtuple
+from collections import OrderedDict
+import threading
+import time
+
 from oslo_log import log
 
 from vitrage.common.constants import DatasourceAction
 from vitrage.common.constants import DatasourceProperties as DSProps
+from vitrage.common.constants import EdgeLabel
+from vitrage.common.constants import EdgeProperties as EdgeProps
 from vitrage.common.constants import EventProperties as EProps
+from vitrage.common.constants import VertexProperties as VProps
 from vitrage.datasources.alarm_driver_base import AlarmDriverBase
+from vitrage.datasources.neutron.port import NEUTRON_PORT_DATASOURCE
+from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
 from vitrage.datasources.prometheus import PROMETHEUS_DATASOURCE
 from vitrage.datasources.prometheus.properties import get_alarm_update_time
 from vitrage.datasources.prometheus.properties import get_label
@@ -34,6 +44,10 @@ LOG = log.getLogger(__name__)
 
 PROMETHEUS_EVENT_TYPE = 'prometheus.alarm'
 
+# seconds to remember the instance labels that were not found in nova, so
+# that a newly created instance is resolved soon
+UNRESOLVED_INSTANCE_TTL = 30
+
 
 class PrometheusDriver(AlarmDriverBase):
     AlarmKey = namedtuple('AlarmKey', ['alert_name', 'instance'])
@@ -43,6 +57,10 @@ class PrometheusDriver(AlarmDriverBase):
         self.conf = conf
         self._client = None
         self._nova_client = None
+        self._graph_instances = None
+        self._instance_ids = InstanceIdCache(
+            conf.prometheus.instance_cache_ttl,
+            conf.prometheus.instance_cache_size)
 
     @property
     def nova_client(self):
@@ -50,6 +68,11 @@ class PrometheusDriver(AlarmDriverBase):
             self._nova_client = os_clients.nova_client(self.conf)
         return self._nova_client
 
+    def set_graph(self, graph):
+        self._graph_instances = GraphInstances()
+        self._graph_instances.load(graph)
+        graph.subscribe(self._graph_instances.update)
+
     def _vitrage_type(self):
         return PROMETHEUS_DATASOURCE
 
@@ -144,21 +167,14 @@ class PrometheusDriver(AlarmDriverBase):
         alarms = []
         details = event.get(EProps.DETAILS)
         if details:
-            for alarm in details.get(PProps.ALERTS, []):
+            alerts = details.get(PProps.ALERTS, [])
+            instance_ids = self._get_instance_ids(
+                {self._instance_label(alarm) for alarm in alerts})
+            for alarm in alerts:
                 alarm[DSProps.EVENT_TYPE] = event_type
                 alarm[PProps.STATUS] = details[PProps.STATUS]
-                instance_id = get_label(alarm, PLabels.INSTANCE)
-                if ':' in instance_id:
-                    instance_id = instance_id[:instance_id.index(':')]
-
-                # The 'instance' label can be instance ip or hostname.
-                # we try to fetch the instance id from nova by its ip,
-                # and if not found we leave it as it is.
-                nova_instance = self.nova_client.servers.list(
-                    search_opts={'all_tenants': 1, 'ip': instance_id})
-                if nova_instance:
-                    instance_id = nova_instance[0].id
-                alarm[PLabels.INSTANCE_ID] = instance_id
+                alarm[PLabels.INSTANCE_ID] = \
+                    instance_ids[self._instance_label(alarm)]
 
                 old_alarm = self._old_alarm(alarm)
                 alarm = self._filter_and_cache_alarm(
@@ -174,6 +190,173 @@ class PrometheusDriver(AlarmDriverBase):
         return self.make_pickleable(alarms, PROMETHEUS_DATASOURCE,
                                     DatasourceAction.UPDATE)
 
+    @staticmethod
+    def _instance_label(alarm):
+        instance = get_label(alarm, PLabels.INSTANCE)
+        if ':' in instance:
+            instance = instance[:instance.index(':')]
+        return instance
+
+    def _get_instance_ids(self, instances):
+        """The nova instance ids of the alert instance labels
+
+        The 'instance' label can be instance ip or hostname. The instance
+        id is looked up in the entity graph instances, then in the cache,
+        and then in nova by the instance ip. If not found, the label is left
+        as it is.
+        :param instances: the distinct instance labels of the alerts
+        :return: {instance label: instance id}
+        """
+        instance_ids = {}
+        for instance in instances:
+            instance_id = None
+            if self._graph_instances is not None:
+                instance_id = self._graph_instances.get(instance)
+            if instance_id is None:
+                instance_id = self._instance_ids.get(instance)
+            if instance_id is not None:
+                instance_ids[instance] = instance_id
+
+        for instance in instances.difference(instance_ids):
+            nova_instance = self.nova_client.servers.list(
+                search_opts={'all_tenants': 1, 'ip': instance})
+            if nova_instance:
+                instance_ids[instance] = nova_instance[0].id
+                self._instance_ids.put(instance, nova_instance[0].id)
+            else:
+                instance_ids[instance] = instance
+                self._instance_ids.put(instance, instance,
+                                       UNRESOLVED_INSTANCE_TTL)
+        return instance_ids
+
     @staticmethod
     def get_event_types():
         return [PROMETHEUS_EVENT_TYPE]
+
+
+class InstanceIdCache(object):
+    """An LRU cache of instance ids, whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl, max_size):
+        self._ttl = ttl
+        self._max_size = max_size
+        # {key: (expiration time, value)}, from the least recently used
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= time.time():
+                return None
+            self._entries[key] = entry
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        """Cache the value for ttl seconds, or for the cache ttl"""
+        if not self._ttl:
+            return
+        ttl = self._ttl if ttl is None else min(ttl, self._ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+
+class GraphInstances(object):
+    """The nova instance ids of the entity graph, by ip and by name
+
+    Updated by the entity graph changes, in the thread that processes
+    them, so the alerts are enriched without reading the changing graph.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {port vertex id: ips}
+        self._port_ips = {}
+        # {ip: port vertex ids}
+        self._ip_ports = defaultdict(set)
+        # {vertex id: vertex ids}, by the attached edges in both directions
+        self._attached = defaultdict(set)
+        # {instance vertex id: (nova instance id, name)}
+        self._instances = {}
+        # {name: instance vertex ids}
+        self._name_instances = defaultdict(set)
+
+    def load(self, graph):
+        ports = graph.get_vertices(vertex_attr_filter={
+            VProps.VITRAGE_TYPE: NEUTRON_PORT_DATASOURCE})
+        instances = graph.get_vertices(vertex_attr_filter={
+            VProps.VITRAGE_TYPE: NOVA_INSTANCE_DATASOURCE})
+        for vertex in ports + instances:
+            self.update(None, vertex, True, graph)
+        for port in ports:
+            for edge in graph.get_edges(
+                    port.vertex_id,
+                    attr_filter={EdgeProps.RELATIONSHIP_TYPE:
+                                 EdgeLabel.ATTACHED}):
+                self.update(None, edge, False, graph)
+
+    def update(self, before, current, is_vertex, graph):
+        element = current if current is not None else before
+        with self._lock:
+            if is_vertex:
+                self._update_vertex(element.vertex_id, current)
+            elif element.label == EdgeLabel.ATTACHED:
+                self._update_edge(element.source_id, element.target_id,
+                                  current)
+
+    def _update_vertex(self, vertex_id, current):
+        for ip in self._port_ips.pop(vertex_id, ()):
+            self._ip_ports[ip].discard(vertex_id)
+            if not self._ip_ports[ip]:
+                del self._ip_ports[ip]
+        instance = self._instances.pop(vertex_id, None)
+        if instance:
+            self._name_instances[instance[1]].discard(vertex_id)
+            if not self._name_instances[instance[1]]:
+                del self._name_instances[instance[1]]
+        if current is None:
+            for neighbor_id in self._attached.pop(vertex_id, ()):
+                self._attached[neighbor_id].discard(vertex_id)
+            return
+
+        if current.get(VProps.VITRAGE_IS_DELETED):
+            return
+        vitrage_type = current.get(VProps.VITRAGE_TYPE)
+        if vitrage_type == NEUTRON_PORT_DATASOURCE:
+            ips = set(current.get('ip_addresses') or ())
+            self._port_ips[vertex_id] = ips
+            for ip in ips:
+                self._ip_ports[ip].add(vertex_id)
+        elif vitrage_type == NOVA_INSTANCE_DATASOURCE and \
+                current.get(VProps.ID):
+            name = current.get(VProps.NAME)
+            self._instances[vertex_id] = (current.get(VProps.ID), name)
+            self._name_instances[name].add(vertex_id)
+
+    def _update_edge(self, source_id, target_id, current):
+        if current is not None and \
+                not current.get(EdgeProps.VITRAGE_IS_DELETED):
+            self._attached[source_id].add(target_id)
+            self._attached[target_id].add(source_id)
+        else:
+            self._attached[source_id].discard(target_id)
+            self._attached[target_id].discard(source_id)
+
+    def get(self, instance):
+        """The nova instance id of an instance ip or a unique name"""
+        with self._lock:
+            instance_ids = sorted(
+                self._instances[vertex_id][0]
+                for port_id in self._ip_ports.get(instance, ())
+                for vertex_id in self._attached.get(port_id, ())
+                if vertex_id in self._instances)
+            if instance_ids:
+                return instance_ids[0]
+            # a name of several instances is looked up by ip in nova
+            named = self._name_instances.get(instance, ())
+            if len(named) == 1:
+                return self._instances[next(iter(named))][0]
+            return None
@@ -14,8 +14,10 @@
 # under the License.
 
 import abc
+import binascii
 from collections import namedtuple
 import six
+import uuid
 
 from oslo_log import log as logging
 from oslo_utils import uuidutils
@@ -50,6 +52,92 @@ AVAILABLE = 'available'
 CLUSTER_ID = 'OpenStack Cluster'
 
 
+class KeyToUuidCache(object):
+    """The vitrage ids of the entities, by the md5 of their entity keys
+
+    Both directions are kept, so a vitrage id is removed without scanning the
+    cache. With compact=True, the md5 keys and the uuids are stored as 16
+    bytes binary strings instead of their text forms.
+    """
+
+    def __init__(self, compact=False):
+        self.compact = compact
+        self._uuids = {}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._uuids)
+
+    def __contains__(self, key):
+        return self._encode_key(key) in self._uuids
+
+    def get(self, key):
+        vitrage_id = self._uuids.get(self._encode_key(key))
+        return self._decode_uuid(vitrage_id) if vitrage_id else None
+
+    def put(self, key, vitrage_id):
+        key = self._encode_key(key)
+        vitrage_id = self._encode_uuid(vitrage_id)
+        old_id = self._uuids.get(key)
+        if old_id is not None:
+            self._keys.pop(old_id, None)
+        self._uuids[key] = vitrage_id
+        self._keys[vitrage_id] = key
+
+    def delete_uuid(self, vitrage_id):
+        key = self._keys.pop(self._encode_uuid(vitrage_id), None)
+        if key is not None:
+            del self._uuids[key]
+
+    def clear(self):
+        self._uuids.clear()
+        self._keys.clear()
+
+    def set_compact(self, compact):
+        key_to_uuid = self.dump()
+        self.compact = compact
+        self.load(key_to_uuid)
+
+    def dump(self):
+        """The cache as a dict of md5 key to vitrage id"""
+        return {self._decode_key(key): self._decode_uuid(vitrage_id)
+                for key, vitrage_id in self._uuids.items()}
+
+    def load(self, key_to_uuid):
+        self.clear()
+        for key, vitrage_id in key_to_uuid.items():
+            self.put(key, vitrage_id)
+
+    def _encode_key(self, key):
+        if self.compact and len(key) == 32:
+            try:
+                return binascii.unhexlify(key)
+            except (TypeError, ValueError):
+                pass
+        return key
+
+    @staticmethod
+    def _decode_key(key):
+        if isinstance(key, bytes) and len(key) == 16:
+            key = binascii.hexlify(key)
+            return key if six.PY2 else key.decode('ascii')
+        return key
+
+    def _encode_uuid(self, vitrage_id):
+        if self.compact and len(vitrage_id) == 36:
+            try:
+                return uuid.UUID(vitrage_id).bytes
+            except ValueError:
+                pass
+        return vitrage_id
+
+    @staticmethod
+    def _decode_uuid(vitrage_id):
+        if isinstance(vitrage_id, bytes) and len(vitrage_id) == 16:
+            return str(uuid.UUID(bytes=vitrage_id))
+        return vitrage_id
+
+
 def extract_field_value(entity_event, *args):
     try:
         value = entity_event
@@ -107,7 +195,7 @@ class TransformerBase(object):
     # graph actions which need to refer them differently
     GRAPH_ACTION_MAPPING = {}
 
-    key_to_uuid_cache = {}
+    key_to_uuid_cache = KeyToUuidCache()
 
     def __init__(self, transformers, conf):
         self.conf = conf
@@ -182,16 +270,13 @@ class TransformerBase(object):
         new_uuid = cls.key_to_uuid_cache.get(old_vitrage_id)
         if not new_uuid:
             new_uuid = uuidutils.generate_uuid()
-            cls.key_to_uuid_cache[old_vitrage_id] = new_uuid
+            cls.key_to_uuid_cache.put(old_vitrage_id, new_uuid)
 
         return new_uuid
 
     @classmethod
     def _delete_id_from_cache(cls, vitrage_id):
-        for key, value in cls.key_to_uuid_cache.items():
-            if value == vitrage_id:
-                del cls.key_to_uuid_cache[key]
-                break
+        cls.key_to_uuid_cache.delete_uuid(vitrage_id)
 
     @abc.abstractmethod
     def _create_snapshot_entity_vertex(self, entity_event):
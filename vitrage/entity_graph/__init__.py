@@ -30,6 +30,18 @@ OPTS = [
     cfg.StrOpt('graph_driver',
                default='networkx',
                help='graph driver implementation class'),
+    cfg.IntOpt('events_batch_size',
+               default=100,
+               min=1,
+               help='Maximal number of datasource events that are processed '
+                    'together. The graph changes of a batch are sent to the '
+                    'graph workers at once, and evaluator events are handled '
+                    'between the batches.'),
+    cfg.BoolOpt('compact_ids_cache',
+                default=False,
+                help='Keep the cache of the entity keys to vitrage ids in a '
+                     'binary form, which takes less memory, at the cost of '
+                     'converting the ids on every lookup.'),
 ]
 
 EVALUATOR_TOPIC = 'vitrage.evaluator'
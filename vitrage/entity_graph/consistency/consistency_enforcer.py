@@ -29,6 +29,7 @@ from vitrage.entity_graph import EVALUATOR_TOPIC
 from vitrage.evaluator.actions.evaluator_event_transformer \
     import VITRAGE_DATASOURCE
 from vitrage.messaging import VitrageNotifier
+from vitrage.utils.datetime import timestamp_ns
 from vitrage.utils.datetime import utcnow
 
 LOG = log.getLogger(__name__)
@@ -73,12 +74,12 @@ class ConsistencyEnforcer(object):
             LOG.exception('Error in deleting vertices from entity_graph.')
 
     def _find_outdated_entities_to_mark_as_deleted(self):
-        vitrage_sample_tstmp = str(utcnow() - timedelta(
+        sample_time = timestamp_ns(utcnow() - timedelta(
             seconds=2 * self.conf.datasources.snapshots_interval))
         query = {
             'and': [
                 {'!=': {VProps.VITRAGE_TYPE: VITRAGE_DATASOURCE}},
-                {'<': {VProps.VITRAGE_SAMPLE_TIMESTAMP: vitrage_sample_tstmp}},
+                {'<': {VProps.VITRAGE_SAMPLE_TIMESTAMP_NS: sample_time}},
                 {'==': {VProps.VITRAGE_IS_DELETED: False}},
             ]
         }
@@ -87,12 +88,12 @@ class ConsistencyEnforcer(object):
         return set(self._filter_vertices_to_be_marked_as_deleted(vertices))
 
     def _find_old_deleted_entities(self):
-        vitrage_sample_tstmp = str(utcnow() - timedelta(
+        sample_time = timestamp_ns(utcnow() - timedelta(
             seconds=self.conf.consistency.min_time_to_delete))
         query = {
             'and': [
                 {'==': {VProps.VITRAGE_IS_DELETED: True}},
-                {'<': {VProps.VITRAGE_SAMPLE_TIMESTAMP: vitrage_sample_tstmp}}
+                {'<': {VProps.VITRAGE_SAMPLE_TIMESTAMP_NS: sample_time}}
             ]
         }
 
@@ -12,11 +12,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import time
 
 from oslo_log import log
 import oslo_messaging
+from six.moves import queue
 
 from vitrage.common.constants import DatasourceAction
 from vitrage.datasources import utils
@@ -24,6 +26,12 @@ from vitrage import messaging
 
 LOG = log.getLogger(__name__)
 
+# number of events of a streaming data source that are fetched ahead of
+# their processing
+STREAM_BUFFER_SIZE = 1000
+
+_END = object()
+
 
 class DriverExec(object):
 
@@ -33,28 +41,90 @@ class DriverExec(object):
         self.persist = persist
 
     def snapshot_get_all(self, action=DatasourceAction.INIT_SNAPSHOT):
+        """Get all the entities of all the data sources
+
+        The data sources are queried concurrently, while their events are
+        processed one data source at a time, in the calling thread, in the
+        order in which the data sources started returning them.
+        """
         driver_names = self.conf.datasources.types
         LOG.info('get_all starting for %s', driver_names)
         t1 = time.time()
         events_count = 0
-        for d in driver_names:
-            events_count += self.get_all(d, action)
+        fetched = queue.Queue()
+        threads = min(self.conf.datasources.get_all_threads,
+                      len(driver_names)) or 1
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for d in driver_names:
+                executor.submit(self._fetch_all, d, action, fetched)
+            for _ in driver_names:
+                driver_name, events = fetched.get()
+                if events is not None:
+                    events_count += self._process_all(driver_name, events)
         LOG.info('get_all and processing took %s for %s events',
                  time.time() - t1, events_count)
         self.persist.store_graph()
 
     def get_all(self, driver_name, action):
+        LOCK_BY_DRIVER.acquire(driver_name)
+        try:
+            driver = utils.get_drivers_by_name(self.conf, [driver_name])[0]
+            LOG.info("run driver get_all: %s", driver_name)
+            events = driver.get_all(action)
+        except Exception:
+            LOG.exception("run driver get_all: %s Failed", driver_name)
+            LOCK_BY_DRIVER.release(driver_name)
+            return 0
+        return self._process_all(driver_name, events)
+
+    def _fetch_all(self, driver_name, action, fetched):
+        """Run the driver get_all, holding the driver lock
+
+        The events are put on the fetched queue. If the driver returns a
+        generator, it is consumed here into a bounded buffer, and the
+        processing thread reads the events from the buffer.
+
+        The lock is released by _process_all, once the events were
+        processed, or here if the driver failed.
+        """
+        LOCK_BY_DRIVER.acquire(driver_name)
         try:
-            LOCK_BY_DRIVER.acquire(driver_name)
             driver = utils.get_drivers_by_name(self.conf, [driver_name])[0]
             LOG.info("run driver get_all: %s", driver_name)
             events = driver.get_all(action)
+            if isinstance(events, (list, tuple)):
+                fetched.put((driver_name, events))
+                return
+            events = iter(events)
+            first = next(events, _END)
+        except Exception:
+            LOG.exception("run driver get_all: %s Failed", driver_name)
+            LOCK_BY_DRIVER.release(driver_name)
+            fetched.put((driver_name, None))
+            return
+
+        buffer = queue.Queue(maxsize=STREAM_BUFFER_SIZE)
+        fetched.put((driver_name, _iter_buffer(first, buffer)))
+        try:
+            if first is not _END:
+                for event in events:
+                    buffer.put(event)
+        except Exception:
+            LOG.exception("run driver get_all: %s Failed", driver_name)
+        finally:
+            buffer.put(_END)
+
+    def _process_all(self, driver_name, events):
+        try:
             count = self.process_output_func(events)
             LOG.info("run driver get_all: %s done (%s events)",
                      driver_name, count)
             return count
         except Exception:
             LOG.exception("run driver get_all: %s Failed", driver_name)
+            # a streaming driver waits for its events to be consumed
+            for _ in events:
+                pass
         finally:
             LOCK_BY_DRIVER.release(driver_name)
         return 0
@@ -79,17 +149,27 @@ class DriverExec(object):
         return 0
 
 
+def _iter_buffer(first, buffer):
+    event = first
+    while event is not _END:
+        yield event
+        event = buffer.get()
+
+
 class DriversNotificationEndpoint(object):
 
-    def __init__(self, conf, processor_func):
+    def __init__(self, conf, processor_func, graph=None):
         self._conf = conf
         self._processor_func = processor_func
+        self._graph = graph
         self._enrich_event_methods = defaultdict(list)
 
     def init(self):
         driver_names = utils.get_push_drivers_names(self._conf)
         push_drivers = utils.get_drivers_by_name(self._conf, driver_names)
         for driver in push_drivers:
+            if self._graph is not None:
+                driver.set_graph(self._graph)
             for event in driver.get_event_types():
                 self._enrich_event_methods[event].append(driver.enrich_event)
         return self
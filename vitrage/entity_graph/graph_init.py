@@ -11,6 +11,7 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+from itertools import islice
 import threading
 import time
 
@@ -26,9 +27,9 @@ from vitrage.entity_graph.graph_persistency import GraphPersistency
 from vitrage.entity_graph.processor.notifier import GraphNotifier
 from vitrage.entity_graph.processor.notifier import PersistNotifier
 from vitrage.entity_graph.processor.processor import Processor
+from vitrage.entity_graph.processor import processor_utils as PUtils
 from vitrage.entity_graph.scheduler import Scheduler
 from vitrage.entity_graph.workers import GraphWorkersManager
-from vitrage.graph.driver.networkx_graph import NXGraph
 from vitrage import messaging
 
 
@@ -41,8 +42,15 @@ class VitrageGraphInit(object):
         self.graph = graph
         self.db = db_connection
         self.workers = GraphWorkersManager(conf, graph, db_connection)
-        self.events_coordination = EventsCoordination(conf, self.process_event)
+        self.events_coordination = EventsCoordination(
+            conf,
+            self.process_event,
+            self.process_events,
+            conf.entity_graph.events_batch_size,
+            graph)
         self.persist = GraphPersistency(conf, db_connection, graph)
+        TransformerBase.key_to_uuid_cache.set_compact(
+            conf.entity_graph.compact_ids_cache)
         self.driver_exec = driver_exec.DriverExec(
             self.conf,
             self.events_coordination.handle_multiple_low_priority,
@@ -62,11 +70,12 @@ class VitrageGraphInit(object):
     def _restart_from_stored_graph(self, graph_snapshot):
         LOG.info('Initializing graph from database snapshot (%sKb)',
                  len(graph_snapshot.graph_snapshot) / 1024)
-        NXGraph.read_gpickle(graph_snapshot.graph_snapshot, self.graph)
-        self.persist.replay_events(self.graph, graph_snapshot.event_id)
-        self._recreate_transformers_id_cache()
+        event_id = self.persist.load_graph(graph_snapshot, self.graph)
+        self.persist.replay_events(self.graph, event_id)
+        self._add_missing_sample_timestamps_ns()
         LOG.info("%s vertices loaded", self.graph.num_vertices())
         self.subscribe_presist_notifier()
+        self.persist.track_changes()
         spawn(self._start_all_workers, is_snapshot=True)
 
     def _start_from_scratch(self):
@@ -76,6 +85,7 @@ class VitrageGraphInit(object):
         LOG.info('Disabling previously active alarms')
         self.db.history_facade.disable_alarms_in_history()
         self.subscribe_presist_notifier()
+        self.persist.track_changes()
         self.driver_exec.snapshot_get_all()
         LOG.info("%s vertices loaded", self.graph.num_vertices())
         spawn(self._start_all_workers, is_snapshot=False)
@@ -91,20 +101,38 @@ class VitrageGraphInit(object):
         self.events_coordination.start()
 
     def process_event(self, event):
-        if event.get('template_action'):
-            self.workers.submit_template_event(event)
-            self.workers.submit_evaluators_reload_templates()
-        else:
-            self.processor.process_event(event)
+        self.process_events([event])
+
+    def process_events(self, events):
+        """Process a batch of events, notifying the workers once
+
+        The graph changes of all the events are sent to the graph workers
+        together, after the last event of the batch was processed.
+        """
+        try:
+            for event in events:
+                if event.get('template_action'):
+                    # the workers should see the graph as it is so far
+                    self.workers.flush_graph_updates()
+                    self.workers.submit_template_event(event)
+                    self.workers.submit_evaluators_reload_templates()
+                    continue
+                try:
+                    self.processor.process_event(event)
+                except Exception:
+                    LOG.exception('Got Exception for event %s', str(event))
+        finally:
+            self.persist.flush_events()
+            self.workers.flush_graph_updates()
 
-    def _recreate_transformers_id_cache(self):
+    def _add_missing_sample_timestamps_ns(self):
+        """Graphs stored by older versions have only string sample times"""
         for v in self.graph.get_vertices():
-            if not v.get(VProps.VITRAGE_CACHED_ID):
-                LOG.warning("Missing vitrage_cached_id in the vertex. "
-                            "Vertex is not added to the ID cache %s", str(v))
-            else:
-                TransformerBase.key_to_uuid_cache[v[VProps.VITRAGE_CACHED_ID]]\
-                    = v.vertex_id
+            if v.get(VProps.VITRAGE_SAMPLE_TIMESTAMP_NS) is None and \
+                    v.get(VProps.VITRAGE_SAMPLE_TIMESTAMP):
+                v[VProps.VITRAGE_SAMPLE_TIMESTAMP_NS] = \
+                    PUtils.get_sample_timestamp_ns(v)
+                self.graph.update_vertex(v)
 
     def _add_graph_subscriptions(self):
         self.graph.subscribe(self.workers.submit_graph_update)
@@ -122,10 +150,15 @@ PRIORITY_DELAY = 0.05
 
 
 class EventsCoordination(object):
-    def __init__(self, conf, do_work_func):
+    def __init__(self, conf, do_work_func, do_batch_func=None, batch_size=1,
+                 graph=None):
         self._conf = conf
+        self._graph = graph
         self._lock = threading.Lock()
         self._high_event_finish_time = 0
+        self._high_events_waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._batch_size = batch_size
 
         def do_work(event):
             try:
@@ -133,15 +166,30 @@ class EventsCoordination(object):
             except Exception:
                 LOG.exception('Got Exception for event %s', str(event))
 
+        def do_batch(events):
+            if not do_batch_func:
+                for event in events:
+                    do_work(event)
+                return
+            try:
+                return do_batch_func(events)
+            except Exception:
+                LOG.exception('Got Exception for a batch of %s events',
+                              len(events))
+
         self._do_work_func = do_work
+        self._do_batch_func = do_batch
 
         self._low_pri_listener = None
         self._high_pri_listener = None
 
     def start(self):
-        self._low_pri_listener = driver_exec.DriversNotificationEndpoint(
-            self._conf,
-            self.handle_multiple_low_priority).init().get_listener()
+        # the drivers get the graph while no event is processed
+        with self._lock:
+            self._low_pri_listener = driver_exec.DriversNotificationEndpoint(
+                self._conf,
+                self.handle_multiple_low_priority,
+                self._graph).init().get_listener()
         self._high_pri_listener = self._init_listener(
             EVALUATOR_TOPIC,
             self._do_high_priority_work)
@@ -159,27 +207,46 @@ class EventsCoordination(object):
         self._high_pri_listener.wait()
 
     def _do_high_priority_work(self, event):
+        with self._waiting_lock:
+            self._high_events_waiting += 1
         self._lock.acquire()
+        with self._waiting_lock:
+            self._high_events_waiting -= 1
         self._do_work_func(event)
         self._high_event_finish_time = time.time()
         self._lock.release()
 
     def _do_low_priority_work(self, event):
+        self._do_low_priority_batch([event])
+
+    def _do_low_priority_batch(self, events):
         while True:
             self._lock.acquire()
-            if (time.time() - self._high_event_finish_time) < PRIORITY_DELAY:
+            if self._high_events_waiting or \
+                    (time.time() - self._high_event_finish_time) < \
+                    PRIORITY_DELAY:
                 self._lock.release()
                 time.sleep(PRIORITY_DELAY)
             else:
                 break
-        self._do_work_func(event)
+        self._do_batch_func(events)
         self._lock.release()
 
     def handle_multiple_low_priority(self, events):
-        index = 0
-        for index, e in enumerate(events):
-            self._do_low_priority_work(e)
-        return index
+        """Process the events in batches of up to batch_size events
+
+        The lock is taken once per batch, so high priority events are
+        handled between the batches.
+        :return: the number of events that were processed
+        """
+        count = 0
+        events = iter(events)
+        batch = list(islice(events, self._batch_size))
+        while batch:
+            self._do_low_priority_batch(batch)
+            count += len(batch)
+            batch = list(islice(events, self._batch_size))
+        return count
 
     def _init_listener(self, topic, callback):
         if not topic:
@@ -11,9 +11,18 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+from collections import OrderedDict
+import threading
+import time
+
 from oslo_log import log
+from oslo_utils import uuidutils
+from six.moves import cPickle
 
 from vitrage.common.constants import VertexProperties as VProps
+from vitrage.datasources.transformer_base import TransformerBase
+from vitrage.graph.driver import graph_snapshot
+from vitrage.graph.driver.networkx_graph import NXGraph
 from vitrage.graph import Edge
 from vitrage.graph import Vertex
 
@@ -22,57 +31,214 @@ from vitrage.storage.sqlalchemy import models
 
 LOG = log.getLogger(__name__)
 
+BASE_SNAPSHOT_ID = 1
+
+# snapshot metadata
+BASE_ID = 'base_id'
+IDS_CACHE = 'ids_cache'
+
 
 class GraphPersistency(object):
     def __init__(self, conf, db, graph):
         self.conf = conf
         self.db = db
         self.graph = graph
+        self._changes = None
+        self._max_deltas = 0
+        self._base_id = None
+        self._num_deltas = 0
+        self._events = []
+        self._events_lock = threading.Lock()
+        self._first_event_time = 0
+
+    def track_changes(self):
+        """Track the graph changes, to store the next snapshots as deltas"""
+        self._max_deltas = self.conf.persistency.graph_snapshot_deltas
+        if self._max_deltas and self._changes is None:
+            self._changes = graph_snapshot.GraphChanges()
+            self.graph.subscribe(self._changes.add)
 
     def store_graph(self):
         LOG.info('Persisting graph...')
+        # the snapshot event id is of the last event that is stored
+        self.flush_events()
         try:
             last_event_id = self.db.events.get_last_event_id()
             last_event_id = last_event_id.event_id if last_event_id else 0
-            graph_snapshot = self.graph.write_gpickle()
-            self.db.graph_snapshots.update(models.GraphSnapshot(
-                snapshot_id=1,
-                event_id=last_event_id,
-                graph_snapshot=graph_snapshot))
+            if self._base_id and self._num_deltas < self._max_deltas:
+                self._store_delta(last_event_id)
+            else:
+                self._store_base(last_event_id)
             LOG.info('Persisting graph - done')
         except Exception:
             LOG.exception("Graph is not stored")
 
+    def _store_base(self, event_id):
+        changes = self._changes.pop() if self._changes is not None else None
+        base_id = uuidutils.generate_uuid()
+        metadata = {BASE_ID: base_id,
+                    IDS_CACHE: TransformerBase.key_to_uuid_cache.dump()}
+        try:
+            self.db.graph_snapshots.update(models.GraphSnapshot(
+                snapshot_id=BASE_SNAPSHOT_ID,
+                event_id=event_id,
+                graph_snapshot=b''.join(
+                    graph_snapshot.write_snapshot(self.graph, metadata))))
+            self.db.graph_snapshots.delete_deltas(BASE_SNAPSHOT_ID)
+        except Exception:
+            if changes is not None:
+                self._changes.merge(changes)
+            raise
+
+        if changes is not None:
+            self._base_id = base_id
+            self._num_deltas = 0
+
+    def _store_delta(self, event_id):
+        changes = self._changes.pop()
+        if not len(changes):
+            LOG.info('No graph changes since the last snapshot')
+            return
+
+        ids_cache = {}
+        for v_id in changes.vertices:
+            v = self.graph.get_vertex(v_id, read_only=True)
+            if v is not None and v.get(VProps.VITRAGE_CACHED_ID):
+                ids_cache[v[VProps.VITRAGE_CACHED_ID]] = v_id
+        metadata = {BASE_ID: self._base_id, IDS_CACHE: ids_cache}
+        try:
+            self.db.graph_snapshots.update(models.GraphSnapshot(
+                snapshot_id=BASE_SNAPSHOT_ID + self._num_deltas + 1,
+                event_id=event_id,
+                graph_snapshot=b''.join(graph_snapshot.write_snapshot(
+                    self.graph, metadata, changes))))
+        except Exception:
+            self._changes.merge(changes)
+            raise
+        self._num_deltas += 1
+        LOG.info('Stored graph delta %s (%s changes)',
+                 self._num_deltas, len(changes))
+
     def query_recent_snapshot(self):
         return self.db.graph_snapshots.query()
 
+    def load_graph(self, stored_snapshot, graph):
+        """Load a stored snapshot into the graph
+
+        The deltas stored after the snapshot are applied, and the transformers
+        ids cache is restored together with the graph.
+
+        :return: the event id of the last loaded snapshot, after which the
+         events should be replayed
+        """
+        data = stored_snapshot.graph_snapshot
+        if not graph_snapshot.is_snapshot(data):
+            self._load_pickled_graph(data, graph)
+            return stored_snapshot.event_id
+
+        _, metadata = graph_snapshot.read_snapshot(data, graph)
+        TransformerBase.key_to_uuid_cache.load(metadata[IDS_CACHE])
+        event_id = stored_snapshot.event_id
+
+        for delta in self.db.graph_snapshots.query_deltas(BASE_SNAPSHOT_ID):
+            _, delta_metadata = graph_snapshot.read_snapshot_header(
+                delta.graph_snapshot)
+            if delta_metadata.get(BASE_ID) != metadata[BASE_ID]:
+                LOG.warning('Graph snapshot delta %s is of another snapshot',
+                            delta.snapshot_id)
+                break
+            graph_snapshot.read_snapshot(delta.graph_snapshot, graph)
+            for key, vitrage_id in delta_metadata[IDS_CACHE].items():
+                TransformerBase.key_to_uuid_cache.put(key, vitrage_id)
+            event_id = delta.event_id
+            LOG.info('Applied graph snapshot delta %s', delta.snapshot_id)
+        return event_id
+
+    def _load_pickled_graph(self, data, graph):
+        LOG.info('Loading a graph stored in the old format')
+        data = cPickle.loads(data)
+        if isinstance(data, tuple):
+            # the pickled graph, and the transformers ids cache
+            NXGraph.read_gpickle(data[0], graph)
+            TransformerBase.key_to_uuid_cache.load(data[1])
+        else:
+            graph._g = data
+            self._recreate_ids_cache(graph)
+
+    @staticmethod
+    def _recreate_ids_cache(graph):
+        TransformerBase.key_to_uuid_cache.clear()
+        for v in graph.get_vertices():
+            if not v.get(VProps.VITRAGE_CACHED_ID):
+                LOG.warning("Missing vitrage_cached_id in the vertex. "
+                            "Vertex is not added to the ID cache %s", str(v))
+            else:
+                TransformerBase.key_to_uuid_cache.put(
+                    v[VProps.VITRAGE_CACHED_ID], v.vertex_id)
+
     def replay_events(self, graph, event_id):
-        LOG.info('Getting events from database')
-        events = self.db.events.get_replay_events(
-            event_id=event_id)
-        LOG.info('Applying %s database events', len(events))
+        """Apply the events stored after event_id, in chunks"""
+        LOG.info('Replaying database events after event %s', event_id)
+        chunk_size = self.conf.persistency.replay_events_chunk_size
+        start = time.time()
+        events_count = 0
+        changes_count = 0
+        while True:
+            events = self.db.events.get_replay_events(event_id,
+                                                      limit=chunk_size)
+            if not events:
+                break
+            event_id = events[-1].event_id
+            events_count += len(events)
+            changes_count += self._apply_events(graph, events)
+            LOG.info('Replayed %s database events (%.0f events/sec)',
+                     events_count,
+                     events_count / max(time.time() - start, 0.001))
+            if len(events) < chunk_size:
+                break
+        LOG.info('Replayed %s database events as %s graph changes in %.2f '
+                 'seconds', events_count, changes_count, time.time() - start)
 
+    @staticmethod
+    def _apply_events(graph, events):
+        """Apply the events, one graph change per vertex or edge
+
+        Every event holds the properties of a vertex or an edge, so the
+        events of the same element are merged to its final properties.
+        """
+        vertices = OrderedDict()
+        edges = OrderedDict()
         for event in events:
+            payload = dict(event.payload)
             if event.is_vertex:
-                v_id = event.payload['vertex_id']
-                del event.payload['vertex_id']
-                v = Vertex(v_id, event.payload)
-                graph.update_vertex(v)
+                key = payload.pop('vertex_id')
+                elements = vertices
             else:
-                source_id = event.payload['source_id']
-                target_id = event.payload['target_id']
-                label = event.payload['label']
-                del event.payload['source_id']
-                del event.payload['target_id']
-                del event.payload['label']
-                e = Edge(source_id, target_id, label, event.payload)
-                graph.update_edge(e)
+                key = (payload.pop('source_id'), payload.pop('target_id'),
+                       payload.pop('label'))
+                elements = edges
+            properties = elements.get(key)
+            if properties is None:
+                elements[key] = payload
+            else:
+                properties.update(payload)
+
+        for v_id, properties in vertices.items():
+            v = Vertex(v_id, properties)
+            graph.update_vertex(v)
+            if v.get(VProps.VITRAGE_CACHED_ID):
+                TransformerBase.key_to_uuid_cache.put(
+                    v[VProps.VITRAGE_CACHED_ID], v_id)
+        for (source_id, target_id, label), properties in edges.items():
+            graph.update_edge(Edge(source_id, target_id, label, properties))
+        return len(vertices) + len(edges)
 
     def persist_event(self, before, current, is_vertex, graph, event_id=None):
         """Callback subscribed to driver.graph updates"""
         if not self.is_important_change(
                 before, current, VProps.UPDATE_TIMESTAMP,
-                VProps.VITRAGE_SAMPLE_TIMESTAMP):
+                VProps.VITRAGE_SAMPLE_TIMESTAMP,
+                VProps.VITRAGE_SAMPLE_TIMESTAMP_NS):
             return
 
         if is_vertex:
@@ -86,7 +252,42 @@ class GraphPersistency(object):
 
         event_row = models.Event(payload=curr, is_vertex=is_vertex,
                                  event_id=event_id)
-        self.db.events.create(event_row)
+        with self._events_lock:
+            self._events.append(event_row)
+            if len(self._events) == 1:
+                self._first_event_time = time.time()
+            flush = self._should_flush_events()
+        if flush:
+            self.flush_events()
+
+    def _should_flush_events(self):
+        conf = self.conf.persistency
+        return len(self._events) >= conf.events_buffer_size or \
+            time.time() - self._first_event_time >= conf.events_flush_interval
+
+    def flush_events(self):
+        """Store the buffered events, in a single transaction
+
+        The events are stored in the order of the graph changes, so the
+        replay order is kept. If the batch fails, the events are stored one
+        by one, so only the failing events are lost.
+        """
+        with self._events_lock:
+            events, self._events = self._events, []
+            if not events:
+                return
+            try:
+                self.db.events.create_batch(events)
+                return
+            except Exception:
+                LOG.exception('Failed to store %s graph events, storing '
+                              'them one by one', len(events))
+            for event in events:
+                try:
+                    self.db.events.create(event)
+                except Exception:
+                    LOG.exception('Failed to store graph event %s',
+                                  event.payload)
 
     @staticmethod
     def is_important_change(before, curr, *args):
@@ -12,14 +12,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-from dateutil import parser
-
 from oslo_log import log
 
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.graph import Edge
 from vitrage.graph import Vertex
+from vitrage.utils.datetime import parse_timestamp_ns
+from vitrage.utils.datetime import timestamp_ns
 from vitrage.utils.datetime import utcnow
 
 
@@ -27,19 +27,33 @@ LOG = log.getLogger(__name__)
 
 
 def is_newer_vertex(prev_vertex, new_vertex):
-    prev_timestamp = prev_vertex.get(VProps.VITRAGE_SAMPLE_TIMESTAMP)
-    if not prev_timestamp:
+    prev_time = get_sample_timestamp_ns(prev_vertex)
+    if prev_time is None:
         return True
-    prev_time = parser.parse(prev_timestamp)
 
-    new_timestamp = new_vertex.get(VProps.VITRAGE_SAMPLE_TIMESTAMP)
-    if not new_timestamp:
+    new_time = get_sample_timestamp_ns(new_vertex)
+    if new_time is None:
         return True
-    new_time = parser.parse(new_timestamp)
 
     return prev_time <= new_time
 
 
+def get_sample_timestamp_ns(vertex):
+    """The sample timestamp of the vertex in nanoseconds since the epoch
+
+    Vertices that were created before the numeric sample timestamp was added
+    have only the string form, which is parsed instead.
+    """
+    sample_time = vertex.get(VProps.VITRAGE_SAMPLE_TIMESTAMP_NS)
+    if sample_time is not None:
+        return sample_time
+
+    sample_timestamp = vertex.get(VProps.VITRAGE_SAMPLE_TIMESTAMP)
+    if not sample_timestamp:
+        return None
+    return parse_timestamp_ns(sample_timestamp)
+
+
 def is_deleted(item):
     return item and \
         (isinstance(item, Vertex) and
@@ -52,8 +66,10 @@ def mark_deleted(g, item):
     if isinstance(item, Vertex):
         if item.get(VProps.VITRAGE_IS_DELETED, False):
             return
+        now = utcnow()
         item[VProps.VITRAGE_IS_DELETED] = True
-        item[VProps.VITRAGE_SAMPLE_TIMESTAMP] = str(utcnow())
+        item[VProps.VITRAGE_SAMPLE_TIMESTAMP] = str(now)
+        item[VProps.VITRAGE_SAMPLE_TIMESTAMP_NS] = timestamp_ns(now)
         g.update_vertex(item)
     elif isinstance(item, Edge):
         if item.get(EProps.VITRAGE_IS_DELETED, False):
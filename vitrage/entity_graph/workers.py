@@ -14,12 +14,16 @@
 import abc
 import cotyledon
 import multiprocessing
+import os
+from six.moves import cPickle
+import threading
 
 from oslo_concurrency import processutils as ps
 from oslo_log import log
 import oslo_messaging
 from oslo_utils import uuidutils
 
+from vitrage.api_handler.apis.alarm import ActiveAlarmsCounter
 from vitrage.api_handler.apis.alarm import AlarmApis
 from vitrage.api_handler.apis.event import EventApis
 from vitrage.api_handler.apis.rca import RcaApis
@@ -34,6 +38,7 @@ from vitrage.entity_graph import EVALUATOR_TOPIC
 from vitrage.evaluator.actions.base import ActionMode
 from vitrage.evaluator.scenario_evaluator import ScenarioEvaluator
 from vitrage.evaluator.scenario_repository import ScenarioRepository
+from vitrage.graph.driver.shared_graph import SharedGraph
 from vitrage import messaging
 from vitrage import rpc as vitrage_rpc
 from vitrage import storage
@@ -46,10 +51,105 @@ ENABLE_EVALUATION = 'enable_evaluation'
 START_EVALUATION = 'start_evaluation'
 RELOAD_TEMPLATES = 'reload_templates'
 TEMPLATE_ACTION = 'template_action'
+SHARED_GRAPH_SNAPSHOT = 'shared_graph_snapshot'
 
 ADD = 'add'
 DELETE = 'delete'
 
+# Pending graph changes are sent to the workers when reaching this size, even
+# if the processing of the current event is not finished
+MAX_GRAPH_DELTA_SIZE = 1000
+
+
+class GraphDelta(object):
+    """Graph changes coalesced into a single update of the workers graphs
+
+    The updates of an element are coalesced into its first update, with the
+    state of the last one, as the workers only need the final state of the
+    element. The elements keep the order in which they first changed, so a
+    vertex is still updated before the edges that were added to it.
+    Removals are kept in order, and updates are never coalesced across them,
+    as removing a vertex also removes its edges in the workers graphs.
+    """
+
+    def __init__(self):
+        self._changes = []
+        # element key -> index of its update in self._changes
+        self._updates = {}
+        # updates before this index precede a removal, and are not coalesced
+        self._barrier = 0
+
+    def __len__(self):
+        return len(self._changes)
+
+    def add(self, before, current, is_vertex):
+        item = current or before
+        key = (item.vertex_id,) if is_vertex else \
+            (item.source_id, item.target_id, item.label)
+        prev_index = self._updates.pop(key, None)
+
+        if current:
+            if prev_index is not None and prev_index >= self._barrier:
+                self._changes[prev_index] = (None, current, is_vertex)
+                self._updates[key] = prev_index
+            else:
+                self._updates[key] = len(self._changes)
+                self._changes.append((None, current, is_vertex))
+        else:
+            self._changes.append((before, None, is_vertex))
+            self._barrier = len(self._changes)
+
+    def changes(self):
+        """The list of (before, current, is_vertex) changes to apply"""
+        return list(self._changes)
+
+
+class SharedGraphFiles(object):
+    """The snapshot files of the graph that is shared with the api workers
+
+    Every snapshot generation is written to its own file. A 'current'
+    symlink is renamed over to the newest one, so an api worker that is
+    started again by cotyledon maps the current snapshot.
+    """
+
+    def __init__(self, directory):
+        self._prefix = os.path.join(directory,
+                                    'vitrage-graph-%s' % os.getpid())
+        self._current_link = self._prefix + '.current'
+        self._generation = -1
+
+    def current_path(self):
+        """The path of the current snapshot, or None if none was written"""
+        try:
+            return os.readlink(self._current_link)
+        except OSError:
+            return None
+
+    def write(self, graph):
+        """Write the next generation of the snapshot, and make it current
+
+        :return: the path of the new snapshot
+        """
+        self._generation += 1
+        path = self._path(self._generation)
+        SharedGraph.write_snapshot(graph, path)
+        tmp_link = self._current_link + '.tmp'
+        os.symlink(path, tmp_link)
+        os.rename(tmp_link, self._current_link)
+        return path
+
+    def remove(self):
+        path = self.current_path()
+        for file_path in (self._current_link, path):
+            try:
+                if file_path:
+                    os.remove(file_path)
+            except OSError:
+                pass
+
+    def _path(self, generation):
+        return '%s.%s' % (self._prefix, generation)
+
 
 class GraphWorkersManager(cotyledon.ServiceManager):
     """GraphWorkersManager
@@ -67,6 +167,14 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         self._template_queues = []
         self._api_queues = []
         self._all_queues = []
+        self._ack_queue = multiprocessing.Queue()
+        self._graph_delta = GraphDelta()
+        self._graph_update_seq = 0
+        self._graph_update_lock = threading.Lock()
+        self._shared_graph = SharedGraphFiles(conf.api.shared_graph_dir) \
+            if conf.api.shared_graph else None
+        self._shared_graph_changes = 0
+        self.register_hooks(on_terminate=self._remove_shared_graph)
         self.register_hooks(on_terminate=self._stop)
         self.add_evaluator_workers()
         self.add_api_workers()
@@ -88,7 +196,8 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         workers = self._conf.evaluator.workers or ps.get_worker_count()
         queues = [multiprocessing.JoinableQueue() for i in range(workers)]
         self.add(EvaluatorWorker,
-                 args=(self._conf, queues, self._entity_graph, workers),
+                 args=(self._conf, queues, self._entity_graph,
+                       self._ack_queue, workers),
                  workers=workers)
         self._evaluator_queues = queues
         self._all_queues.extend(queues)
@@ -100,27 +209,86 @@ class GraphWorkersManager(cotyledon.ServiceManager):
         Each template worker holds a disabled scenario-evaluator that does
         not process changes.
         These also hold a rpc server and process the incoming Api calls
+        If api.shared_graph is set, the api workers do not hold a copy of the
+        graph, but query a shared snapshot of it. See SharedGraph
         """
         if self._api_queues:
             raise VitrageError('add_api_workers called more than once')
         workers = self._conf.api.workers
         queues = [multiprocessing.JoinableQueue() for i in range(workers)]
         self.add(ApiWorker,
-                 args=(self._conf, queues, self._entity_graph),
+                 args=(self._conf, queues, self._entity_graph,
+                       self._ack_queue, self._shared_graph),
                  workers=workers)
         self._api_queues = queues
         self._all_queues.extend(queues)
 
+    def run(self):
+        if self._shared_graph:
+            self._shared_graph.write(self._entity_graph)
+        super(GraphWorkersManager, self).run()
+
     def submit_graph_update(self, before, current, is_vertex, *args, **kwargs):
         """Graph update all workers
 
         This method is subscribed to entity graph changes.
-        Per each change in the main entity graph, this method will notify
-         each of the workers, causing them to update their own graph.
+        Changes in the main entity graph are accumulated in a delta, which
+        is sent to the workers by flush_graph_updates.
         """
-        self._submit_and_wait(
-            self._all_queues,
-            (GRAPH_UPDATE, before, current, is_vertex))
+        with self._graph_update_lock:
+            self._graph_delta.add(before, current, is_vertex)
+            if len(self._graph_delta) < MAX_GRAPH_DELTA_SIZE:
+                return
+        self.flush_graph_updates()
+
+    def flush_graph_updates(self):
+        """Send the accumulated graph changes to all workers
+
+        The delta is pickled once and sent to each of the workers, causing
+        them to update their own graph. Waits until all workers acknowledged
+        applying it.
+        """
+        with self._graph_update_lock:
+            changes = self._graph_delta.changes()
+            self._graph_delta = GraphDelta()
+            if not changes:
+                return
+            self._graph_update_seq += 1
+            seq = self._graph_update_seq
+            delta = cPickle.dumps(changes, cPickle.HIGHEST_PROTOCOL)
+            for q in self._all_queues:
+                q.put((GRAPH_UPDATE, seq, delta))
+
+            acks = 0
+            while acks < len(self._all_queues):
+                if self._ack_queue.get() == seq:
+                    acks += 1
+
+            if self._shared_graph:
+                self._shared_graph_changes += len(changes)
+                if self._shared_graph_changes >= \
+                        self._conf.api.shared_graph_max_changes:
+                    self._share_graph_snapshot()
+
+    def _share_graph_snapshot(self):
+        """Replace the snapshot that is shared with the api workers
+
+        The changes kept by the api workers since the previous snapshot are
+        dropped, once they map the new one.
+        The whole graph is written in the thread that processes the events,
+        while the graph updates are locked, once per
+        api.shared_graph_max_changes changes.
+        """
+        prev_path = self._shared_graph.current_path()
+        path = self._shared_graph.write(self._entity_graph)
+        self._submit_and_wait(self._api_queues, (SHARED_GRAPH_SNAPSHOT, path))
+        self._shared_graph_changes = 0
+        # The workers no longer map it
+        os.remove(prev_path)
+
+    def _remove_shared_graph(self):
+        if self._shared_graph:
+            self._shared_graph.remove()
 
     def submit_start_evaluations(self):
         """Enable scenario-evaluator in all evaluator workers
@@ -191,11 +359,13 @@ class GraphCloneWorkerBase(cotyledon.Service):
                  worker_id,
                  conf,
                  task_queues,
-                 entity_graph):
+                 entity_graph,
+                 ack_queue):
         super(GraphCloneWorkerBase, self).__init__(worker_id)
         self._conf = conf
         self._task_queue = task_queues[worker_id]
         self._entity_graph = entity_graph
+        self._ack_queue = ack_queue
 
     name = 'GraphCloneWorkerBase'
 
@@ -224,8 +394,18 @@ class GraphCloneWorkerBase(cotyledon.Service):
     def do_task(self, task):
         action = task[0]
         if action == GRAPH_UPDATE:
-            (action, before, current, is_vertex) = task
-            self._graph_update(before, current, is_vertex)
+            (action, seq, delta) = task
+            try:
+                self._apply_graph_delta(cPickle.loads(delta))
+            finally:
+                self._ack_queue.put(seq)
+
+    def _apply_graph_delta(self, changes):
+        for before, current, is_vertex in changes:
+            try:
+                self._graph_update(before, current, is_vertex)
+            except Exception:
+                LOG.exception("Graph may not be in sync.")
 
     def _graph_update(self, before, current, is_vertex):
         if current:
@@ -246,9 +426,10 @@ class EvaluatorWorker(GraphCloneWorkerBase):
                  conf,
                  task_queues,
                  e_graph,
+                 ack_queue,
                  workers_num):
         super(EvaluatorWorker, self).__init__(
-            worker_id, conf, task_queues, e_graph)
+            worker_id, conf, task_queues, e_graph, ack_queue)
         self._workers_num = workers_num
         self._evaluator = None
 
@@ -266,7 +447,8 @@ class EvaluatorWorker(GraphCloneWorkerBase):
             self._entity_graph,
             scenario_repo,
             actions_callback,
-            enabled=False)
+            enabled=False,
+            scenario_threads=self._conf.evaluator.scenario_threads)
         self._evaluator.scenario_repo.log_enabled_scenarios()
 
     def do_task(self, task):
@@ -307,21 +489,40 @@ class EvaluatorWorker(GraphCloneWorkerBase):
 
 
 class ApiWorker(GraphCloneWorkerBase):
+    def __init__(self,
+                 worker_id,
+                 conf,
+                 task_queues,
+                 e_graph,
+                 ack_queue,
+                 shared_graph=None):
+        super(ApiWorker, self).__init__(
+            worker_id, conf, task_queues, e_graph, ack_queue)
+        self._shared_graph = shared_graph
+        self._alarms_counter = None
 
     name = 'ApiWorker'
 
     def _init_instance(self):
         conf = self._conf
+        if self._shared_graph:
+            # Graph updates are applied on top of the shared snapshot, and
+            # the graph copy inherited from the parent process is not used
+            self._entity_graph = SharedGraph(
+                self._shared_graph.current_path())
         LOG.info("Vitrage Api Handler Service - Starting...")
         notifier = messaging.VitrageNotifier(conf, "vitrage.api",
                                              [EVALUATOR_TOPIC])
         db = storage.get_connection_from_config(conf)
+        if conf.api.alarm_counts_from_graph:
+            self._alarms_counter = ActiveAlarmsCounter(self._entity_graph)
         transport = messaging.get_rpc_transport(conf)
         target = oslo_messaging.Target(topic=conf.rpc_topic,
                                        server=uuidutils.generate_uuid())
 
         endpoints = [TopologyApis(self._entity_graph, conf),
-                     AlarmApis(self._entity_graph, conf, db),
+                     AlarmApis(self._entity_graph, conf, db,
+                               self._alarms_counter),
                      RcaApis(self._entity_graph, conf, db),
                      TemplateApis(notifier, db),
                      EventApis(conf),
@@ -333,3 +534,23 @@ class ApiWorker(GraphCloneWorkerBase):
         server.start()
 
         LOG.info("Vitrage Api Handler Service - Started!")
+
+    def do_task(self, task):
+        super(ApiWorker, self).do_task(task)
+        action = task[0]
+        if action == SHARED_GRAPH_SNAPSHOT:
+            (action, path) = task
+            self._entity_graph.load(path)
+            if self._alarms_counter:
+                self._alarms_counter.reset(self._entity_graph)
+
+    def _graph_update(self, before, current, is_vertex):
+        if not self._alarms_counter or not is_vertex:
+            super(ApiWorker, self)._graph_update(before, current, is_vertex)
+            return
+
+        v_id = (current or before).vertex_id
+        orig = self._entity_graph.get_vertex(v_id, read_only=True)
+        super(ApiWorker, self)._graph_update(before, current, is_vertex)
+        self._alarms_counter.update(
+            orig, self._entity_graph.get_vertex(v_id, read_only=True))
@@ -26,6 +26,13 @@ OPTS = [
                     'equal to the number of CPUs available if that can be '
                     'determined, else a default worker count of 1 is returned.'
                ),
+    cfg.IntOpt('scenario_threads',
+               default=1,
+               min=1,
+               help='Number of threads in each evaluator worker, that match '
+                    'the scenarios triggered by a single graph change. With '
+                    '1 thread the scenarios are matched one after the other.'
+               ),
 ]
 
 init_template_schemas()
@@ -32,6 +32,7 @@ from vitrage.evaluator.actions.recipes.base import EVALUATOR_EVENT_TYPE
 from vitrage.evaluator.template_fields import TemplateFields as TFields
 import vitrage.graph.utils as graph_utils
 from vitrage.graph import Vertex
+from vitrage.utils.datetime import parse_timestamp_ns
 
 
 LOG = logging.getLogger(__name__)
@@ -136,6 +137,8 @@ class EvaluatorEventTransformer(transformer_base.TransformerBase):
                 VProps.UPDATE_TIMESTAMP: timestamp,
                 VProps.VITRAGE_SAMPLE_TIMESTAMP:
                     event[VProps.VITRAGE_SAMPLE_TIMESTAMP],
+                VProps.VITRAGE_SAMPLE_TIMESTAMP_NS: parse_timestamp_ns(
+                    event[VProps.VITRAGE_SAMPLE_TIMESTAMP]),
                 VProps.IS_REAL_VITRAGE_ID: True,
                 VProps.VITRAGE_TYPE: event.get(VProps.VITRAGE_RESOURCE_TYPE),
                 VProps.VITRAGE_CATEGORY: EntityCategory.RESOURCE,
@@ -11,14 +11,15 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
-from collections import defaultdict
 from collections import namedtuple
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import copy
 import re
 import time
 
 from oslo_log import log
+from oslo_utils import timeutils
 
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import VertexProperties as VProps
@@ -62,7 +63,8 @@ class ScenarioEvaluator(object):
                  e_graph,
                  scenario_repo,
                  actions_callback,
-                 enabled=False):
+                 enabled=False,
+                 scenario_threads=1):
         self._conf = conf
         self._entity_graph = e_graph
         self._db_connection = storage.get_connection_from_config(self._conf)
@@ -72,7 +74,8 @@ class ScenarioEvaluator(object):
         self._active_actions_tracker = ActiveActionsTracker(
             self._conf, self._db_connection)
         self.enabled = enabled
-        self.connected_component_cache = defaultdict(dict)
+        self._scenarios_executor = ThreadPoolExecutor(
+            max_workers=scenario_threads) if scenario_threads > 1 else None
 
     @property
     def scenario_repo(self):
@@ -156,8 +159,10 @@ class ScenarioEvaluator(object):
             return self._scenario_repo.get_scenarios_by_edge(edge_desc)
 
     def _get_edge_description(self, element):
-        source = self._entity_graph.get_vertex(element.source_id)
-        target = self._entity_graph.get_vertex(element.target_id)
+        source = self._entity_graph.get_vertex(element.source_id,
+                                               read_only=True)
+        target = self._entity_graph.get_vertex(element.target_id,
+                                               read_only=True)
         edge_desc = EdgeDescription(element, source, target)
         return edge_desc
 
@@ -169,15 +174,30 @@ class ScenarioEvaluator(object):
         return before, current
 
     def _process_and_get_actions(self, element, triggered_scenarios, mode):
-        actions = []
-        for triggered_scenario in triggered_scenarios:
+        """Match the triggered scenarios and get their actions
+
+        When a scenarios executor is configured, the scenarios are matched
+        concurrently. Their actions are merged in the order of the scenarios,
+        same as when they are matched one after the other.
+        """
+        def process(triggered_scenario):
             LOG.debug("Processing: %s", str(triggered_scenario))
             scenario_element = triggered_scenario[0]
             scenario = triggered_scenario[1]
-            actions.extend(self._process_scenario(element,
-                                                  scenario,
-                                                  scenario_element,
-                                                  mode))
+            return self._process_scenario(element,
+                                          scenario,
+                                          scenario_element,
+                                          mode)
+
+        if self._scenarios_executor and len(triggered_scenarios) > 1:
+            scenarios_actions = self._scenarios_executor.map(
+                process, triggered_scenarios)
+        else:
+            scenarios_actions = map(process, triggered_scenarios)
+
+        actions = []
+        for scenario_actions in scenarios_actions:
+            actions.extend(scenario_actions)
         return actions
 
     def _process_scenario(self, element, scenario, scenario_elements, mode):
@@ -186,7 +206,7 @@ class ScenarioEvaluator(object):
         actions = []
         for action in scenario.actions:
             for scenario_element in scenario_elements:
-                matches = self._evaluate_subgraphs(scenario.subgraphs,
+                matches = self._evaluate_subgraphs(scenario.subgraph_plans,
                                                    element,
                                                    scenario_element,
                                                    action.targets[TARGET])
@@ -199,17 +219,17 @@ class ScenarioEvaluator(object):
         return actions
 
     def _evaluate_subgraphs(self,
-                            subgraphs,
+                            subgraph_plans,
                             element,
                             scenario_element,
                             action_target):
         if isinstance(element, Vertex):
-            return self._find_vertex_subgraph_matching(subgraphs,
+            return self._find_vertex_subgraph_matching(subgraph_plans,
                                                        action_target,
                                                        element,
                                                        scenario_element)
         else:
-            return self._find_edge_subgraph_matching(subgraphs,
+            return self._find_edge_subgraph_matching(subgraph_plans,
                                                      action_target,
                                                      element,
                                                      scenario_element)
@@ -293,10 +313,12 @@ class ScenarioEvaluator(object):
         real_items = {
             target: match[target_id] for target, target_id in targets.items()
         }
+        # the properties functions are evaluated per match, on a copy of the
+        # template properties
         return ActionSpecs(action_spec.id,
                            action_spec.type,
                            real_items,
-                           action_spec.properties)
+                           copy.deepcopy(action_spec.properties))
 
     @staticmethod
     def _generate_action_id(action_spec):
@@ -315,6 +337,19 @@ class ScenarioEvaluator(object):
     def _analyze_and_filter_actions(self, actions):
         LOG.debug("Actions before filtering: %s", actions)
 
+        self._active_actions_tracker.load(actions)
+        try:
+            actions_to_perform = self._filter_actions(actions)
+        finally:
+            self._active_actions_tracker.flush()
+
+        unique_ordered_actions = OrderedDict()
+        for action in actions_to_perform:
+            id_ = ScenarioEvaluator._generate_action_id(action.specs)
+            unique_ordered_actions[id_] = action
+        return unique_ordered_actions.values()
+
+    def _filter_actions(self, actions):
         actions_to_perform = []
         for action_info in actions:
             if action_info.mode == ActionMode.DO:
@@ -337,15 +372,10 @@ class ScenarioEvaluator(object):
                     else:
 
                         actions_to_perform.append(action_info)
-
-        unique_ordered_actions = OrderedDict()
-        for action in actions_to_perform:
-            id_ = ScenarioEvaluator._generate_action_id(action.specs)
-            unique_ordered_actions[id_] = action
-        return unique_ordered_actions.values()
+        return actions_to_perform
 
     def _find_vertex_subgraph_matching(self,
-                                       subgraphs,
+                                       subgraph_plans,
                                        action_target,
                                        vertex,
                                        scenario_vertex):
@@ -358,62 +388,63 @@ class ScenarioEvaluator(object):
         """
 
         matches = []
-        for subgraph in subgraphs:
-            connected_component = self.get_connected_component(subgraph,
-                                                               action_target)
+        for plan in subgraph_plans:
+            connected_component = plan.connected_component(action_target)
 
-            is_switch_mode = \
-                connected_component.get_vertex(scenario_vertex.vertex_id)
+            is_switch_mode = scenario_vertex.vertex_id in connected_component
 
             if is_switch_mode:
                 initial_map = Mapping(scenario_vertex, vertex, True)
-                mat = self._entity_graph.algo.sub_graph_matching(subgraph,
-                                                                 initial_map)
+                mat = self._entity_graph.algo.sub_graph_matching(
+                    plan.subgraph,
+                    initial_map,
+                    plan=plan.matching_plan)
                 matches.append((False, mat))
             else:
                 matches.append((True, []))
         return matches
 
     def _find_edge_subgraph_matching(self,
-                                     subgraphs,
+                                     subgraph_plans,
                                      action_target,
                                      edge,
                                      scenario_edge):
         """calculates subgraph matching for edge
 
         iterates over all the subgraphs, and checks if the triggered edge is a
-        negative edge then mark it as deleted=false and negative=false so that
-        subgraph matching on that edge will work correctly. after running
+        negative edge then match it as deleted=false and negative=false so
+        that subgraph matching on that edge will work correctly. after running
         subgraph matching, we need to remove the negative vertices that were
         added due to the change above.
         """
 
         matches = []
-        for subgraph in subgraphs:
-            subgraph_edge = subgraph.get_edge(scenario_edge.source.vertex_id,
-                                              scenario_edge.target.vertex_id,
-                                              scenario_edge.edge.label)
+        for plan in subgraph_plans:
+            subgraph_edge = plan.get_edge(scenario_edge.source.vertex_id,
+                                          scenario_edge.target.vertex_id,
+                                          scenario_edge.edge.label)
             if not subgraph_edge:
                 continue
 
             is_switch_mode = subgraph_edge.get(NEG_CONDITION, False)
 
-            connected_component = self.get_connected_component(subgraph,
-                                                               action_target)
-            # change the vitrage_is_deleted and negative_condition props to
-            # false when is_switch_mode=true so that when we have an event on a
-            # negative_condition=true edge it will find the correct subgraph
-            self._switch_edge_negative_props(is_switch_mode, scenario_edge,
-                                             subgraph, False)
+            connected_component = plan.connected_component(action_target)
+            # when is_switch_mode=true, match the edge as if its
+            # vitrage_is_deleted and negative_condition props are false, so
+            # that when we have an event on a negative_condition=true edge it
+            # will find the correct subgraph
+            if is_switch_mode:
+                subgraph_element, matching_plan = \
+                    plan.switched(subgraph_edge)
+            else:
+                subgraph_element = scenario_edge.edge
+                matching_plan = plan.matching_plan
 
-            initial_map = Mapping(scenario_edge.edge, edge, False)
+            initial_map = Mapping(subgraph_element, edge, False)
             curr_matches = \
-                self._entity_graph.algo.sub_graph_matching(subgraph,
-                                                           initial_map)
-
-            # switch back to the original values
-            self._switch_edge_negative_props(is_switch_mode, scenario_edge,
-                                             subgraph, True)
+                self._entity_graph.algo.sub_graph_matching(plan.subgraph,
+                                                           initial_map,
+                                                           plan=matching_plan)
 
             self._remove_negative_vertices_from_matches(curr_matches,
                                                         connected_component)
@@ -421,17 +452,6 @@ class ScenarioEvaluator(object):
             matches.append((is_switch_mode, curr_matches))
         return matches
 
-    def get_connected_component(self, subgraph, target):
-        connected_component = self.connected_component_cache.get(
-            id(subgraph), {}).get(id(target))
-        if not connected_component:
-            connected_component = subgraph.algo.graph_query_vertices(
-                root_id=target,
-                edge_query_dict={'!=': {NEG_CONDITION: True}})
-            self.connected_component_cache[id(subgraph)][id(target)] = \
-                connected_component
-        return connected_component
-
     def _db_action_to_action_info(self, db_action):
         target = self._entity_graph.get_vertex(db_action.target_vertex_id)
         targets = {TARGET: target}
@@ -454,21 +474,11 @@ class ScenarioEvaluator(object):
         )
         return action_info
 
-    @staticmethod
-    def _switch_edge_negative_props(is_switch_mode,
-                                    scenario_edge,
-                                    subgraph,
-                                    status):
-        if is_switch_mode:
-            scenario_edge.edge[NEG_CONDITION] = status
-            scenario_edge.edge[EProps.VITRAGE_IS_DELETED] = status
-            subgraph.update_edge(scenario_edge.edge)
-
     @staticmethod
     def _remove_negative_vertices_from_matches(matches, connected_component):
         for match in matches:
-            ver_ids = [v.vertex_id for v in connected_component.get_vertices()]
-            ver_to_remove = [id for id in match.keys() if id not in ver_ids]
+            ver_to_remove = [v_id for v_id in match.keys()
+                             if v_id not in connected_component]
             for v_id in ver_to_remove:
                 del match[v_id]
 
@@ -501,8 +511,17 @@ class ActiveActionsTracker(object):
 
     The score is used to determine which action in each group of similar
     actions to be executed next.
+
+    The active actions are kept in the database, shared by all the evaluator
+    workers. Before the actions of an evaluated event are calculated, all
+    the active actions similar to them are loaded with a single query, and
+    the changes are written in a single transaction once they are all
+    calculated. See load and flush.
     """
 
+    KEY_FIELDS = ('action_type', 'extra_info',
+                  'source_vertex_id', 'target_vertex_id')
+
     def __init__(self, conf, db_connection):
         info_mapper = DatasourceInfoMapper(conf)
         self._db = db_connection
@@ -515,6 +534,33 @@ class ActiveActionsTracker(object):
             ActionType.MARK_DOWN: pt.BaselineTools,
             ActionType.EXECUTE_MISTRAL: pt.BaselineTools
         }
+        # The loaded active actions, including the ones created since
+        self._active_actions = []
+        # (action_id, trigger) -> the active actions to create
+        self._created = OrderedDict()
+        # (action_id, trigger) of the active actions to delete
+        self._deleted = OrderedDict()
+
+    def load(self, actions_info):
+        """Load the active actions that are similar to any of the actions"""
+        keys = [self._action_key(action_info) for action_info in actions_info]
+        db_actions = self._db.active_actions.query_similar(keys) \
+            if keys else []
+        self._active_actions = list(OrderedDict(
+            ((a.action_id, a.trigger), a) for a in db_actions).values())
+        self._created = OrderedDict()
+        self._deleted = OrderedDict()
+
+    def flush(self):
+        """Write the changes made since load, in a single transaction"""
+        if self._created or self._deleted:
+            LOG.debug("DB Insert active_actions %s, delete %s",
+                      list(self._created.values()), list(self._deleted))
+            self._db.active_actions.bulk_update(list(self._created.values()),
+                                                list(self._deleted))
+        self._active_actions = []
+        self._created = OrderedDict()
+        self._deleted = OrderedDict()
 
     def calc_do_action(self, action_info):
         """Add this action to active_actions table, if not exists
@@ -523,7 +569,6 @@ class ActiveActionsTracker(object):
         Only a top scored action that is new should be performed
         :return: (is top score, is it already existing)
         """
-        # TODO(idan_hefetz): DB read and write not in a transaction
         active_actions = self._query_similar_actions(action_info)
         exists = any(
             a.action_id == action_info.action_id and
@@ -531,8 +576,8 @@ class ActiveActionsTracker(object):
         if not exists:
             db_row = self._to_db_row(action_info)
             active_actions.append(db_row)
-            LOG.debug("DB Insert active_actions %s", str(db_row))
-            self._db.active_actions.create(db_row)
+            self._active_actions.append(db_row)
+            self._created[(db_row.action_id, db_row.trigger)] = db_row
 
         return self._is_highest_score(active_actions, action_info), exists
 
@@ -545,15 +590,13 @@ class ActiveActionsTracker(object):
         :param action_info: action to delete
         :return: is_highest_score, second highest action if exists
         """
-        # TODO(idan_hefetz): DB read and write not in a transaction
         active_actions = self._query_similar_actions(action_info)
 
-        LOG.debug("DB delete active_actions %s %s",
-                  action_info.action_id,
-                  str(action_info.trigger_id))
-        self._db.active_actions.delete(
-            action_id=action_info.action_id,
-            trigger=action_info.trigger_id)
+        key = (action_info.action_id, action_info.trigger_id)
+        self._active_actions = [a for a in self._active_actions
+                                if (a.action_id, a.trigger) != key]
+        self._created.pop(key, None)
+        self._deleted[key] = None
 
         is_highest_score = self._is_highest_score(active_actions, action_info)
         if is_highest_score and len(active_actions) > 1:
@@ -575,19 +618,29 @@ class ActiveActionsTracker(object):
             target_vertex_id=target.get(VProps.VITRAGE_ID),
             action_id=action_info.action_id,
             trigger=action_info.trigger_id,
-            score=action_score)
+            score=action_score,
+            created_at=timeutils.utcnow())
 
-    def _query_similar_actions(self, action_info):
-        """Query DB for all actions with same properties"""
+    def _action_key(self, action_info):
+        """The values of KEY_FIELDS for the action"""
         source = action_info.specs.targets.get(SOURCE, {})
         target = action_info.specs.targets.get(TARGET, {})
         extra_info = self._action_tools[action_info.specs.type].get_extra_info(
             action_info.specs)
-        return self._db.active_actions.query(
-            action_type=action_info.specs.type,
-            extra_info=extra_info,
-            source_vertex_id=source.get(VProps.VITRAGE_ID),
-            target_vertex_id=target.get(VProps.VITRAGE_ID))
+        return (action_info.specs.type,
+                extra_info,
+                source.get(VProps.VITRAGE_ID),
+                target.get(VProps.VITRAGE_ID))
+
+    def _query_similar_actions(self, action_info):
+        """All the loaded actions with same properties
+
+        As in the database query, a None property matches any value
+        """
+        key = self._action_key(action_info)
+        return [a for a in self._active_actions
+                if all(value is None or getattr(a, field) == value
+                       for field, value in zip(self.KEY_FIELDS, key))]
 
     @classmethod
     def _is_highest_score(cls, db_actions, action_info):
@@ -17,8 +17,10 @@ from collections import namedtuple
 import itertools
 from oslo_log import log
 
+from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.common.constants import TemplateStatus
 from vitrage.common.constants import TemplateTypes as TType
+from vitrage.common.constants import VertexProperties as VProps
 from vitrage.common.utils import get_portion
 from vitrage.evaluator.base import Template
 from vitrage.evaluator.equivalence_repository import EquivalenceRepository
@@ -27,6 +29,9 @@ from vitrage.evaluator.template_loading.scenario_loader import ScenarioLoader
 from vitrage.evaluator.template_loading.template_loader import TemplateLoader
 from vitrage.evaluator.template_validation.template_syntax_validator import \
     EXCEPTION
+from vitrage.graph.algo_driver.sub_graph_matching import MatchingPlan
+from vitrage.graph.algo_driver.sub_graph_matching import NEG_CONDITION
+from vitrage.graph.driver import Direction
 from vitrage.graph.filter import check_filter as check_subset
 from vitrage import storage
 from vitrage.utils import file as file_utils
@@ -36,6 +41,138 @@ LOG = log.getLogger(__name__)
 EdgeKeyScenario = namedtuple('EdgeKeyScenario', ['label', 'source', 'target'])
 DEF_TEMPLATES_DIR_OPT = 'def_templates_dir'
 
+# The template entity properties that the scenario keys are indexed by
+INDEXED_PROPERTIES = (VProps.VITRAGE_CATEGORY,
+                      VProps.VITRAGE_TYPE,
+                      VProps.NAME)
+
+
+class ScenarioKeysIndex(object):
+    """A discrimination tree of scenario keys
+
+    Each level of the tree discriminates the keys by the value of one
+    property, and all keys have the same number of levels. A key that does
+    not require an exact value of the property (e.g. it does not have the
+    property, or has a regex of it) is placed in the wildcard branch of the
+    level, that is followed by every lookup.
+
+    Lookups return the candidate keys, in the order they were added. These
+    must still be checked against the element.
+    """
+
+    _ANY = object()
+
+    def __init__(self):
+        self._root = {}
+        self._order = {}
+
+    def add(self, values, key):
+        """Add a key
+
+        :param values: the value of each level that the key requires, or None
+                       if it does not require a single value
+        """
+        if key in self._order:
+            return
+        self._order[key] = len(self._order)
+
+        node = self._root
+        for value in values[:-1]:
+            node = node.setdefault(self._ANY if value is None else value, {})
+        last = self._ANY if values[-1] is None else values[-1]
+        node.setdefault(last, []).append(key)
+
+    def candidates(self, values):
+        """The keys that may match an element with these values"""
+        nodes = [self._root]
+        for value in values:
+            next_nodes = []
+            for node in nodes:
+                try:
+                    child = node.get(value)
+                except TypeError:
+                    # an unhashable value is only matched by the wildcards
+                    child = None
+                if child is not None:
+                    next_nodes.append(child)
+                if self._ANY in node:
+                    next_nodes.append(node[self._ANY])
+            nodes = next_nodes
+            if not nodes:
+                return []
+
+        if len(nodes) == 1:
+            return nodes[0]
+        return sorted((key for keys in nodes for key in keys),
+                      key=self._order.get)
+
+
+class SubGraphPlan(object):
+    """The parts of matching a scenario sub-graph that depend only on it
+
+    Compiled once, when the scenario is added to the repository, and used by
+    the evaluator for every event that triggers the scenario:
+
+    - matching_plan: the MatchingPlan of the sub-graph
+    - switched plans: for each negative edge, the edge made positive and
+      the MatchingPlan of the sub-graph with it. They are used when the event
+      is on the negative edge itself, so the sub-graph is never changed
+    - connected components: for each action target, the ids of the sub-graph
+      vertices that are connected to it by positive edges
+    """
+
+    def __init__(self, subgraph, action_targets):
+        self.subgraph = subgraph
+        self.matching_plan = MatchingPlan(subgraph)
+        self._edges = {}
+        self._switched = {}
+        for vertex in subgraph.get_vertices():
+            for edge in subgraph.get_edges(vertex.vertex_id,
+                                           direction=Direction.OUT):
+                key = (edge.source_id, edge.target_id, edge.label)
+                self._edges[key] = edge
+                if edge.get(NEG_CONDITION):
+                    self._switched[key] = self._switch_edge(subgraph, edge)
+
+        self._connected_components = {}
+        for target in action_targets:
+            if target in self._connected_components:
+                continue
+            if not target or not subgraph.get_vertex(target):
+                self._connected_components[target] = frozenset()
+                continue
+            component = subgraph.algo.graph_query_vertices(
+                root_id=target,
+                edge_query_dict={'!=': {NEG_CONDITION: True}})
+            self._connected_components[target] = \
+                frozenset(v.vertex_id for v in component.get_vertices())
+
+    def get_edge(self, source_id, target_id, label):
+        return self._edges.get((source_id, target_id, label))
+
+    def switched(self, edge):
+        """The positive copy of a negative edge, and its MatchingPlan"""
+        return self._switched[(edge.source_id, edge.target_id, edge.label)]
+
+    def connected_component(self, target):
+        """The ids of the vertices connected to target by positive edges"""
+        return self._connected_components.get(target, frozenset())
+
+    @staticmethod
+    def _switch_edge(subgraph, edge):
+        switched_subgraph = subgraph.copy()
+        switched_edge = switched_subgraph.get_edge(edge.source_id,
+                                                   edge.target_id,
+                                                   edge.label)
+        switched_edge[NEG_CONDITION] = False
+        switched_edge[EProps.VITRAGE_IS_DELETED] = False
+        switched_subgraph.update_edge(switched_edge)
+        return switched_edge, MatchingPlan(switched_subgraph)
+
+
+def _indexed_values(properties):
+    return [properties.get(prop) for prop in INDEXED_PROPERTIES]
+
 
 class ScenarioRepository(object):
     def __init__(self, conf, worker_index=None, workers_num=None):
@@ -52,6 +189,8 @@ class ScenarioRepository(object):
         self.entity_equivalences = EquivalenceRepository().load(self._db)
         self.relationship_scenarios = defaultdict(list)
         self.entity_scenarios = defaultdict(list)
+        self._relationship_keys_index = ScenarioKeysIndex()
+        self._entity_keys_index = ScenarioKeysIndex()
         self._load_def_templates_from_db()
         self._load_templates_from_db()
         self._enable_worker_scenarios(worker_index, workers_num)
@@ -78,24 +217,26 @@ class ScenarioRepository(object):
         entity_key = vertex.properties
 
         scenarios = []
-        for scenario_key, value in self.entity_scenarios.items():
+        for scenario_key in self._entity_keys_index.candidates(
+                _indexed_values(entity_key)):
             if check_subset(entity_key, dict(scenario_key)):
+                value = self.entity_scenarios[scenario_key]
                 scenarios += [(e, s) for e, s in value if s.enabled]
         return scenarios
 
     def get_scenarios_by_edge(self, edge_description):
 
-        key = self._create_edge_scenario_key(edge_description)
+        source = edge_description.source.properties
+        target = edge_description.target.properties
         scenarios = []
 
-        for scenario_key, value in self.relationship_scenarios.items():
-
-            check_label = key.label == scenario_key.label
-            if check_label \
-                    and check_subset(dict(key.source),
-                                     dict(scenario_key.source)) \
-                    and check_subset(dict(key.target),
-                                     dict(scenario_key.target)):
+        for scenario_key in self._relationship_keys_index.candidates(
+                [edge_description.edge.label] +
+                _indexed_values(source) +
+                _indexed_values(target)):
+            if check_subset(source, dict(scenario_key.source)) \
+                    and check_subset(target, dict(scenario_key.target)):
+                value = self.relationship_scenarios[scenario_key]
                 scenarios += [(e, s) for e, s in value if s.enabled]
 
         return scenarios
@@ -141,6 +282,10 @@ class ScenarioRepository(object):
         return scenarios_out
 
     def _add_scenario(self, scenario):
+        action_targets = [action.targets.get(TemplateFields.TARGET)
+                          for action in scenario.actions]
+        scenario.subgraph_plans = [SubGraphPlan(subgraph, action_targets)
+                                   for subgraph in scenario.subgraphs]
         for entity in scenario.entities.values():
             self._add_entity_scenario(scenario, entity)
         for relationship in scenario.relationships.values():
@@ -182,6 +327,11 @@ class ScenarioRepository(object):
 
         key = self._create_edge_scenario_key(edge_desc)
         self.relationship_scenarios[key].append((edge_desc, scenario))
+        self._relationship_keys_index.add(
+            [key.label] +
+            _indexed_values(edge_desc.source.properties) +
+            _indexed_values(edge_desc.target.properties),
+            key)
 
     @staticmethod
     def _create_edge_scenario_key(edge_desc):
@@ -199,6 +349,7 @@ class ScenarioRepository(object):
 
         key = frozenset(list(entity.properties.items()))
         self.entity_scenarios[key].append((entity, scenario))
+        self._entity_keys_index.add(_indexed_values(entity.properties), key)
 
     def _enable_worker_scenarios(self, worker_ind, n):
         """Enable a portion of the scenarios"""
@@ -34,6 +34,8 @@ class Scenario(object):
         self.entities = entities
         self.relationships = relationships
         self.enabled = enabled
+        # compiled by the ScenarioRepository when the scenario is added
+        self.subgraph_plans = []
 
     def __eq__(self, other):
         return self.id == other.id and \
@@ -54,7 +54,8 @@ class GraphAlgorithm(object):
         pass
 
     @abc.abstractmethod
-    def sub_graph_matching(self, sub_graph, known_mappings, validate=False):
+    def sub_graph_matching(self, sub_graph, known_mappings, validate=False,
+                           plan=None):
         """Search for occurrences of a template graph in the graph
 
         In sub-graph matching algorithms complexity is high in the general case
@@ -63,6 +64,7 @@ class GraphAlgorithm(object):
         :type known_mappings: list
         :type sub_graph: driver.Graph
         :type validate: bool
+        :param plan: an already compiled MatchingPlan of sub_graph
         :rtype: list of dict
         """
         pass
@@ -54,7 +54,7 @@ class NXAlgorithm(GraphAlgorithm):
                              edge_query_dict=None):
         graph = self._create_new_graph('graph')
 
-        root_data = self.graph._g.node[root_id]
+        root_data = self._vertex_data(root_id)
 
         match_func = create_predicate(query_dict) if query_dict else None
         edge_match_func = create_predicate(edge_query_dict) \
@@ -67,7 +67,7 @@ class NXAlgorithm(GraphAlgorithm):
 
         n_result = []
         visited_nodes = set()
-        n_result.append((root_id, self.graph.get_vertex(root_id).properties))
+        n_result.append((root_id, root_data))
         e_result = []
         nodes_q = [(root_id, 0)]
         while nodes_q:
@@ -94,7 +94,8 @@ class NXAlgorithm(GraphAlgorithm):
     def sub_graph_matching(self,
                            subgraph,
                            known_match,
-                           validate=False):
+                           validate=False,
+                           plan=None):
         """Finds all the matching subgraphs in the graph
 
         In case the known_match has a subgraph edge with property
@@ -105,6 +106,7 @@ class NXAlgorithm(GraphAlgorithm):
         :param subgraph: the subgraph to match
         :param known_match: starting point at the subgraph and the graph
         :param validate:
+        :param plan: an already compiled MatchingPlan of the subgraph
         :return: all the matching subgraphs in the graph
         """
         sge = known_match.subgraph_element
@@ -114,32 +116,28 @@ class NXAlgorithm(GraphAlgorithm):
             source_matches = self._filtered_subgraph_matching(ge.source_id,
                                                               sge.source_id,
                                                               subgraph,
-                                                              validate)
+                                                              validate,
+                                                              plan)
             target_matches = self._filtered_subgraph_matching(ge.target_id,
                                                               sge.target_id,
                                                               subgraph,
-                                                              validate)
+                                                              validate,
+                                                              plan)
 
             return self._list_union(source_matches, target_matches)
         else:
             return subgraph_matching(self.graph,
                                      subgraph,
                                      [known_match],
-                                     validate)
+                                     validate,
+                                     plan)
 
     def create_graph_from_matching_vertices(self,
                                             vertex_attr_filter=None,
                                             query_dict=None,
                                             edge_attr_filter=None):
-        if query_dict:
-            vertices = self.graph.get_vertices(query_dict=query_dict)
-        elif vertex_attr_filter:
-            vertices = self.graph.get_vertices(
-                vertex_attr_filter=vertex_attr_filter)
-        else:
-            vertices = self.graph.get_vertices()
-
-        vertices_ids = [vertex.vertex_id for vertex in vertices]
+        vertices_ids = self._matching_vertices_ids(vertex_attr_filter,
+                                                   query_dict)
 
         graph = self._create_new_graph('graph')
         graph._g = self.graph._g.subgraph(vertices_ids).copy()
@@ -157,6 +155,21 @@ class NXAlgorithm(GraphAlgorithm):
 
         return graph
 
+    def _matching_vertices_ids(self, vertex_attr_filter, query_dict):
+        if query_dict:
+            vertices = self.graph.get_vertices(query_dict=query_dict,
+                                               read_only=True)
+        elif vertex_attr_filter:
+            vertices = self.graph.get_vertices(
+                vertex_attr_filter=vertex_attr_filter, read_only=True)
+        else:
+            vertices = self.graph.get_vertices(read_only=True)
+
+        return [vertex.vertex_id for vertex in vertices]
+
+    def _vertex_data(self, v_id):
+        return self.graph._g.node[v_id]
+
     def subgraph(self, entities):
         subgraph = self._create_new_graph('graph')
         subgraph._g = self.graph._g.subgraph(entities)
@@ -175,7 +188,8 @@ class NXAlgorithm(GraphAlgorithm):
                                     ge_v_id,
                                     sge_v_id,
                                     subgraph,
-                                    validate):
+                                    validate,
+                                    plan=None):
         """Runs subgraph_matching on edges vertices with filtering
 
         Runs subgraph_matching on edges vertices after checking if that vertex
@@ -187,7 +201,8 @@ class NXAlgorithm(GraphAlgorithm):
             template_vertex = subgraph.get_vertex(sge_v_id)
             graph_vertex = self.graph.get_vertex(ge_v_id)
             match = Mapping(template_vertex, graph_vertex, True)
-            return subgraph_matching(self.graph, subgraph, [match], validate)
+            return subgraph_matching(self.graph, subgraph, [match], validate,
+                                     plan)
 
         return []
 
@@ -0,0 +1,78 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from vitrage.graph.algo_driver.networkx_algorithm import NXAlgorithm
+from vitrage.graph.driver import Direction
+
+
+class SharedGraphAlgorithm(NXAlgorithm):
+    """Graph algorithms over a SharedGraph
+
+    The shared graph has no networkx graph to work on. The matching vertices
+    and edges are read from it into a new NXGraph, and the algorithms that
+    run on the resulting graphs are the ones of NXAlgorithm.
+    """
+
+    def create_graph_from_matching_vertices(self,
+                                            vertex_attr_filter=None,
+                                            query_dict=None,
+                                            edge_attr_filter=None):
+        graph = self.subgraph(self._matching_vertices_ids(vertex_attr_filter,
+                                                          query_dict))
+
+        # delete non matching edges
+        if edge_attr_filter:
+            self._apply_edge_attr_filter(graph, edge_attr_filter)
+
+        return graph
+
+    def subgraph(self, entities):
+        entities = set(entities)
+        vertices = [self.graph.get_vertex(v_id, read_only=True)
+                    for v_id in entities]
+        vertices = [v for v in vertices if v is not None]
+        edges = [e for v in vertices
+                 for e in self.graph.get_edges(v.vertex_id,
+                                               direction=Direction.OUT,
+                                               read_only=True)
+                 if e.target_id in entities]
+        return self._create_new_graph('graph', vertices=vertices, edges=edges)
+
+    def all_simple_paths(self, source, target):
+        if source == target:
+            return
+
+        path = [source]
+        children_stack = [iter(self._successors(source))]
+        while children_stack:
+            child = next(children_stack[-1], None)
+            if child is None:
+                children_stack.pop()
+                path.pop()
+            elif child == target:
+                yield path + [target]
+            elif child not in path:
+                path.append(child)
+                children_stack.append(iter(self._successors(child)))
+
+    def _successors(self, v_id):
+        edges = self.graph.get_edges(v_id, direction=Direction.OUT,
+                                     read_only=True)
+        return list(dict.fromkeys(e.target_id for e in edges))
+
+    def _vertex_data(self, v_id):
+        data = self.graph._vertex_data(v_id)
+        if data is None:
+            raise KeyError(v_id)
+        return data
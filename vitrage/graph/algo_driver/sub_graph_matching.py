@@ -12,6 +12,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import deque
+
 from oslo_log import log as logging
 import six
 
@@ -20,41 +22,41 @@ from vitrage.graph.filter import check_filter
 
 LOG = logging.getLogger(__name__)
 
-MAPPED_V_ID = 'mapped_v_id'
-NEIGHBORS_MAPPED = 'neighbors_mapped'
-GRAPH_VERTEX = 'graph_vertex'
 NEG_VERTEX = 'negative vertex'
 NEG_CONDITION = 'negative_condition'
 
 
-def subgraph_matching(base_graph, subgraph, matches, validate=False):
+def subgraph_matching(base_graph, subgraph, matches, validate=False,
+                      plan=None):
     """Find all occurrences of subgraph in the graph
 
-    In the following, a partial mapping is a copy of the sub-graph.
-    As we go, vertices of curr_mapping graph will be updated with new
-    fields used only for the traversal:
+    The sub-graph is first compiled into a MatchingPlan, where each sub-graph
+    vertex is identified by its index. A partial mapping is then a small
+    state of three tuples, indexed by the sub-graph vertices:
+
+     - mapped:
+       The vertex_id of the corresponding vertex in the graph (or
+       NEG_VERTEX). If it is not empty, than this vertex is already mapped
 
-     - MAPPED_V_ID:
-       The vertex_id of the corresponding vertex in the graph.
-       If it is not empty, than this vertex is already mapped
+     - graph_vertices:
+       The corresponding vertex in the graph
 
-     - NEIGHBORS_MAPPED:
-       True or None. When set True it means all the
-       neighbors of this vertex have already been mapped
+     - neighbors_mapped:
+       True when all the neighbors of this vertex have already been mapped
 
     Implementation Details:
     ----------------------
 
     - Init Step:
-      copy the sub-graph to create the first candidate mapping graph. In which
-      known vertices mappings are added to vertices MAPPED_V_ID. So, we now
-      have a sub-graph copy where some of the vertices already have a mapping
+      create the first partial mapping, in which the known vertices mappings
+      are set. So, we now have a state where some of the vertices already
+      have a mapping
 
     Main loop steps:
 
     - Steps 1:
-      Pop a partially mapped sub-graph from the queue.
-      If all its vertices have a MAPPED_V_ID, add it to final mappings
+      Pop a partial mapping from the queue.
+      If all its vertices are mapped, add it to final mappings
 
     - Steps 2 & 3:
       Find one template vertex that is not mapped but has a mapped neighbor
@@ -65,249 +67,257 @@ def subgraph_matching(base_graph, subgraph, matches, validate=False):
 
     - Step 5: CHECK STRUCTURE
       Filter candidate vertices according to edges
+
+    :param plan: an already compiled MatchingPlan of the subgraph
     """
-    final_subgraphs = []
-    initial_sg = _create_initial_subgraph(matches,
-                                          base_graph,
-                                          subgraph,
-                                          validate)
-    if not initial_sg:
+    final_mappings = []
+    plan = plan or MatchingPlan(subgraph)
+    initial_state = _create_initial_state(plan, matches, base_graph, validate)
+    if not initial_state:
         LOG.warning('subgraph_matching:Initial sub-graph creation failed')
         LOG.warning('subgraph_matching: Known matches: %s', str(matches))
-        return final_subgraphs
-    queue = [initial_sg]
+        return final_mappings
+    queue = deque([initial_state])
 
     while queue:
-        curr_subgraph = queue.pop(0)
+        mapped, graph_vertices, neighbors_mapped = queue.popleft()
 
         # STEP 1: STOPPING CONDITION
-        mapped_vertices = list(filter(
-            lambda v: v.get(MAPPED_V_ID),
-            curr_subgraph.get_vertices()))
-        if len(mapped_vertices) == subgraph.num_vertices():
-            final_subgraphs.append(curr_subgraph)
+        if all(mapped):
+            final_mappings.append((mapped, graph_vertices))
             continue
 
         # STEP 2: CAN WE THROW THIS SUB-GRAPH?
-        vertices_with_unmapped_neighbors = list(filter(
-            lambda v: not v.get(NEIGHBORS_MAPPED),
-            mapped_vertices))
+        vertices_with_unmapped_neighbors = \
+            [i for i, v_id in enumerate(mapped)
+             if v_id and not neighbors_mapped[i]]
         if not vertices_with_unmapped_neighbors:
             continue
 
         # STEP 3: FIND A SUB-GRAPH VERTEX TO MAP
-        v_with_unmapped_neighbors = _choose_vertex(
-            vertices_with_unmapped_neighbors,
-            curr_subgraph)
+        v_with_unmapped_neighbors = \
+            plan.choose_vertex(vertices_with_unmapped_neighbors)
 
-        unmapped_neighbors = list(filter(
-            lambda v: not v.get(MAPPED_V_ID),
-            curr_subgraph.neighbors(v_with_unmapped_neighbors.vertex_id)))
+        unmapped_neighbors = \
+            [i for i in plan.neighbors[v_with_unmapped_neighbors]
+             if not mapped[i]]
         if not unmapped_neighbors:
-            # Mark vertex as NEIGHBORS_MAPPED=True
-            v_with_unmapped_neighbors[NEIGHBORS_MAPPED] = True
-            curr_subgraph.update_vertex(v_with_unmapped_neighbors)
-            queue.append(curr_subgraph)
+            queue.append((mapped,
+                          graph_vertices,
+                          _replace(neighbors_mapped,
+                                   v_with_unmapped_neighbors,
+                                   True)))
             continue
-        subgraph_vertex_to_map = _choose_vertex(
+        subgraph_vertex_to_map = plan.choose_vertex(
             unmapped_neighbors,
-            curr_subgraph,
             curr_v=v_with_unmapped_neighbors)
 
         # STEP 4: PROPERTIES CHECK
-        graph_candidate_vertices = base_graph.neighbors(
-            v_id=v_with_unmapped_neighbors[MAPPED_V_ID],
-            vertex_attr_filter=subgraph_vertex_to_map)
-
-        graph_candidate_vertices = \
-            _remove_used_graph_candidates(graph_candidate_vertices,
-                                          curr_subgraph)
+        used_ids = set(v.vertex_id for v in graph_vertices if v is not None)
+        graph_candidate_vertices = [
+            v for v in base_graph.neighbors(
+                v_id=mapped[v_with_unmapped_neighbors],
+                vertex_attr_filter=plan.vertices[subgraph_vertex_to_map],
+                read_only=True)
+            if v.vertex_id not in used_ids]
 
         # STEP 5: STRUCTURE CHECK
-        edges = _get_edges_to_mapped_vertices(curr_subgraph,
-                                              subgraph_vertex_to_map.vertex_id)
-        neg_edges = set(e for e in edges if e.get(NEG_CONDITION))
-        pos_edges = edges.difference(neg_edges)
+        edges = plan.edges_to_mapped_vertices(subgraph_vertex_to_map, mapped)
+        neg_edges = [e for e in edges if e.negative]
+        pos_edges = [e for e in edges if not e.negative]
 
         if not graph_candidate_vertices and neg_edges and not pos_edges:
-            subgraph_vertex_to_map[MAPPED_V_ID] = NEG_VERTEX
-            curr_subgraph.update_vertex(subgraph_vertex_to_map)
-            queue.append(curr_subgraph)
+            queue.append((_replace(mapped, subgraph_vertex_to_map, NEG_VERTEX),
+                          graph_vertices,
+                          neighbors_mapped))
             continue
 
-        found_subgraphs = []
-        remaining_items = len(graph_candidate_vertices)
+        found_mappings = []
         for graph_vertex in graph_candidate_vertices:
-            subgraph_vertex_to_map[MAPPED_V_ID] = graph_vertex.vertex_id
-            subgraph_vertex_to_map[GRAPH_VERTEX] = graph_vertex
-            curr_subgraph.update_vertex(subgraph_vertex_to_map)
+            candidate_mapped = _replace(mapped,
+                                        subgraph_vertex_to_map,
+                                        graph_vertex.vertex_id)
             if not _graph_contains_subgraph_edges(base_graph,
-                                                  curr_subgraph,
+                                                  candidate_mapped,
                                                   pos_edges):
                 continue
             if not _graph_contains_subgraph_edges(base_graph,
-                                                  curr_subgraph,
+                                                  candidate_mapped,
                                                   neg_edges):
-                del found_subgraphs[:]
+                del found_mappings[:]
                 break
             if neg_edges and not pos_edges:
-                subgraph_vertex_to_map[MAPPED_V_ID] = NEG_VERTEX
-                curr_subgraph.update_vertex(subgraph_vertex_to_map)
+                candidate_mapped = _replace(mapped,
+                                            subgraph_vertex_to_map,
+                                            NEG_VERTEX)
 
-            remaining_items -= 1  # no need to copy the last one
-            found_subgraphs.append(
-                curr_subgraph.copy() if remaining_items else curr_subgraph)
+            found_mappings.append((candidate_mapped,
+                                   _replace(graph_vertices,
+                                            subgraph_vertex_to_map,
+                                            graph_vertex),
+                                   neighbors_mapped))
 
-        queue.extend(found_subgraphs)
+        queue.extend(found_mappings)
 
     # Last thing: Convert results to the expected format!
-    return _generate_result(final_subgraphs)
+    return _generate_result(plan, final_mappings)
 
 
-def _generate_result(final_subgraphs):
-    result = []
-    for mapping in final_subgraphs:
-        subgraph_vertices = dict()
-        for v in mapping.get_vertices():
-            v_id = v[MAPPED_V_ID]
-            if isinstance(v_id, six.string_types) and v_id is not NEG_VERTEX:
-                subgraph_vertices[v.vertex_id] = v[GRAPH_VERTEX]
-
-        if subgraph_vertices not in result:
-            result.append(subgraph_vertices)
-    return result
+class PlanEdge(object):
+    """A sub-graph edge, with the indices of its vertices in the plan"""
 
+    __slots__ = ('edge', 'source', 'target', 'negative')
 
-def _choose_vertex(vertices, subgraph, curr_v=None):
-    """Return a vertex with a positive edge if exists, otherwise the first one.
+    def __init__(self, edge, source, target):
+        self.edge = edge
+        self.source = source
+        self.target = target
+        self.negative = bool(edge.get(NEG_CONDITION))
 
-    """
-    for v in vertices:
-        curr_vertex_id = curr_v.vertex_id if curr_v else None
-        if not subgraph.get_edges(v.vertex_id, curr_vertex_id,
-                                  attr_filter={NEG_CONDITION: True}):
-            return v
-    return vertices.pop(0)
+    def other(self, index):
+        return self.target if self.source == index else self.source
 
 
-def _get_edges_to_mapped_vertices(graph, vertex_id):
-    """Get all edges (to/from) vertex where neighbor has a MAPPED_V_ID
+class MatchingPlan(object):
+    """The static structure of a sub-graph, as used for the matching
 
-    :type graph: driver.Graph
-    :type vertex_id: str
-    :rtype: set of driver.Edge
+    The sub-graph vertices are numbered by their order in the sub-graph, and
+    for each vertex the plan holds its properties filter, its neighbors and
+    its edges.
     """
-    subgraph_edges_to_mapped_vertices = []
-    for e in graph.get_edges(vertex_id):
-        t_neighbor = graph.get_vertex(e.other_vertex(vertex_id))
-        if not t_neighbor:
-            raise VitrageAlgorithmError('Cant get vertex for edge' + str(e))
-        if t_neighbor and t_neighbor.get(MAPPED_V_ID):
-            subgraph_edges_to_mapped_vertices.append(e)
-    return set(subgraph_edges_to_mapped_vertices)
 
+    def __init__(self, subgraph):
+        self.vertices = subgraph.get_vertices()
+        self.vertex_ids = [v.vertex_id for v in self.vertices]
+        self.index = {v_id: i for i, v_id in enumerate(self.vertex_ids)}
+
+        self.neighbors = []
+        self.edges = []
+        self.negative_peers = []
+        for v_id in self.vertex_ids:
+            neighbors = [self.index[n.vertex_id]
+                         for n in subgraph.neighbors(v_id)]
+            self.neighbors.append(sorted(set(neighbors), key=neighbors.index))
+
+            edges = [PlanEdge(e, self.index[e.source_id],
+                              self.index[e.target_id])
+                     for e in subgraph.get_edges(v_id)]
+            self.edges.append(edges)
+            self.negative_peers.append(set(
+                peer for e in edges if e.edge.get(NEG_CONDITION) is True
+                for peer in (e.source, e.target)))
+
+    def choose_vertex(self, vertices, curr_v=None):
+        """Return a vertex with a positive edge if exists, else the first one
+
+        Without curr_v, a vertex with no negative edges at all is chosen.
+        Otherwise, a vertex with no negative edges to curr_v.
+        """
+        for v in vertices:
+            negative_peers = self.negative_peers[v]
+            if curr_v is None and not negative_peers:
+                return v
+            if curr_v is not None and curr_v not in negative_peers:
+                return v
+        return vertices[0]
+
+    def edges_to_mapped_vertices(self, v, mapped):
+        """Get all edges (to/from) vertex where neighbor is mapped"""
+        return [e for e in self.edges[v] if mapped[e.other(v)]]
+
+
+def _replace(values, index, value):
+    return values[:index] + (value,) + values[index + 1:]
+
+
+def _generate_result(plan, final_mappings):
+    result = []
+    results_ids = set()
+    for mapped, graph_vertices in final_mappings:
+        subgraph_vertices = dict()
+        for i, v_id in enumerate(mapped):
+            if isinstance(v_id, six.string_types) and v_id is not NEG_VERTEX:
+                subgraph_vertices[plan.vertex_ids[i]] = graph_vertices[i]
 
-def _graph_contains_subgraph_edges(graph, subgraph, subgraph_edges):
+        ids = frozenset((sub_id, v.vertex_id)
+                        for sub_id, v in subgraph_vertices.items())
+        if ids not in results_ids:
+            results_ids.add(ids)
+            result.append(subgraph_vertices)
+    return result
+
+
+def _graph_contains_subgraph_edges(graph, mapped, subgraph_edges):
     """Check if graph contains all the expected edges
 
     For each (sub-graph) expected edge, check if a corresponding edge exists
     in the graph with relevant properties check
 
     :type graph: driver.Graph
-    :type subgraph: driver.Graph
-    :type subgraph_edges: set of driver.Edge
+    :type mapped: tuple
+    :type subgraph_edges: list of PlanEdge
     :rtype: bool
     """
     for e in subgraph_edges:
-        graph_v_id_source = subgraph.get_vertex(e.source_id).get(MAPPED_V_ID)
-        graph_v_id_target = subgraph.get_vertex(e.target_id).get(MAPPED_V_ID)
+        graph_v_id_source = mapped[e.source]
+        graph_v_id_target = mapped[e.target]
         if not graph_v_id_source or not graph_v_id_target:
-            raise VitrageAlgorithmError('Cant get vertex for edge' + str(e))
+            raise VitrageAlgorithmError('Cant get vertex for edge' +
+                                        str(e.edge))
         found_graph_edge = graph.get_edge(graph_v_id_source,
                                           graph_v_id_target,
-                                          e.label)
+                                          e.edge.label,
+                                          read_only=True)
 
-        if not found_graph_edge and e.get(NEG_CONDITION):
+        if not found_graph_edge and e.negative:
             continue
 
-        if not found_graph_edge or not check_filter(found_graph_edge, e,
+        if not found_graph_edge or not check_filter(found_graph_edge, e.edge,
                                                     NEG_CONDITION):
             return False
     return True
 
 
-def _create_initial_subgraph(known_matches, graph, subgraph, validate=False):
-    """Create initial mapping graph from sub graph and known matches
+def _create_initial_state(plan, known_matches, graph, validate=False):
+    """Create initial mapping state from known matches
 
-    copy the sub-graph to create the first candidate mapping graph.
-    In which known vertices mappings are added to vertices MAPPED_V_ID
+    In which known vertices mappings are added to the mapped vertices
     """
-    mapping = subgraph.copy()
+    num_vertices = len(plan.vertices)
+    state = [(None,) * num_vertices, (None,) * num_vertices]
     for match in known_matches:
         if match.is_vertex:
-            if not _update_mapping_for_vertex(match, mapping, graph, validate):
+            subgraph_index = plan.index[match.subgraph_element.vertex_id]
+            if not _update_mapping(plan, graph, state, subgraph_index,
+                                   match.graph_element.vertex_id, validate):
                 return None
-            subgraph_id = match.subgraph_element.vertex_id
-            edges = _get_edges_to_mapped_vertices(mapping, subgraph_id)
+            edges = plan.edges_to_mapped_vertices(subgraph_index, state[0])
 
         else:  # is edge
-            if not _update_mapping_for_edge(match, mapping, graph, validate):
+            sub_source = plan.index[match.subgraph_element.source_id]
+            sub_target = plan.index[match.subgraph_element.target_id]
+            if not _update_mapping(plan, graph, state, sub_source,
+                                   match.graph_element.source_id, validate):
                 return None
-            edges = _get_related_edges(mapping, match, subgraph, validate)
-        if not _graph_contains_subgraph_edges(graph, mapping, edges):
+            if not _update_mapping(plan, graph, state, sub_target,
+                                   match.graph_element.target_id, validate):
+                return None
+            edges = plan.edges_to_mapped_vertices(sub_source, state[0])
+            if not validate:  # no need to check the mapped edge
+                label = match.subgraph_element.label
+                edges = [e for e in edges
+                         if (e.source, e.target, e.edge.label) !=
+                         (sub_source, sub_target, label)]
+        if not _graph_contains_subgraph_edges(graph, state[0], edges):
             return None
-    return mapping
-
-
-def _get_related_edges(mapping, match, subgraph, validate):
-    sub_target_id = match.subgraph_element.target_id
-    sub_source_id = match.subgraph_element.source_id
-    edges = _get_edges_to_mapped_vertices(mapping, sub_source_id)
-    edges.union(_get_edges_to_mapped_vertices(mapping, sub_target_id))
-    if not validate:  # no need to check the mapped edge
-        known_edge = subgraph.get_edge(
-            sub_source_id,
-            sub_target_id,
-            match.subgraph_element.label
-        )
-        edges.remove(known_edge)
-    return edges
-
-
-def _update_mapping(subgraph, graph, subgraph_id, graph_id, validate):
-    subgraph_vertex = subgraph.get_vertex(subgraph_id)
-    graph_vertex = graph.get_vertex(graph_id)
+    return state[0], state[1], (False,) * num_vertices
+
+
+def _update_mapping(plan, graph, state, subgraph_index, graph_id, validate):
+    graph_vertex = graph.get_vertex(graph_id, read_only=True)
     if validate:
-        if not check_filter(graph_vertex, subgraph_vertex, MAPPED_V_ID):
+        if not check_filter(graph_vertex, plan.vertices[subgraph_index]):
             return False
-    subgraph_vertex[MAPPED_V_ID] = graph_id
-    subgraph_vertex[GRAPH_VERTEX] = graph_vertex
-    subgraph.update_vertex(subgraph_vertex)
+    state[0] = _replace(state[0], subgraph_index, graph_id)
+    state[1] = _replace(state[1], subgraph_index, graph_vertex)
     return True
-
-
-def _update_mapping_for_vertex(known_match, mapping, graph, validate):
-    subgraph_id = known_match.subgraph_element.vertex_id
-    graph_id = known_match.graph_element.vertex_id
-    return _update_mapping(mapping, graph, subgraph_id, graph_id, validate)
-
-
-def _update_mapping_for_edge(known_match, mapping, graph, validate):
-    s_id = known_match.graph_element.source_id
-    sub_s_id = known_match.subgraph_element.source_id
-    if not _update_mapping(mapping, graph, sub_s_id, s_id, validate):
-        return False
-
-    t_id = known_match.graph_element.target_id
-    sub_t_id = known_match.subgraph_element.target_id
-    return _update_mapping(mapping, graph, sub_t_id, t_id, validate)
-
-
-def _remove_used_graph_candidates(graph_candidate_vertices, curr_subgraph):
-    ver_to_remove = []
-    for candidate in graph_candidate_vertices:
-        for sub_ver in curr_subgraph.get_vertices():
-            if sub_ver.get(GRAPH_VERTEX, False) and \
-                    sub_ver[GRAPH_VERTEX].vertex_id == candidate.vertex_id:
-                ver_to_remove.append(candidate)
-    return [v for v in graph_candidate_vertices if v not in ver_to_remove]
@@ -173,3 +173,28 @@ class Edge(PropertiesElement):
                     target_id=self.target_id,
                     label=self.label,
                     properties=self.properties.copy())
+
+
+class ReadOnlyElementMixin(object):
+    """Read only view of a graph element
+
+    The properties of a view are the properties stored in the graph, and are
+    not copied. Hence a view reflects later changes to the graph element, and
+    must not be changed. Use copy() to get a modifiable element.
+    """
+
+    def __setitem__(self, key, value):
+        raise TypeError('%s does not support item assignment' %
+                        self.__class__.__name__)
+
+    def __delitem__(self, key):
+        raise TypeError('%s does not support item deletion' %
+                        self.__class__.__name__)
+
+
+class VertexView(ReadOnlyElementMixin, Vertex):
+    """Read only view of a graph vertex, see ReadOnlyElementMixin"""
+
+
+class EdgeView(ReadOnlyElementMixin, Edge):
+    """Read only view of a graph edge, see ReadOnlyElementMixin"""
@@ -186,19 +186,23 @@ class Graph(object):
             self.add_edge(e)
 
     @abc.abstractmethod
-    def get_vertex(self, v_id):
+    def get_vertex(self, v_id, read_only=False):
         """Fetch a vertex from the graph
 
         :param v_id: vertex id
         :type v_id: str
 
+        :param read_only: return read only views of the graph elements,
+                          instead of copies. See ReadOnlyElementMixin
+        :type read_only: bool
+
         :return: the vertex or None if it does not exist
         :rtype: Vertex
         """
         pass
 
     @abc.abstractmethod
-    def get_edge(self, source_id, target_id, label):
+    def get_edge(self, source_id, target_id, label, read_only=False):
         """Fetch an edge from the graph,
 
         Fetch an edge from the graph, according to its two vertices and label
@@ -212,6 +216,10 @@ class Graph(object):
         :param label: the label property of the edge
         :type label: str or None
 
+        :param read_only: return read only views of the graph elements,
+                          instead of copies. See ReadOnlyElementMixin
+        :type read_only: bool
+
         :return: The edge between the two vertices or None
         :rtype: Edge
         """
@@ -222,7 +230,8 @@ class Graph(object):
                   v1_id,
                   v2_id=None,
                   direction=Direction.BOTH,
-                  attr_filter=None):
+                  attr_filter=None,
+                  read_only=False):
         """Fetch multiple edges from the graph,
 
         Fetch all edges from the graph, according to its two vertices.
@@ -253,6 +262,10 @@ class Graph(object):
         :param attr_filter: expected keys and values
         :type attr_filter: dict
 
+        :param read_only: return read only views of the graph elements,
+                          instead of copies. See ReadOnlyElementMixin
+        :type read_only: bool
+
         :return: All edges matching the requirements
         :rtype: set of Edge
         """
@@ -324,7 +337,8 @@ class Graph(object):
     @abc.abstractmethod
     def get_vertices(self,
                      vertex_attr_filter=None,
-                     query_dict=None):
+                     query_dict=None,
+                     read_only=False):
         """Get vertices list with an optional match filter
 
         To filter the vertices, specify property values for
@@ -354,6 +368,9 @@ class Graph(object):
         :type vertex_attr_filter dict
         :param query_dict: expected query
         :type query_dict dict
+        :param read_only: return read only views of the graph elements,
+                          instead of copies. See ReadOnlyElementMixin
+        :type read_only: bool
         :return: A list of vertices that match the requested query
         :rtype: list of Vertex
         """
@@ -364,9 +381,8 @@ class Graph(object):
                             key_values_hash):
         """Get vertices list according to their hash key
 
-        The hash key is derived from their properties :
-        See processor_utils - get_defining_properties
-
+        The hash key is the vitrage_cached_id property of the vertices, the
+        md5 of their entity key. See TransformerBase.update_uuid_in_vertex
 
         :param key_values_hash: hash key
         :type key_values_hash str
@@ -375,7 +391,8 @@ class Graph(object):
 
     @abc.abstractmethod
     def neighbors(self, v_id, vertex_attr_filter=None,
-                  edge_attr_filter=None, direction=Direction.BOTH):
+                  edge_attr_filter=None, direction=Direction.BOTH,
+                  read_only=False):
         """Get vertices that are neighboring to v_id vertex
 
         To filter the neighboring vertices, specify property values for
@@ -417,6 +434,9 @@ class Graph(object):
         :type vertex_attr_filter dict
         :param edge_attr_filter: expected keys and values
         :type edge_attr_filter: dict
+        :param read_only: return read only views of the graph elements,
+                          instead of copies. See ReadOnlyElementMixin
+        :type read_only: bool
         :return: A list of vertices that match the requested query
         :rtype: list of Vertex
         """
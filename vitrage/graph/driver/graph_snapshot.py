@@ -0,0 +1,358 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import contextlib
+import gc
+
+import msgpack
+import networkx as nx
+from six.moves import cPickle
+
+from vitrage.common.exception import VitrageError
+from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import Vertex
+
+# A graph snapshot is a stream of msgpack objects:
+#   header: [MAGIC, VERSION, kind, metadata]
+#   tables: [table, new key sets, key set, columns], for the tables below
+#   end:    [END]
+# The tables are columnar. The rows of a table record are of vertices or
+# edges that have the same property keys (key set), and are stored as a
+# column per identifier field and a column per property. A column with few
+# distinct values is stored as a dictionary of the values, and their indexes.
+# The key sets are interned, each table record adds the key sets that first
+# appear in the snapshot.
+#
+# A BASE snapshot holds a whole graph, and a DELTA snapshot holds the changes
+# to be applied on top of the previous snapshot: the removed vertices and
+# edges, and the current properties of the vertices and edges that changed.
+
+MAGIC = 'vitrage.graph'
+VERSION = 1
+
+BASE = 'base'
+DELTA = 'delta'
+
+END = 0
+VERTICES = 1            # columns: vertex_id, properties
+EDGES = 2               # columns: source_id, target_id, label, properties
+REMOVED_VERTICES = 3    # columns: vertex_id
+REMOVED_EDGES = 4       # columns: source_id, target_id, label
+
+ROWS_PER_TABLE = 1000
+
+# column encodings
+_RAW = 0
+_DICTIONARY = 1
+
+# a column is dictionary encoded only if its first values repeat
+_DICTIONARY_SAMPLE = 32
+
+# property values that msgpack does not support are pickled
+_PICKLED = 1
+
+
+# the encoded start of the header list
+_HEADER_PREFIX = b'\x94' + msgpack.packb(MAGIC, use_bin_type=True)
+
+
+def _default(obj):
+    return msgpack.ExtType(_PICKLED,
+                           cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL))
+
+
+def _ext_hook(code, data):
+    if code == _PICKLED:
+        return cPickle.loads(data)
+    return msgpack.ExtType(code, data)
+
+
+def _encode_column(values):
+    # the value type is a part of the key, as True == 1
+    try:
+        sample = {(value.__class__, value)
+                  for value in values[:_DICTIONARY_SAMPLE]}
+    except TypeError:
+        # unhashable values
+        return [_RAW, values]
+    if len(sample) * 2 > min(len(values), _DICTIONARY_SAMPLE):
+        return [_RAW, values]
+
+    distinct = {}
+    try:
+        indexes = [distinct.setdefault((value.__class__, value),
+                                       len(distinct))
+                   for value in values]
+    except TypeError:
+        return [_RAW, values]
+    if len(distinct) * 2 > len(values):
+        return [_RAW, values]
+    return [_DICTIONARY, [value for _, value in distinct], indexes]
+
+
+def _decode_column(column):
+    if column[0] == _DICTIONARY:
+        distinct = column[1]
+        return [distinct[i] for i in column[2]]
+    return column[1]
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Creating many containers at once triggers needless gc collections"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class GraphChanges(object):
+    """The graph changes since the last snapshot
+
+    Subscribed to the graph, to write the next snapshot as a delta.
+    """
+
+    def __init__(self):
+        self.vertices = set()
+        self.edges = set()
+        self.removed_vertices = set()
+
+    def __len__(self):
+        return len(self.vertices) + len(self.edges)
+
+    def add(self, before, current, is_vertex, graph):
+        item = current if current is not None else before
+        if item is None:
+            return
+        if is_vertex:
+            self.vertices.add(item.vertex_id)
+            if current is None:
+                self.removed_vertices.add(item.vertex_id)
+        else:
+            self.edges.add((item.source_id, item.target_id, item.label))
+
+    def pop(self):
+        """Take the changes so far, and start tracking anew"""
+        changes = GraphChanges()
+        changes.vertices, self.vertices = self.vertices, set()
+        changes.edges, self.edges = self.edges, set()
+        changes.removed_vertices, self.removed_vertices = \
+            self.removed_vertices, set()
+        return changes
+
+    def merge(self, changes):
+        """Add back changes that were popped, but not stored"""
+        self.vertices.update(changes.vertices)
+        self.edges.update(changes.edges)
+        self.removed_vertices.update(changes.removed_vertices)
+
+
+def write_snapshot(graph, metadata=None, changes=None):
+    """Encode a snapshot of the graph, in chunks
+
+    :param graph: the graph to write
+    :type graph: NXGraph
+    :param metadata: stored in the snapshot header
+    :param changes: write a delta snapshot of these changes
+    :type changes: GraphChanges
+    :return: a generator of the encoded snapshot chunks
+    """
+    packer = msgpack.Packer(default=_default, use_bin_type=True)
+    key_sets = {}
+    new_key_sets = []
+    kind = BASE if changes is None else DELTA
+    yield packer.pack([MAGIC, VERSION, kind, metadata or {}])
+
+    def record(table, key_set, rows):
+        index = key_sets.get(key_set)
+        if index is None:
+            index = key_sets[key_set] = len(key_sets)
+            new_key_sets.append(key_set)
+        with _gc_paused():
+            columns = [_encode_column(list(column)) for column in zip(*rows)]
+            data = packer.pack([table, new_key_sets, index, columns])
+        del new_key_sets[:]
+        return data
+
+    def tables(table, elements):
+        """Encode the (ids, properties) elements of a table"""
+        rows_by_key_set = {}
+        for ids, properties in elements:
+            key_set = tuple(properties) if properties else ()
+            rows = rows_by_key_set.setdefault(key_set, [])
+            rows.append(ids + tuple(properties.values())
+                        if properties else ids)
+            if len(rows) == ROWS_PER_TABLE:
+                yield record(table, key_set, rows)
+                del rows_by_key_set[key_set]
+        for key_set, rows in rows_by_key_set.items():
+            yield record(table, key_set, rows)
+
+    g = graph._g
+    if changes is None:
+        vertices = g.nodes(data=True)
+        edges = g.edges(keys=True, data=True)
+    else:
+        vertices, edges = _changed_elements(g, changes)
+        for chunk in tables(REMOVED_VERTICES,
+                            (((v_id,), None)
+                             for v_id in changes.removed_vertices)):
+            yield chunk
+        for chunk in tables(REMOVED_EDGES,
+                            ((edge, None) for edge in changes.edges
+                             if not g.has_edge(*edge))):
+            yield chunk
+
+    for chunk in tables(VERTICES,
+                        (((v_id,), data) for v_id, data in vertices)):
+        yield chunk
+    for chunk in tables(EDGES,
+                        (((u, v, label), data)
+                         for u, v, label, data in edges)):
+        yield chunk
+    yield packer.pack([END])
+
+
+def _changed_elements(g, changes):
+    vertices = [(v_id, g.node[v_id]) for v_id in changes.vertices
+                if v_id in g]
+    edges = {(u, v, label) for u, v, label in changes.edges
+             if g.has_edge(u, v, label)}
+    # the edges of a removed vertex were removed with it, so all the edges
+    # of a vertex that was added back are written
+    for v_id in changes.removed_vertices:
+        if v_id in g:
+            edges.update(g.out_edges(v_id, keys=True))
+            edges.update(g.in_edges(v_id, keys=True))
+    edges = [(u, v, label, g.adj[u][v][label]) for u, v, label in edges]
+    return vertices, edges
+
+
+def read_snapshot(data, graph):
+    """Load a snapshot into the graph
+
+    A base snapshot replaces the graph, and a delta snapshot is applied on
+    top of it.
+
+    :param data: the encoded snapshot
+    :param graph: the graph to load
+    :type graph: NXGraph
+    :return: the snapshot kind and metadata
+    """
+    unpacker = msgpack.Unpacker(ext_hook=_ext_hook, raw=False,
+                                max_buffer_size=len(data) or 1)
+    unpacker.feed(data)
+    kind, metadata = _read_header(unpacker)
+
+    key_sets = []
+    if kind == BASE:
+        g = nx.MultiDiGraph()
+        handlers = {
+            VERTICES: lambda ids, properties: g.add_nodes_from(
+                zip(ids[0], properties)),
+            EDGES: lambda ids, properties: g.add_edges_from(
+                zip(ids[0], ids[1], ids[2], properties)),
+        }
+    else:
+        handlers = _delta_handlers(graph)
+
+    with _gc_paused():
+        for record in unpacker:
+            table = record[0]
+            if table == END:
+                break
+            handler = handlers.get(table)
+            if handler is None:
+                raise VitrageError(
+                    'Unexpected table %s in a %s graph snapshot', table, kind)
+            key_sets.extend(record[1])
+            keys = key_sets[record[2]]
+            columns = [_decode_column(column) for column in record[3]]
+            ids = columns[:len(columns) - len(keys)]
+            if keys:
+                properties = (dict(zip(keys, values))
+                              for values in zip(*columns[len(ids):]))
+            else:
+                properties = ({} for _ in ids[0])
+            handler(ids, properties)
+        else:
+            raise VitrageError('Graph snapshot is truncated')
+
+    if kind == BASE:
+        graph._g = g
+    return kind, metadata
+
+
+def read_snapshot_header(data):
+    """The snapshot kind and metadata, without loading the snapshot"""
+    unpacker = msgpack.Unpacker(ext_hook=_ext_hook, raw=False,
+                                max_buffer_size=len(data) or 1)
+    unpacker.feed(data)
+    return _read_header(unpacker)
+
+
+def is_snapshot(data):
+    """Whether the data is a snapshot, or a graph stored in another format"""
+    return data[:len(_HEADER_PREFIX)] == _HEADER_PREFIX
+
+
+def _read_header(unpacker):
+    try:
+        magic, version, kind, metadata = next(unpacker)
+    except Exception:
+        raise VitrageError('Not a graph snapshot')
+    if magic != MAGIC or kind not in (BASE, DELTA):
+        raise VitrageError('Not a graph snapshot')
+    if version > VERSION:
+        raise VitrageError('Unsupported graph snapshot version %s', version)
+    return kind, metadata
+
+
+def _delta_handlers(graph):
+    def remove_vertices(ids, _):
+        for v_id in ids[0]:
+            if graph.get_vertex(v_id, read_only=True) is not None:
+                graph.remove_vertex(Vertex(v_id))
+
+    def remove_edges(ids, _):
+        for source_id, target_id, label in zip(*ids):
+            if graph.get_edge(source_id, target_id, label, read_only=True):
+                graph.remove_edge(Edge(source_id, target_id, label))
+
+    def update_vertices(ids, properties):
+        for v_id, props in zip(ids[0], properties):
+            orig = graph.get_vertex(v_id, read_only=True)
+            if orig is not None:
+                props.update((key, None) for key in orig.properties
+                             if key not in props)
+            graph.update_vertex(Vertex(v_id, props))
+
+    def update_edges(ids, properties):
+        for source_id, target_id, label, props in zip(ids[0], ids[1], ids[2],
+                                                      properties):
+            orig = graph.get_edge(source_id, target_id, label, read_only=True)
+            if orig is not None:
+                props.update((key, None) for key in orig.properties
+                             if key not in props)
+            graph.update_edge(Edge(source_id, target_id, label, props))
+
+    return {
+        REMOVED_VERTICES: remove_vertices,
+        REMOVED_EDGES: remove_edges,
+        VERTICES: update_vertices,
+        EDGES: update_edges,
+    }
@@ -24,10 +24,14 @@ from oslo_log import log as logging
 from vitrage.common.constants import VertexProperties as VProps
 from vitrage.graph.algo_driver.networkx_algorithm import NXAlgorithm
 from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import EdgeView
 from vitrage.graph.driver.elements import Vertex
+from vitrage.graph.driver.elements import VertexView
 from vitrage.graph.driver.graph import Direction
 from vitrage.graph.driver.graph import Graph
 from vitrage.graph.driver.notifier import Notifier
+from vitrage.graph.driver.vertex_index import DEFAULT_INDEXED_PROPERTIES
+from vitrage.graph.driver.vertex_index import VertexIndex
 from vitrage.graph.filter import check_filter
 from vitrage.graph.query import create_predicate
 
@@ -43,6 +47,15 @@ def vertex_copy(v_id, data):
     return Vertex(vertex_id=v_id, properties=copy.copy(data))
 
 
+def edge_view(source_id, target_id, label, data):
+    return EdgeView(source_id=source_id, target_id=target_id,
+                    label=label, properties=data)
+
+
+def vertex_view(v_id, data):
+    return VertexView(vertex_id=v_id, properties=data)
+
+
 class NXGraph(Graph):
 
     GRAPH_TYPE = "networkx"
@@ -50,8 +63,10 @@ class NXGraph(Graph):
     def __init__(self,
                  name='networkx_graph',
                  vertices=None,
-                 edges=None):
+                 edges=None,
+                 indexed_properties=DEFAULT_INDEXED_PROPERTIES):
         super(NXGraph, self).__init__(name, NXGraph.GRAPH_TYPE)
+        self._vertex_index = VertexIndex(indexed_properties)
         self._g = nx.MultiDiGraph()
         self.add_vertices(vertices)
         self.add_edges(edges)
@@ -59,6 +74,17 @@ class NXGraph(Graph):
     def __len__(self):
         return len(self._g)
 
+    @property
+    def _g(self):
+        return self._nx_graph
+
+    @_g.setter
+    def _g(self, nx_graph):
+        # The networkx graph is replaced as a whole when restoring or
+        # uniting graphs, and by the graph algorithms
+        self._nx_graph = nx_graph
+        self._vertex_index.rebuild(nx_graph.nodes(data=True))
+
     @property
     def algo(self):
         return NXAlgorithm(self)
@@ -70,7 +96,8 @@ class NXGraph(Graph):
         edges_iter = self._g.edges(data=True, keys=True)
         edges = [Edge(source_id=u, target_id=v, label=l, properties=data)
                  for u, v, l, data in edges_iter]
-        return NXGraph(self.name, vertices, edges)
+        return NXGraph(self.name, vertices, edges,
+                       indexed_properties=self._vertex_index.properties)
 
     @Notifier.update_notify
     def add_vertex(self, v):
@@ -82,12 +109,22 @@ class NXGraph(Graph):
         self._add_vertex(v)
 
     def _add_vertex(self, v):
+        orig_prop = self._g.node.get(v.vertex_id)
+        old_indexed = self._vertex_index.snapshot(orig_prop) \
+            if orig_prop is not None else None
+
         properties_copy = copy.copy(v.properties)
         if properties_copy:
             self._g.add_node(v.vertex_id, **properties_copy)
         else:
             self._g.add_node(v.vertex_id)
 
+        new_prop = self._g.node[v.vertex_id]
+        if old_indexed is None:
+            self._vertex_index.add(v.vertex_id, new_prop)
+        else:
+            self._vertex_index.update(v.vertex_id, old_indexed, new_prop)
+
     @Notifier.update_notify
     def add_edge(self, e):
         """Add an edge to the graph
@@ -98,6 +135,10 @@ class NXGraph(Graph):
         self._add_edge(e)
 
     def _add_edge(self, e):
+        # networkx implicitly adds the missing vertices of the edge
+        new_vertices = [v_id for v_id in (e.source_id, e.target_id)
+                        if v_id not in self._g]
+
         properties_copy = copy.copy(e.properties)
         if properties_copy:
             self._g.add_edge(e.source_id, e.target_id,
@@ -105,18 +146,22 @@ class NXGraph(Graph):
         else:
             self._g.add_edge(e.source_id, e.target_id, e.label)
 
-    def get_vertex(self, v_id):
+        for v_id in new_vertices:
+            self._vertex_index.add(v_id, self._g.node[v_id])
+
+    def get_vertex(self, v_id, read_only=False):
         """Fetch a vertex from the graph
 
         :rtype: Vertex
         """
         properties = self._g.node.get(v_id, None)
         if properties is not None:
-            return vertex_copy(v_id, properties)
+            return vertex_view(v_id, properties) if read_only \
+                else vertex_copy(v_id, properties)
         LOG.debug("get_vertex item not found. v_id=%s", str(v_id))
         return None
 
-    def get_edge(self, source_id, target_id, label):
+    def get_edge(self, source_id, target_id, label, read_only=False):
         try:
             properties = self._g.adj[source_id][target_id][label]
         except KeyError:
@@ -124,14 +169,17 @@ class NXGraph(Graph):
                       "label=%s", str(source_id), str(target_id), str(label))
             return None
         if properties is not None:
-            return edge_copy(source_id, target_id, label, properties)
+            return edge_view(source_id, target_id, label, properties) \
+                if read_only else edge_copy(source_id, target_id, label,
+                                            properties)
         return None
 
     def get_edges(self,
                   v1_id,
                   v2_id=None,
                   direction=Direction.BOTH,
-                  attr_filter=None):
+                  attr_filter=None,
+                  read_only=False):
         """Fetch multiple edges from the graph
 
         :rtype: set of Edge
@@ -142,7 +190,8 @@ class NXGraph(Graph):
         nodes, edges = self._neighboring_nodes_edges_query(
             v1_id, edge_predicate=check_edge, direction=direction)
 
-        edge_copies = set(edge_copy(u, v, label, data)
+        make_edge = edge_view if read_only else edge_copy
+        edge_copies = set(make_edge(u, v, label, data)
                           for u, v, label, data in edges)
 
         if v2_id:
@@ -187,6 +236,7 @@ class NXGraph(Graph):
             self._add_vertex(v)
             return
 
+        old_indexed = self._vertex_index.snapshot(orig_prop)
         merged_props = \
             self._merged_properties(orig_prop, v.properties, overwrite)
         self._g.node[v.vertex_id].update(merged_props)
@@ -195,6 +245,9 @@ class NXGraph(Graph):
             if value is None:
                 del self._g.node[v.vertex_id][prop]
 
+        self._vertex_index.update(v.vertex_id, old_indexed,
+                                  self._g.node[v.vertex_id])
+
     @Notifier.update_notify
     def update_edge(self, e):
         """Update the edge properties
@@ -219,8 +272,9 @@ class NXGraph(Graph):
 
         :type v: Vertex
         """
-
+        orig_prop = self._g.node.get(v.vertex_id)
         self._g.remove_node(n=v.vertex_id)
+        self._vertex_index.remove(v.vertex_id, orig_prop)
 
     @Notifier.update_notify
     def remove_edge(self, e):
@@ -232,35 +286,42 @@ class NXGraph(Graph):
 
     def get_vertices(self,
                      vertex_attr_filter=None,  # Dictionary of key value
-                     query_dict=None):
-        def check_vertex(vertex_data):
-            return check_filter(vertex_data[1], vertex_attr_filter)
-
+                     query_dict=None,
+                     read_only=False):
+        make_vertex = vertex_view if read_only else vertex_copy
         if not query_dict:
-            items = filter(check_vertex, list(self._g.nodes(data=True)))
-            return [vertex_copy(node, node_data) for node, node_data in items]
+            candidates = self._vertex_index.filter_candidates(
+                vertex_attr_filter)
+            return [make_vertex(node, node_data) for node, node_data
+                    in self._candidate_nodes(candidates)
+                    if check_filter(node_data, vertex_attr_filter)]
         elif not vertex_attr_filter:
-            vertices = []
             match_func = create_predicate(query_dict)
-            for node, node_data in list(self._g.nodes(data=True)):
-                v = vertex_copy(node, node_data)
-                if match_func(v):
-                    vertices.append(v)
-            return vertices
+            candidates = self._vertex_index.query_candidates(
+                match_func.index_terms)
+            return [make_vertex(node, node_data) for node, node_data
+                    in self._candidate_nodes(candidates)
+                    if match_func(node_data)]
         else:
             return []
 
-    def get_vertices_by_key(self, key_values_hash):
+    def _candidate_nodes(self, candidates):
+        """The (node, data) pairs of the candidate ids, or of all nodes
 
-        if key_values_hash in self.key_to_vertex_ids:
-            vertices = []
-            for vertex_id in self.key_to_vertex_ids[key_values_hash]:
-                vertices.append(self.get_vertex(vertex_id))
-            return vertices
-        return []
+        :param candidates: vertex ids found by the vertex index, or None if
+                           the index could not narrow down the search
+        """
+        if candidates is None:
+            return list(self._g.nodes(data=True))
+        nodes = self._g.node
+        return [(node, nodes[node]) for node in candidates if node in nodes]
+
+    def get_vertices_by_key(self, key_values_hash):
+        return self.get_vertices(
+            vertex_attr_filter={VProps.VITRAGE_CACHED_ID: key_values_hash})
 
     def neighbors(self, v_id, vertex_attr_filter=None, edge_attr_filter=None,
-                  direction=Direction.BOTH):
+                  direction=Direction.BOTH, read_only=False):
 
         def check_edge(edge_data):
             return check_filter(edge_data, edge_attr_filter)
@@ -271,7 +332,8 @@ class NXGraph(Graph):
         nodes, edges = self._neighboring_nodes_edges_query(
             v_id=v_id, vertex_predicate=check_vertex,
             edge_predicate=check_edge, direction=direction)
-        vertices = [vertex_copy(n, data) for n, data in nodes]
+        make_vertex = vertex_view if read_only else vertex_copy
+        vertices = [make_vertex(n, data) for n, data in nodes]
         return vertices
 
     def _neighboring_nodes_edges_query(self, v_id,
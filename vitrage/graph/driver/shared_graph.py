@@ -0,0 +1,671 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import array
+import bisect
+import mmap
+from operator import itemgetter
+import os
+import six
+from six.moves import cPickle
+from six.moves import range
+import struct
+
+from oslo_log import log as logging
+
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.common.exception import VitrageError
+from vitrage.graph.algo_driver.shared_graph_algorithm import \
+    SharedGraphAlgorithm
+from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import Vertex
+from vitrage.graph.driver.graph import Direction
+from vitrage.graph.driver.graph import Graph
+from vitrage.graph.driver.networkx_graph import edge_copy
+from vitrage.graph.driver.networkx_graph import edge_view
+from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.graph.driver.networkx_graph import vertex_copy
+from vitrage.graph.driver.networkx_graph import vertex_view
+from vitrage.graph.driver.vertex_index import DEFAULT_INDEXED_PROPERTIES
+from vitrage.graph.driver.vertex_index import VertexIndex
+from vitrage.graph.filter import check_filter
+from vitrage.graph.query import create_predicate
+
+LOG = logging.getLogger(__name__)
+
+# the snapshot index also serves the key lookups of get_vertices_by_key
+SNAPSHOT_INDEXED_PROPERTIES = \
+    DEFAULT_INDEXED_PROPERTIES + (VProps.VITRAGE_CACHED_ID,)
+
+# Snapshot file layout: a header, followed by the sections below.
+# Vertices are stored sorted by their encoded id, and are referred to by
+# their position in this order. Edges are stored sorted by their source
+# position, so the out edges of a vertex are a contiguous range of edges.
+_IDS = 0            # encoded vertex ids
+_ID_OFFSETS = 1     # (n + 1) offsets of the ids in _IDS
+_VERTICES = 2       # pickled (vertex_id, properties)
+_VERTEX_OFFSETS = 3
+_EDGES = 4          # pickled (label, properties)
+_EDGE_OFFSETS = 5
+_EDGE_ENDS = 6      # (source position, target position) of each edge
+_OUT_START = 7      # (n + 1) index of the first out edge of each vertex
+_IN_START = 8       # (n + 1) index in _IN_EDGES of the first in edge
+_IN_EDGES = 9       # edges sorted by their target position
+_INDEX = 10         # pickled vertex index, see _write_index
+_NUM_SECTIONS = 11
+
+_MAGIC = b'VTRGRPH1'
+_HEADER = struct.Struct('<8sII%dQ' % _NUM_SECTIONS)
+_OFFSET = struct.Struct('<Q')
+_RANGE = struct.Struct('<QQ')
+_POSITION = struct.Struct('<I')
+_POSITION_RANGE = struct.Struct('<II')
+
+
+def _encode_id(v_id):
+    if isinstance(v_id, six.string_types):
+        return b's' + v_id.encode('utf-8')
+    return b'p' + cPickle.dumps(v_id, cPickle.HIGHEST_PROTOCOL)
+
+
+def _decode_id(data):
+    if data[:1] == b's':
+        return data[1:].decode('utf-8')
+    return cPickle.loads(data[1:])
+
+
+def _pack_positions(positions):
+    return struct.pack('<%dI' % len(positions), *positions)
+
+
+def _unpack_positions(data):
+    return struct.unpack('<%dI' % (len(data) // _POSITION.size), data)
+
+
+class _Positions(array.array):
+    """Sorted vertex positions, with a binary search membership test"""
+
+    def __contains__(self, position):
+        i = bisect.bisect_left(self, position)
+        return i < len(self) and self[i] == position
+
+
+class _SnapshotIndex(VertexIndex):
+    """A VertexIndex of the snapshot, from property values to positions"""
+
+    def __init__(self, indexes, unhashable):
+        super(_SnapshotIndex, self).__init__(list(indexes))
+        self._indexes = indexes
+        self._unhashable = unhashable
+
+
+class _SnapshotFile(object):
+    """Read only access to a memory mapped graph snapshot
+
+    Only the vertex index is loaded into the process memory. Vertices and
+    edges are unpickled from the mapped file when they are accessed, so the
+    pages of the file are shared by all the processes mapping it.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._mm, 0)
+        if header[0] != _MAGIC:
+            raise VitrageError('%s is not a graph snapshot' % path)
+        self.num_vertices = header[1]
+        self.num_edges = header[2]
+        self._sections = header[3:]
+        self.index = self._read_index()
+
+    def position(self, v_id):
+        """The position of the vertex in the snapshot, or None"""
+        key = _encode_id(v_id)
+        low, high = 0, self.num_vertices
+        while low < high:
+            mid = (low + high) // 2
+            if self._record(_IDS, _ID_OFFSETS, mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.num_vertices and \
+                self._record(_IDS, _ID_OFFSETS, low) == key:
+            return low
+        return None
+
+    def vertex_id(self, position):
+        return _decode_id(self._record(_IDS, _ID_OFFSETS, position))
+
+    def vertex(self, position):
+        """The (vertex_id, properties) of the vertex at position"""
+        return cPickle.loads(
+            self._record(_VERTICES, _VERTEX_OFFSETS, position))
+
+    def edge(self, edge):
+        """The (source position, target position, label, properties)"""
+        source, target = _POSITION_RANGE.unpack_from(
+            self._mm, self._sections[_EDGE_ENDS] + _POSITION_RANGE.size * edge)
+        label, data = cPickle.loads(self._record(_EDGES, _EDGE_OFFSETS, edge))
+        return source, target, label, data
+
+    def out_edges(self, position):
+        return range(*self._positions_range(_OUT_START, position))
+
+    def in_edges(self, position):
+        start, end = self._positions_range(_IN_START, position)
+        base = self._sections[_IN_EDGES]
+        return _unpack_positions(self._mm[base + _POSITION.size * start:
+                                          base + _POSITION.size * end])
+
+    def _record(self, section, offsets, i):
+        start, end = _RANGE.unpack_from(
+            self._mm, self._sections[offsets] + _OFFSET.size * i)
+        base = self._sections[section]
+        return self._mm[base + start:base + end]
+
+    def _positions_range(self, section, position):
+        return _POSITION_RANGE.unpack_from(
+            self._mm, self._sections[section] + _POSITION.size * position)
+
+    def _read_index(self):
+        base = self._sections[_INDEX]
+        indexes, unhashable = cPickle.loads(self._mm[base:])
+        indexes = {
+            prop: {value: _Positions('I', _unpack_positions(positions))
+                   for value, positions in values.items()}
+            for prop, values in indexes.items()}
+        unhashable = {
+            prop: _Positions('I', _unpack_positions(positions))
+            for prop, positions in unhashable.items()}
+        return _SnapshotIndex(indexes, unhashable)
+
+
+class _GraphState(object):
+    """A mapped snapshot, and the overlay of the changes made after it"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        # vertex_id -> properties, of the vertices added after the snapshot
+        self.vertices = {}
+        # (source_id, target_id, label) -> properties, likewise for edges
+        self.edges = {}
+        # vertex_id -> {edge key: None}, the overlay edges of each vertex
+        self.adjacent = {}
+        # positions of the removed, or overlaid, snapshot vertices and edges
+        self.hidden_vertices = set()
+        self.hidden_edges = set()
+
+
+class SharedGraph(Graph):
+    """A read only graph, shared between processes through a snapshot file
+
+    The graph is a memory mapped snapshot of an NXGraph, written by
+    write_snapshot. The changes made to the graph after the snapshot was
+    written are kept in a small in-memory overlay of the vertices and edges
+    that were added, updated or removed, until a newer snapshot is loaded.
+
+    The snapshot and its overlay are a single state, which load replaces
+    at once. Every query reads the state once, so a query that runs while
+    a newer snapshot is loaded sees either the old or the new one.
+    """
+
+    GRAPH_TYPE = 'shared'
+
+    def __init__(self, path, name='shared_graph'):
+        super(SharedGraph, self).__init__(name, SharedGraph.GRAPH_TYPE)
+        self._state = None
+        self.load(path)
+
+    def __len__(self):
+        return self.num_vertices()
+
+    @property
+    def algo(self):
+        return SharedGraphAlgorithm(self)
+
+    def load(self, path):
+        """Map a newer snapshot of the graph, dropping the overlay"""
+        snapshot = _SnapshotFile(path)
+        self._state = _GraphState(snapshot)
+        LOG.info('Loaded graph snapshot %s: %s vertices, %s edges',
+                 path, snapshot.num_vertices, snapshot.num_edges)
+
+    @staticmethod
+    def write_snapshot(graph, path,
+                       indexed_properties=SNAPSHOT_INDEXED_PROPERTIES):
+        """Write a snapshot of an NXGraph, to be loaded by SharedGraph
+
+        The file is written aside and then renamed, so a snapshot that is
+        being loaded is always complete.
+
+        :type graph: NXGraph
+        """
+        nodes = sorted(((_encode_id(v_id), v_id, data)
+                        for v_id, data in graph._g.nodes(data=True)),
+                       key=itemgetter(0))
+        positions = {v_id: i for i, (_, v_id, _) in enumerate(nodes)}
+        edges = sorted(((positions[u], positions[v], label, data)
+                        for u, v, label, data
+                        in graph._g.edges(keys=True, data=True)),
+                       key=itemgetter(0))
+
+        out_start = [0] * (len(nodes) + 1)
+        in_start = [0] * (len(nodes) + 1)
+        for source, target, _, _ in edges:
+            out_start[source + 1] += 1
+            in_start[target + 1] += 1
+        for i in range(len(nodes)):
+            out_start[i + 1] += out_start[i]
+            in_start[i + 1] += in_start[i]
+        in_edges = sorted(range(len(edges)), key=lambda e: edges[e][1])
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(b'\0' * _HEADER.size)
+            sections = [0] * _NUM_SECTIONS
+
+            def write_section(section, data):
+                sections[section] = f.tell()
+                f.write(data)
+
+            def write_records(section, offsets, records):
+                sections[section] = f.tell()
+                ends = [0]
+                for record in records:
+                    f.write(record)
+                    ends.append(ends[-1] + len(record))
+                write_section(offsets, struct.pack('<%dQ' % len(ends), *ends))
+
+            def dumps(obj):
+                return cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+
+            write_records(_IDS, _ID_OFFSETS, (key for key, _, _ in nodes))
+            write_records(_VERTICES, _VERTEX_OFFSETS,
+                          (dumps((v_id, data)) for _, v_id, data in nodes))
+            write_records(_EDGES, _EDGE_OFFSETS,
+                          (dumps((label, data))
+                           for _, _, label, data in edges))
+            write_section(_EDGE_ENDS, b''.join(
+                _POSITION_RANGE.pack(source, target)
+                for source, target, _, _ in edges))
+            write_section(_OUT_START, _pack_positions(out_start))
+            write_section(_IN_START, _pack_positions(in_start))
+            write_section(_IN_EDGES, _pack_positions(in_edges))
+            write_section(_INDEX, dumps(
+                SharedGraph._snapshot_index(nodes, indexed_properties)))
+
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, len(nodes), len(edges), *sections))
+        os.rename(tmp_path, path)
+
+    @staticmethod
+    def _snapshot_index(nodes, indexed_properties):
+        indexes = {prop: {} for prop in indexed_properties}
+        unhashable = {prop: [] for prop in indexed_properties}
+        for position, (_, _, data) in enumerate(nodes):
+            for prop in indexed_properties:
+                value = data.get(prop)
+                try:
+                    indexes[prop].setdefault(value, []).append(position)
+                except TypeError:
+                    unhashable[prop].append(position)
+
+        indexes = {prop: {value: _pack_positions(positions)
+                          for value, positions in values.items()}
+                   for prop, values in indexes.items()}
+        unhashable = {prop: _pack_positions(positions)
+                      for prop, positions in unhashable.items()}
+        return indexes, unhashable
+
+    def copy(self):
+        state = self._state
+        vertices = [Vertex(vertex_id=v_id, properties=data)
+                    for v_id, data in self._candidate_nodes(state, None)]
+        edges = [Edge(source_id=u, target_id=v, label=label, properties=data)
+                 for u, v, label, data in self._all_edges(state)]
+        return NXGraph(self.name, vertices, edges)
+
+    def num_vertices(self):
+        state = self._state
+        return state.snapshot.num_vertices - len(state.hidden_vertices) + \
+            len(state.vertices)
+
+    def num_edges(self):
+        state = self._state
+        return state.snapshot.num_edges - len(state.hidden_edges) + \
+            len(state.edges)
+
+    def add_vertex(self, v):
+        """Add a vertex to the overlay of the graph
+
+        Same as in NXGraph, the properties of an existing vertex are updated
+        with the properties of v.
+
+        :type v: Vertex
+        """
+        state = self._state
+        data = self._vertex_data(v.vertex_id, state)
+        data = dict(data) if data is not None else {}
+        data.update(v.properties or {})
+        self._set_vertex(state, v.vertex_id, data)
+
+    def add_edge(self, e):
+        """Add an edge to the overlay of the graph
+
+        :type e: Edge
+        """
+        state = self._state
+        for v_id in (e.source_id, e.target_id):
+            if self._vertex_data(v_id, state) is None:
+                self._set_vertex(state, v_id, {})
+
+        key = (e.source_id, e.target_id, e.label)
+        data = self._edge_data(state, key)
+        data = dict(data) if data is not None else {}
+        data.update(e.properties or {})
+        self._set_edge(state, key, data)
+
+    def get_vertex(self, v_id, read_only=False):
+        data = self._vertex_data(v_id)
+        if data is not None:
+            return vertex_view(v_id, data) if read_only \
+                else vertex_copy(v_id, data)
+        LOG.debug("get_vertex item not found. v_id=%s", str(v_id))
+        return None
+
+    def get_edge(self, source_id, target_id, label, read_only=False):
+        data = self._edge_data(self._state, (source_id, target_id, label))
+        if data is not None:
+            return edge_view(source_id, target_id, label, data) if read_only \
+                else edge_copy(source_id, target_id, label, data)
+        LOG.debug("get_edge item not found. source_id=%s, target_id=%s, "
+                  "label=%s", str(source_id), str(target_id), str(label))
+        return None
+
+    def get_edges(self,
+                  v1_id,
+                  v2_id=None,
+                  direction=Direction.BOTH,
+                  attr_filter=None,
+                  read_only=False):
+        def check_edge(edge_data):
+            return check_filter(edge_data, attr_filter)
+
+        nodes, edges = self._neighboring_nodes_edges_query(
+            v1_id, edge_predicate=check_edge, direction=direction)
+
+        make_edge = edge_view if read_only else edge_copy
+        edge_copies = set(make_edge(u, v, label, data)
+                          for u, v, label, data in edges)
+
+        if v2_id:
+            edge_copies = [e for e in edge_copies if e.has_vertex(v2_id)]
+
+        return edge_copies
+
+    def update_vertex(self, v, overwrite=True):
+        state = self._state
+        orig_prop = self._vertex_data(v.vertex_id, state)
+        if not orig_prop:
+            self.add_vertex(v)
+            return
+
+        data = dict(orig_prop)
+        data.update(self._merged_properties(orig_prop, v.properties,
+                                            overwrite))
+        for prop, value in v.properties.items():
+            if value is None:
+                del data[prop]
+        self._set_vertex(state, v.vertex_id, data)
+
+    def update_edge(self, e):
+        state = self._state
+        key = (e.source_id, e.target_id, e.label)
+        orig_prop = self._edge_data(state, key)
+        if not orig_prop:
+            self.add_edge(e)
+            return
+
+        data = dict(orig_prop)
+        data.update(e.properties)
+        for prop, value in e.properties.items():
+            if value is None:
+                del data[prop]
+        self._set_edge(state, key, data)
+
+    def remove_vertex(self, v):
+        """Remove Vertex v and its edges from the graph
+
+        :type v: Vertex
+        """
+        state = self._state
+        for u, w, label, _ in self._get_edges_by_direction(
+                state, v.vertex_id, Direction.BOTH):
+            self._remove_edge(state, (u, w, label))
+        state.vertices.pop(v.vertex_id, None)
+        position = state.snapshot.position(v.vertex_id)
+        if position is not None:
+            state.hidden_vertices.add(position)
+
+    def remove_edge(self, e):
+        """Remove an edge from the graph
+
+        :type e: Edge
+        """
+        self._remove_edge(self._state, (e.source_id, e.target_id, e.label))
+
+    def get_vertices(self,
+                     vertex_attr_filter=None,
+                     query_dict=None,
+                     read_only=False):
+        make_vertex = vertex_view if read_only else vertex_copy
+        state = self._state
+        index = state.snapshot.index
+        if not query_dict:
+            candidates = index.filter_candidates(vertex_attr_filter)
+            return [make_vertex(node, node_data) for node, node_data
+                    in self._candidate_nodes(state, candidates)
+                    if check_filter(node_data, vertex_attr_filter)]
+        elif not vertex_attr_filter:
+            match_func = create_predicate(query_dict)
+            candidates = index.query_candidates(match_func.index_terms)
+            return [make_vertex(node, node_data) for node, node_data
+                    in self._candidate_nodes(state, candidates)
+                    if match_func(node_data)]
+        else:
+            return []
+
+    def get_vertices_by_key(self, key_values_hash):
+        return self.get_vertices(
+            vertex_attr_filter={VProps.VITRAGE_CACHED_ID: key_values_hash})
+
+    def neighbors(self, v_id, vertex_attr_filter=None, edge_attr_filter=None,
+                  direction=Direction.BOTH, read_only=False):
+
+        def check_edge(edge_data):
+            return check_filter(edge_data, edge_attr_filter)
+
+        def check_vertex(vertex_data):
+            return check_filter(vertex_data, vertex_attr_filter)
+
+        nodes, edges = self._neighboring_nodes_edges_query(
+            v_id=v_id, vertex_predicate=check_vertex,
+            edge_predicate=check_edge, direction=direction)
+        make_vertex = vertex_view if read_only else vertex_copy
+        return [make_vertex(n, data) for n, data in nodes]
+
+    def json_output_graph(self, **kwargs):
+        return self.copy().json_output_graph(**kwargs)
+
+    def union(self, other_graph):
+        """Union two graphs - add all vertices and edges of other graph
+
+        The vertices and edges of the other graph are added to the overlay.
+        Same as in NXGraph, their properties are merged into the properties
+        of the existing vertices and edges, and take precedence over them.
+
+        :type other_graph: Graph
+        """
+        vertices = other_graph.get_vertices()
+        for v in vertices:
+            self.add_vertex(v)
+        for v in vertices:
+            for e in other_graph.get_edges(v.vertex_id,
+                                           direction=Direction.OUT):
+                self.add_edge(e)
+
+    def _neighboring_nodes_edges_query(self, v_id,
+                                       vertex_predicate=None,
+                                       edge_predicate=None,
+                                       direction=Direction.BOTH):
+        if not direction:
+            LOG.error("_neighboring_nodes_edges: direction cannot be None")
+            raise AttributeError("neighbors: direction cannot be None")
+
+        if not v_id:
+            LOG.error("_neighboring_nodes_edges: v_id cannot be None")
+            raise AttributeError("neighbors: v_id cannot be None")
+
+        state = self._state
+        nodes = []
+        edges = []
+        for source_id, target_id, label, data in \
+                self._get_edges_by_direction(state, v_id, direction):
+            if edge_predicate and not edge_predicate(data):
+                continue
+            node_id_to_test = source_id if target_id == v_id else target_id
+            node_data = self._vertex_data(node_id_to_test, state)
+            if not vertex_predicate or vertex_predicate(node_data):
+                edges.append((source_id, target_id, label, data))
+                nodes.append((node_id_to_test, node_data))
+        return nodes, edges
+
+    @staticmethod
+    def _get_edges_by_direction(state, v_id, direction):
+        """The (source_id, target_id, label, data) edges of the vertex"""
+        snapshot = state.snapshot
+        edges = []
+
+        position = snapshot.position(v_id)
+        if position is not None:
+            edge_positions = []
+            if direction != Direction.OUT:
+                edge_positions.extend(snapshot.in_edges(position))
+            if direction != Direction.IN:
+                edge_positions.extend(snapshot.out_edges(position))
+            for edge in edge_positions:
+                if edge in state.hidden_edges:
+                    continue
+                source, target, label, data = snapshot.edge(edge)
+                edges.append((snapshot.vertex_id(source),
+                              snapshot.vertex_id(target),
+                              label, data))
+
+        for key in list(state.adjacent.get(v_id, ())):
+            source_id, target_id, label = key
+            if (direction != Direction.OUT and target_id == v_id) or \
+                    (direction != Direction.IN and source_id == v_id):
+                edges.append((source_id, target_id, label, state.edges[key]))
+        return edges
+
+    @staticmethod
+    def _candidate_nodes(state, candidates):
+        """The (node, data) pairs of the candidate positions, or of all nodes
+
+        The vertices of the overlay are always candidates.
+
+        :param candidates: snapshot positions found by the vertex index, or
+                           None if the index could not narrow down the search
+        """
+        snapshot = state.snapshot
+        if candidates is None:
+            candidates = range(snapshot.num_vertices)
+        hidden = state.hidden_vertices
+        nodes = [snapshot.vertex(position) for position in candidates
+                 if position not in hidden]
+        nodes.extend(list(state.vertices.items()))
+        return nodes
+
+    @staticmethod
+    def _all_edges(state):
+        snapshot = state.snapshot
+        edges = []
+        for edge in range(snapshot.num_edges):
+            if edge not in state.hidden_edges:
+                source, target, label, data = snapshot.edge(edge)
+                edges.append((snapshot.vertex_id(source),
+                              snapshot.vertex_id(target),
+                              label, data))
+        edges.extend((u, v, label, data)
+                     for (u, v, label), data in list(state.edges.items()))
+        return edges
+
+    def _vertex_data(self, v_id, state=None):
+        state = state or self._state
+        data = state.vertices.get(v_id)
+        if data is not None:
+            return data
+        position = state.snapshot.position(v_id)
+        if position is None or position in state.hidden_vertices:
+            return None
+        return state.snapshot.vertex(position)[1]
+
+    @classmethod
+    def _edge_data(cls, state, key):
+        data = state.edges.get(key)
+        if data is not None:
+            return data
+        edge = cls._snapshot_edge(state.snapshot, key)
+        if edge is None or edge in state.hidden_edges:
+            return None
+        return state.snapshot.edge(edge)[3]
+
+    @staticmethod
+    def _snapshot_edge(snapshot, key):
+        """The position of the edge in the snapshot, or None"""
+        source_id, target_id, label = key
+        source = snapshot.position(source_id)
+        target = snapshot.position(target_id)
+        if source is None or target is None:
+            return None
+        for edge in snapshot.out_edges(source):
+            edge_source, edge_target, edge_label, _ = snapshot.edge(edge)
+            if edge_target == target and edge_label == label:
+                return edge
+        return None
+
+    @staticmethod
+    def _set_vertex(state, v_id, data):
+        state.vertices[v_id] = data
+        position = state.snapshot.position(v_id)
+        if position is not None:
+            state.hidden_vertices.add(position)
+
+    @classmethod
+    def _set_edge(cls, state, key, data):
+        state.edges[key] = data
+        state.adjacent.setdefault(key[0], {})[key] = None
+        state.adjacent.setdefault(key[1], {})[key] = None
+        edge = cls._snapshot_edge(state.snapshot, key)
+        if edge is not None:
+            state.hidden_edges.add(edge)
+
+    @classmethod
+    def _remove_edge(cls, state, key):
+        if state.edges.pop(key, None) is not None:
+            for v_id in key[:2]:
+                state.adjacent.get(v_id, {}).pop(key, None)
+        edge = cls._snapshot_edge(state.snapshot, key)
+        if edge is not None:
+            state.hidden_edges.add(edge)
@@ -0,0 +1,186 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from vitrage.common.constants import VertexProperties as VProps
+
+DEFAULT_INDEXED_PROPERTIES = (
+    VProps.VITRAGE_CATEGORY,
+    VProps.VITRAGE_TYPE,
+    VProps.VITRAGE_IS_DELETED,
+    VProps.VITRAGE_IS_PLACEHOLDER,
+    VProps.PROJECT_ID,
+)
+
+
+class VertexIndex(object):
+    """Secondary indexes from vertex property values to vertex ids
+
+    For every indexed property, a map of property value -> vertex ids is kept.
+    A vertex that does not have the property is indexed under None, the same
+    value that check_filter and the query predicates see for it.
+
+    The indexes are only used to narrow down the candidate vertices of a
+    query. The candidates must still be checked against the full filter.
+    """
+
+    def __init__(self, properties=DEFAULT_INDEXED_PROPERTIES):
+        self.properties = tuple(properties)
+        self._indexes = {}
+        self._unhashable = {}
+        self.clear()
+
+    def clear(self):
+        # Buckets are dicts of vertex_id -> None, used as insertion ordered
+        # sets so the order of the results is stable
+        self._indexes = {prop: {} for prop in self.properties}
+        self._unhashable = {prop: {} for prop in self.properties}
+
+    def snapshot(self, data):
+        """The values of the indexed properties in the vertex data"""
+        return {prop: data.get(prop) for prop in self.properties}
+
+    def add(self, v_id, data):
+        for prop in self.properties:
+            self._bucket(prop, data.get(prop))[v_id] = None
+
+    def remove(self, v_id, data):
+        for prop in self.properties:
+            self._bucket(prop, data.get(prop)).pop(v_id, None)
+
+    def update(self, v_id, old_data, new_data):
+        for prop in self.properties:
+            old_value = old_data.get(prop)
+            new_value = new_data.get(prop)
+            if old_value == new_value:
+                continue
+            self._bucket(prop, old_value).pop(v_id, None)
+            self._bucket(prop, new_value)[v_id] = None
+
+    def rebuild(self, nodes):
+        """Rebuild the indexes from an iterable of (vertex_id, data)"""
+        self.clear()
+        for v_id, data in nodes:
+            self.add(v_id, data)
+
+    def lookup(self, prop, values):
+        """Ids of the vertices whose prop value is one of values
+
+        :return: list of vertex ids, or None if prop is not indexed
+        """
+        term = self._lookup(prop, values)
+        return None if term is None else self._ids(term)
+
+    def filter_candidates(self, attr_filter):
+        """Candidate vertex ids for a check_filter attr_filter
+
+        :return: list of vertex ids, or None if no key of the filter is indexed
+        """
+        term = self._filter_term(attr_filter)
+        return None if term is None else self._ids(term)
+
+    def query_candidates(self, index_terms):
+        """Candidate vertex ids for a compiled query
+
+        Equality terms on indexed properties are answered by the indexes,
+        combined according to the 'and' / 'or' operators above them.
+
+        :param index_terms: the index terms of a compiled query, see
+                            vitrage.graph.query.QueryPredicate
+        :return: list of vertex ids, or None if the query can not be narrowed
+                 down by the indexes
+        """
+        term = self._query_term(index_terms)
+        return None if term is None else self._ids(term)
+
+    # A term is a list of buckets, holding the union of their vertex ids.
+    # Terms are combined without copying the (possibly huge) buckets, and only
+    # the final, smallest term is materialized into a list of ids.
+
+    def _lookup(self, prop, values):
+        if prop not in self._indexes:
+            return None
+        index = self._indexes[prop]
+        if not isinstance(values, list):
+            values = [values]
+
+        term = []
+        for value in values:
+            try:
+                bucket = index.get(value)
+            except TypeError:
+                return None
+            if bucket:
+                term.append(bucket)
+        if self._unhashable[prop]:
+            term.append(self._unhashable[prop])
+        return term
+
+    def _filter_term(self, attr_filter):
+        if not attr_filter:
+            return None
+        return self._intersection([self._lookup(key, values)
+                                   for key, values in attr_filter.items()])
+
+    def _query_term(self, index_terms):
+        if not index_terms:
+            return None
+        op, value = index_terms
+
+        if op == '==':
+            # a list value is compared as is, and not as a list of values
+            return self._intersection([self._lookup(key, [val])
+                                       for key, val in value])
+        elif op == 'and':
+            return self._intersection([self._query_term(t) for t in value])
+        elif op == 'or':
+            terms = [self._query_term(t) for t in value]
+            if not terms or any(t is None for t in terms):
+                return None
+            return [bucket for t in terms for bucket in t]
+        return None
+
+    def _bucket(self, prop, value):
+        index = self._indexes[prop]
+        try:
+            bucket = index.get(value)
+            if bucket is None:
+                bucket = index[value] = {}
+            return bucket
+        except TypeError:
+            # e.g. a list or a dict value. Such vertices are returned as
+            # candidates of every lookup on this property
+            return self._unhashable[prop]
+
+    @classmethod
+    def _intersection(cls, terms):
+        """Intersect terms, ignoring the ones that can not be indexed"""
+        terms = [t for t in terms if t is not None]
+        if not terms:
+            return None
+        if len(terms) == 1:
+            return terms[0]
+        terms.sort(key=lambda t: sum(len(bucket) for bucket in t))
+        smallest, others = terms[0], terms[1:]
+        return [dict.fromkeys(
+            v_id for v_id in cls._ids(smallest)
+            if all(any(v_id in bucket for bucket in t) for t in others))]
+
+    @staticmethod
+    def _ids(term):
+        if len(term) == 1:
+            return list(term[0])
+        ids = {}
+        for bucket in term:
+            ids.update(dict.fromkeys(list(bucket)))
+        return list(ids)
@@ -12,28 +12,81 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from collections import OrderedDict
+import operator
+import threading
+
 from oslo_log import log as logging
-import six
 
 from vitrage.common.exception import VitrageError
 
 LOG = logging.getLogger(__name__)
 
-operators = [
-    '<',
-    '<=',
+operators = {
+    '<': operator.lt,
+    '<=': operator.le,
     # '=',
-    '==',
-    '!=',
-    '>=',
-    '>',
-]
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
 
 logical_operations = [
     'and',
     'or'
 ]
 
+QUERY_CACHE_SIZE = 256
+
+
+class QueryPredicate(object):
+    """A query dict compiled into a predicate "match(item)"
+
+    index_terms describes the equality terms of the query, which may be
+    answered by an index on the item properties:
+    * ('==', ((key, value), ...)) - all the key/value pairs are equal
+    * ('and', [terms]) - only the indexable terms of the 'and' are listed
+    * ('or', [terms]) - all the terms of the 'or' are indexable
+    * None - the query can not be narrowed down by an index
+    """
+    __slots__ = ('_match', 'index_terms')
+
+    def __init__(self, match, index_terms=None):
+        self._match = match
+        self.index_terms = index_terms
+
+    def __call__(self, item):
+        return self._match(item)
+
+
+class _LRUCache(object):
+    def __init__(self, size):
+        self.size = size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._cache.pop(key, None)
+            if value is not None:
+                self._cache[key] = value
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = value
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_predicates_cache = _LRUCache(QUERY_CACHE_SIZE)
+
 
 def create_predicate(query_dict):
     """Create predicate from a logical and/or/==/>/etc expression
@@ -52,6 +105,7 @@ def create_predicate(query_dict):
 
     Example Output:
     --------------
+    A predicate equivalent to:
     lambda item: ((item['CATEGORY']== 'ALARM') and
                   ((item['TIME']> 150) or (item['VITRAGE_IS_DELETED']== True)))
 
@@ -61,61 +115,114 @@ def create_predicate(query_dict):
     if match(vertex):
         print vertex
 
+    The compiled predicates are cached, so the same query is compiled only
+    once.
+
     :param query_dict:
     :return: a predicate "match(item)"
+    :rtype: QueryPredicate
     """
     try:
-        expression = _create_query_expression(query=query_dict)
-        LOG.debug('create_predicate::%s', expression)
-        expression = 'lambda item: ' + expression
-        return eval(expression)
+        key = _canonical_form(query_dict)
+    except TypeError:
+        # unhashable values in the query
+        key = None
+
+    predicate = _predicates_cache.get(key) if key is not None else None
+    if predicate is not None:
+        return predicate
+
+    try:
+        match, index_terms = _compile_query(query=query_dict)
+        predicate = QueryPredicate(match, index_terms)
     except Exception as e:
         LOG.error('invalid query format %s. Exception: %s',
                   query_dict, e)
         raise VitrageError('invalid query format %s. Exception: %s',
                            query_dict, e)
 
+    if key is not None:
+        _predicates_cache.put(key, predicate)
+    return predicate
+
 
-def _create_query_expression(query, parent_operator=None):
-    expressions = []
+def _compile_query(query, parent_operator=None):
+    """Compile a (partial) query
+
+    :return: a tuple of the predicate and the index terms of the query
+    """
 
     # First element or element under logical operation
     if not parent_operator and isinstance(query, dict):
         (key, value) = query.copy().popitem()
-        return _create_query_expression(value, key)
+        return _compile_query(value, key)
 
     # Continue recursion on logical (and/or) operation
     elif parent_operator in logical_operations and isinstance(query, list):
-        for val in query:
-            expressions.append(_create_query_expression(val))
-        return _join_logical_operator(parent_operator, expressions)
+        compiled = [_compile_query(val) for val in query]
+        predicates = [match for match, _ in compiled]
+        terms = [index_terms for _, index_terms in compiled]
+        return _join_logical_operator(parent_operator, predicates, terms)
 
     # Recursion evaluate leaf (stop condition)
     elif parent_operator in operators:
-        for key, val in query.items():
-            expressions.append('item.get(' + _evaluable_str(key) + ')' +
-                               parent_operator + ' ' + _evaluable_str(val))
-        return _join_logical_operator('and', expressions)
+        op = operators[parent_operator]
+        items = tuple(query.items())
+        if len(items) == 1:
+            ((key, val),) = items
+            match = _leaf_predicate(op, key, val)
+        else:
+            match = _join_logical_operator(
+                'and', [_leaf_predicate(op, k, v) for k, v in items])[0]
+        index_terms = ('==', items) if op is operator.eq and items else None
+        return match, index_terms
     else:
         raise VitrageError('invalid partial query format',
                            parent_operator, query)
 
 
-def _evaluable_str(value):
-    """wrap string/unicode with back tick"""
-    if isinstance(value, six.string_types):
-        return '\'' + value + '\''
+def _leaf_predicate(op, key, value):
+    return lambda item: op(item.get(key), value)
+
+
+def _join_logical_operator(op, predicates, terms=()):
+    """Create a predicate joining the predicates with an and/or operator
+
+    :return: a tuple of the predicate and the index terms of the expression
+    """
+    terms = list(terms)
+    if op == 'and':
+        index_terms = [t for t in terms if t is not None]
+        index_terms = ('and', index_terms) if index_terms else None
+    else:
+        index_terms = ('or', terms) \
+            if terms and all(t is not None for t in terms) else None
+
+    if not predicates:
+        # Like an empty expression, an empty and/or matches nothing
+        return (lambda item: False), None
+    if len(predicates) == 1:
+        return predicates[0], index_terms
+
+    if op == 'and':
+        def match(item):
+            return all(predicate(item) for predicate in predicates)
     else:
-        return str(value)
+        def match(item):
+            return any(predicate(item) for predicate in predicates)
+    return match, index_terms
 
 
-def _join_logical_operator(op, expressions):
-    """Create an expressions string
+def _canonical_form(query):
+    """A hashable form of the query, which is equal for equal queries
 
-    Example input:
-        op='AND'
-        expressions=['a == b', 'c < d']
-    Example output: (a == b AND c < d)
+    :raises TypeError: if the query contains unhashable values
     """
-    separator = ' ' + op + ' '
-    return '(' + separator.join(expressions) + ')'
+    if isinstance(query, dict):
+        return tuple(sorted((key, _canonical_form(val))
+                            for key, val in query.items()))
+    if isinstance(query, list):
+        return ('[',) + tuple(_canonical_form(val) for val in query)
+    hash(query)
+    # distinguish between equal values of different types, e.g. 1 and True
+    return type(query), query
@@ -17,6 +17,7 @@ from vitrage.common.constants import EdgeProperties as EConst
 from vitrage.common.constants import VertexProperties as VConst
 from vitrage.graph.driver.elements import Edge
 from vitrage.graph.driver.elements import Vertex
+from vitrage.utils.datetime import parse_timestamp_ns
 
 
 def create_vertex(vitrage_id,
@@ -76,6 +77,9 @@ def create_vertex(vitrage_id,
         VConst.VITRAGE_RESOURCE_PROJECT_ID: vitrage_resource_project_id,
         VConst.VITRAGE_DATASOURCE_NAME: datasource_name,
     }
+    if vitrage_sample_timestamp:
+        properties[VConst.VITRAGE_SAMPLE_TIMESTAMP_NS] = \
+            parse_timestamp_ns(vitrage_sample_timestamp)
     if metadata:
         properties.update(metadata)
     properties = {k: v for k, v in properties.items() if v is not None}
@@ -63,6 +63,18 @@ def get_notification_listener(transport, targets, endpoints,
         allow_requeue=allow_requeue)
 
 
+def get_batch_notification_listener(transport, targets, endpoints,
+                                    batch_size, batch_timeout):
+    """Return a notification listener that gets the messages in batches.
+
+    The endpoints get a list of up to batch_size messages, that were received
+    within batch_timeout seconds.
+    """
+    return oslo_msg.get_batch_notification_listener(
+        transport, targets, endpoints, executor='blocking',
+        batch_size=batch_size, batch_timeout=batch_timeout)
+
+
 class VitrageNotifier(object):
     """Allows writing to message bus"""
     def __init__(self, conf, publisher_id, topics):
@@ -22,6 +22,27 @@ OPTS = [
                required=True),
     cfg.IntOpt('max_retries',
                default=2,
-               help='rest http post max retries',
+               help='rest http post max retries, on connection errors',
                required=False),
+    cfg.IntOpt('timeout',
+               default=10,
+               min=1,
+               help='Timeout in seconds of a post to a webhook'),
+    cfg.IntOpt('max_concurrent_posts',
+               default=4,
+               min=1,
+               help='Maximal number of concurrent posts, and of open '
+                    'connections, to a webhook url'),
+    cfg.IntOpt('max_queued_posts',
+               default=1000,
+               min=1,
+               help='Maximal number of posts that wait to be sent to a '
+                    'webhook url. Further notifications to the url are '
+                    'dropped'),
+    cfg.IntOpt('registry_refresh_interval',
+               default=300,
+               min=1,
+               help='Interval in seconds to reload the webhooks from the '
+                    'database, in addition to reloading them whenever a '
+                    'webhook is added or deleted'),
 ]
@@ -12,13 +12,18 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 import ast
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import re
+import threading
 
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 
 import requests
+from requests.packages.urllib3.util.retry import Retry
 
 from vitrage.common.constants import NotifierEventTypes
 from vitrage.common.constants import VertexProperties as VProps
@@ -32,6 +37,9 @@ IS_ADMIN_WEBHOOK = 'is_admin_webhook'
 NOTIFICATION_TYPE = 'notification_type'
 NOTIFICATION = 'notification'
 PAYLOAD = 'payload'
+# the parsed headers and compiled regex filters of a registered webhook
+PARSED_HEADERS = 'parsed_headers'
+COMPILED_FILTERS = 'compiled_filters'
 ALARM_FILTER = (NOTIFICATION,
                 PAYLOAD,
                 VProps.VITRAGE_ID,
@@ -71,22 +79,30 @@ class Webhook(NotifierBase):
         self._db = storage.get_connection_from_config(self.conf)
         self.max_retries = self.conf.webhook.max_retries
         self.default_headers = {'content-type': 'application/json'}
+        self._sender = WebhookSender(self.conf.webhook)
+        self._registry = WebhookRegistry(
+            self._db, self.conf.webhook.registry_refresh_interval,
+            on_load=self._sender.retain)
 
     def process_event(self, data, event_type):
 
-        if event_type == NotifierEventTypes.ACTIVATE_ALARM_EVENT \
+        if event_type == NotifierEventTypes.CHANGE_IN_WEBHOOKS_EVENT:
+            LOG.info('Webhooks changed, reloading them')
+            self._registry.invalidate()
+
+        elif event_type == NotifierEventTypes.ACTIVATE_ALARM_EVENT \
                 or event_type == NotifierEventTypes.DEACTIVATE_ALARM_EVENT:
 
             LOG.info('Webhook notifier started processing %s', str(data))
 
-            webhooks = self._load_webhooks()
+            webhooks = self._registry.get_webhooks()
 
             LOG.debug('There are %d registered webhooks', len(webhooks))
 
             if webhooks:
+                data = self._filter_fields(data)
                 for webhook in webhooks:
-                    webhook_filters = self._get_webhook_filters(webhook)
-                    data = self._filter_fields(data)
+                    webhook_filters = webhook[COMPILED_FILTERS]
 
                     LOG.debug('webhook_filter: %s, filtered data: %s',
                               str(webhook_filters), str(data))
@@ -103,42 +119,19 @@ class Webhook(NotifierBase):
         try:
             webhook_data = {'notification': event_type, 'payload': data}
             webhook_headers = self._get_webhook_headers(webhook)
-            session = requests.Session()
-            session.mount(str(webhook[URL]),
-                          requests.adapters.HTTPAdapter(
-                              max_retries=self.max_retries))
-            resp = session.post(str(webhook[URL]),
-                                data=jsonutils.dumps(webhook_data),
-                                headers=webhook_headers)
-            LOG.info('posted %s to %s. Response status %s, reason %s',
-                     str(webhook_data), str(webhook[URL]),
-                     resp.status_code, resp.reason)
+            self._sender.post(webhook, jsonutils.dumps(webhook_data),
+                              webhook_headers)
         except Exception:
             LOG.exception("Could not post to webhook '%s'", str(webhook['id']))
 
-    def _load_webhooks(self):
-        db_webhooks = self._db.webhooks.query()
-        return [webhook_utils.db_row_to_dict(webhook) for webhook in
-                db_webhooks]
-
     def _get_webhook_headers(self, webhook):
         headers = self.default_headers.copy()
         headers['x-openstack-request-id'] = b'req-' + \
                                             uuidutils.generate_uuid().encode(
                                                 'ascii')
-        if webhook.get('headers') != '':
-            headers.update(ast.literal_eval(webhook['headers']))
+        headers.update(webhook[PARSED_HEADERS])
         return headers
 
-    def _get_webhook_filters(self, webhook):
-        filters = webhook.get('regex_filter')
-        if filters != '':
-            filters = ast.literal_eval(filters)
-            for k, v in filters.items():
-                filters[k] = re.compile(v, re.IGNORECASE)
-            return filters
-        return None
-
     def _check_against_filter(self, webhook_filters, event):
         # Check if the event matches the specified filters
         if webhook_filters:
@@ -169,3 +162,139 @@ class Webhook(NotifierBase):
                 return data[VProps.RESOURCE][VProps.PROJECT_ID] == \
                     webhook.get(VProps.PROJECT_ID)
         return True
+
+
+class WebhookRegistry(object):
+    """The registered webhooks, with their headers and filters parsed
+
+    The webhooks are loaded from the database when first used, after they
+    are invalidated, and every refresh_interval seconds in case an
+    invalidation was missed.
+    """
+
+    def __init__(self, db, refresh_interval, on_load=None):
+        self._db = db
+        self._refresh_interval = refresh_interval
+        self._on_load = on_load
+        self._webhooks = None
+        self._watch = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._webhooks = None
+
+    def get_webhooks(self):
+        webhooks = self._webhooks
+        if webhooks is not None and not self._watch.expired():
+            return webhooks
+        with self._lock:
+            if self._webhooks is None or self._watch.expired():
+                self._webhooks = self._load_webhooks()
+                self._watch = timeutils.StopWatch(
+                    duration=self._refresh_interval).start()
+                if self._on_load:
+                    self._on_load(self._webhooks)
+            return self._webhooks
+
+    def _load_webhooks(self):
+        webhooks = []
+        for db_webhook in self._db.webhooks.query():
+            webhook = webhook_utils.db_row_to_dict(db_webhook)
+            try:
+                webhook[PARSED_HEADERS] = self._parse_headers(webhook)
+                webhook[COMPILED_FILTERS] = self._compile_filters(webhook)
+            except Exception:
+                LOG.exception("Ignoring invalid webhook '%s'",
+                              str(webhook['id']))
+                continue
+            webhooks.append(webhook)
+        LOG.debug('Loaded %d webhooks', len(webhooks))
+        return webhooks
+
+    @staticmethod
+    def _parse_headers(webhook):
+        headers = webhook.get('headers')
+        if headers:
+            return ast.literal_eval(headers)
+        return {}
+
+    @staticmethod
+    def _compile_filters(webhook):
+        filters = webhook.get('regex_filter')
+        if filters:
+            filters = ast.literal_eval(filters)
+            for k, v in filters.items():
+                filters[k] = re.compile(v, re.IGNORECASE)
+            return filters
+        return None
+
+
+class WebhookSender(object):
+    """Posts to the webhooks, over keep-alive connections
+
+    Every webhook url has its own connection pool, workers and bounded
+    queue of posts, so a slow webhook delays only its own notifications.
+    """
+
+    def __init__(self, conf):
+        self._timeout = conf.timeout
+        self._max_workers = conf.max_concurrent_posts
+        self._max_queued = conf.max_queued_posts
+        # only posts that failed to connect are retried, as a webhook that
+        # got the notification should not get it again
+        self._retries = Retry(total=conf.max_retries,
+                              read=False,
+                              backoff_factor=0.5)
+        self._session = requests.Session()
+        self._executors = {}
+        self._queued = Counter()
+        self._lock = threading.Lock()
+
+    def post(self, webhook, data, headers):
+        """Queue a post to the webhook
+
+        :return: a future of the post, or None if the webhook queue is full
+        """
+        url = str(webhook[URL])
+        with self._lock:
+            if self._queued[url] >= self._max_queued:
+                LOG.warning("Dropped a notification to webhook '%s', there "
+                            "are %d notifications waiting to be posted to %s",
+                            str(webhook['id']), self._queued[url], url)
+                return None
+            executor = self._executors.get(url)
+            if executor is None:
+                executor = self._add_url(url)
+            self._queued[url] += 1
+            return executor.submit(self._post, webhook, url, data, headers)
+
+    def retain(self, webhooks):
+        """Stop posting to the urls of webhooks that were deleted"""
+        urls = {str(webhook[URL]) for webhook in webhooks}
+        with self._lock:
+            for url in set(self._executors) - urls:
+                LOG.debug('Closing the connections to %s', url)
+                self._executors.pop(url).shutdown(wait=False)
+                self._session.adapters.pop(url).close()
+
+    def _add_url(self, url):
+        self._session.mount(url, requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self._max_workers,
+            max_retries=self._retries))
+        executor = self._executors[url] = \
+            ThreadPoolExecutor(max_workers=self._max_workers)
+        return executor
+
+    def _post(self, webhook, url, data, headers):
+        try:
+            resp = self._session.post(url, data=data, headers=headers,
+                                      timeout=self._timeout)
+            LOG.info('posted %s to %s. Response status %s, reason %s',
+                     data, url, resp.status_code, resp.reason)
+            return resp
+        except Exception:
+            LOG.exception("Could not post to webhook '%s'", str(webhook['id']))
+        finally:
+            with self._lock:
+                self._queued[url] -= 1
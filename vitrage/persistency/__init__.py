@@ -18,7 +18,42 @@ OPTS = [
     cfg.StrOpt('persistor_topic',
                default='vitrage_persistor',
                help='persistor will listen on this topic for events to store'),
+    cfg.IntOpt('persistor_batch_size',
+               default=100,
+               min=1,
+               help='The maximal number of events that the persistor stores '
+                    'together, in a single transaction'),
+    cfg.IntOpt('persistor_batch_timeout',
+               default=1,
+               min=1,
+               help='The maximal time in seconds that the persistor waits '
+                    'for a batch of events to fill, before it stores them'),
     cfg.IntOpt('alarm_history_ttl',
                default=30,
                help='The number of days inactive alarms history is kept'),
+    cfg.IntOpt('graph_snapshot_deltas',
+               default=10,
+               min=0,
+               help='The number of graph snapshots that are stored as deltas '
+                    'of the changes since the previous snapshot, before a '
+                    'full graph snapshot is stored again. 0 stores only '
+                    'full graph snapshots.'),
+    cfg.IntOpt('events_buffer_size',
+               default=1000,
+               min=1,
+               help='The maximal number of graph change events that are '
+                    'buffered, before they are stored in the database '
+                    'together. The buffered events are also stored at the '
+                    'end of every batch of processed events.'),
+    cfg.IntOpt('events_flush_interval',
+               default=5,
+               min=0,
+               help='The maximal time in seconds that a graph change event '
+                    'is buffered before it is stored in the database'),
+    cfg.IntOpt('replay_events_chunk_size',
+               default=10000,
+               min=1,
+               help='The number of graph change events that are read '
+                    'together from the database, when they are replayed on '
+                    'top of the stored graph snapshot on restart'),
 ]
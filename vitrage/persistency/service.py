@@ -14,6 +14,7 @@
 
 from __future__ import print_function
 
+from collections import OrderedDict
 from datetime import timedelta
 
 from concurrent.futures import ThreadPoolExecutor
@@ -46,9 +47,11 @@ class PersistorService(cotyledon.Service):
         transport = messaging.get_transport(conf)
         target = \
             oslo_m.Target(topic=conf.persistency.persistor_topic)
-        self.listener = messaging.get_notification_listener(
+        self.listener = messaging.get_batch_notification_listener(
             transport, [target],
-            [VitragePersistorEndpoint(self.db_connection)])
+            [VitragePersistorEndpoint(self.db_connection)],
+            conf.persistency.persistor_batch_size,
+            conf.persistency.persistor_batch_timeout)
         self.scheduler = Scheduler(conf, db_connection)
 
     def run(self):
@@ -68,6 +71,54 @@ class PersistorService(cotyledon.Service):
         LOG.info("Vitrage Persistor Service - Stopped!")
 
 
+class HistoryBatch(object):
+    """The history rows to store for a batch of events
+
+    The updates of alarms and edges that were created in the batch are
+    applied on their new rows, and the rest are applied on the stored rows
+    before the new rows are created. So the rows are the same as if the
+    events were stored one by one.
+    """
+
+    def __init__(self):
+        self.alarms = OrderedDict()
+        self.alarm_updates = {}
+        self.edges = OrderedDict()
+        self.edge_updates = {}
+        self.changes = []
+
+    def create_alarm(self, alarm):
+        self.alarms[alarm.vitrage_id] = alarm
+
+    def update_alarm(self, vitrage_id, key, val):
+        alarm = self.alarms.get(vitrage_id)
+        if alarm is not None:
+            setattr(alarm, key, val)
+        else:
+            self.alarm_updates.setdefault(vitrage_id, {})[key] = val
+
+    def create_edge(self, edge):
+        self.edges[(edge.source_id, edge.target_id)] = edge
+
+    def update_edge(self, source_id, target_id, end_timestamp):
+        edge = self.edges.get((source_id, target_id))
+        if edge is not None:
+            edge.end_timestamp = end_timestamp
+        else:
+            self.edge_updates[(source_id, target_id)] = end_timestamp
+
+    def create_change(self, change):
+        self.changes.append(change)
+
+    def store(self, db):
+        db.history_facade.bulk_update(
+            alarms=list(self.alarms.values()),
+            alarm_updates=self.alarm_updates,
+            edges=list(self.edges.values()),
+            edge_updates=self.edge_updates,
+            changes=self.changes)
+
+
 class VitragePersistorEndpoint(object):
     def __init__(self, db_connection):
         self.db = db_connection
@@ -80,18 +131,43 @@ class VitragePersistorEndpoint(object):
             NETypes.CHANGE_PROJECT_ID_EVENT: self._persist_alarm_proj_change,
         }
 
-    def info(self, ctxt, publisher_id, event_type, payload, metadata):
-        LOG.debug('Event_type: %s Payload %s', event_type, payload)
-        self.process_event(event_type, payload)
+    def info(self, messages):
+        LOG.debug('Got %s events', len(messages))
+        self.process_events([(m['event_type'], m['payload'])
+                             for m in messages])
 
     def process_event(self, event_type, payload):
-        writer = self.event_type_to_writer.get(event_type)
-        if not writer:
-            LOG.warning('Unrecognized event_type: %s', event_type)
-            return
-        writer(event_type, payload)
-
-    def _persist_activated_alarm(self, event_type, data):
+        self.process_events([(event_type, payload)])
+
+    def process_events(self, events):
+        """Store the (event_type, payload) events, in a single transaction
+
+        If the events can not be stored together, for example if one of them
+        is of an alarm that is already stored, they are stored one by one.
+        """
+        batch = HistoryBatch()
+        for event_type, payload in events:
+            LOG.debug('Event_type: %s Payload %s', event_type, payload)
+            writer = self.event_type_to_writer.get(event_type)
+            if not writer:
+                LOG.warning('Unrecognized event_type: %s', event_type)
+                continue
+            writer(batch, payload)
+
+        try:
+            batch.store(self.db)
+        except Exception:
+            if len(events) == 1:
+                raise
+            LOG.exception('Failed to store %s events together, storing them '
+                          'one by one', len(events))
+            for event_type, payload in events:
+                try:
+                    self.process_event(event_type, payload)
+                except Exception:
+                    LOG.exception('Failed to store %s event', event_type)
+
+    def _persist_activated_alarm(self, batch, data):
         event_timestamp = self.event_time(data)
 
         alarm_row = \
@@ -110,21 +186,20 @@ class VitragePersistorEndpoint(object):
                 vitrage_resource_project_id=data.get(
                     VProps.VITRAGE_RESOURCE_PROJECT_ID),
                 payload=data)
-        self.db.alarms.create(alarm_row)
+        batch.create_alarm(alarm_row)
 
-    def _persist_deactivate_alarm(self, event_type, data):
+    def _persist_deactivate_alarm(self, batch, data):
         vitrage_id = data.get(VProps.VITRAGE_ID)
         event_timestamp = self.event_time(data)
-        self.db.alarms.update(
-            vitrage_id, HProps.END_TIMESTAMP, event_timestamp)
+        batch.update_alarm(vitrage_id, HProps.END_TIMESTAMP, event_timestamp)
 
-    def _persist_alarm_proj_change(self, event_type, data):
+    def _persist_alarm_proj_change(self, batch, data):
         vitrage_id = data.get(VProps.VITRAGE_ID)
-        self.db.alarms.update(vitrage_id,
-                              VProps.VITRAGE_RESOURCE_PROJECT_ID,
-                              data.get(VProps.VITRAGE_RESOURCE_PROJECT_ID))
+        batch.update_alarm(vitrage_id,
+                           VProps.VITRAGE_RESOURCE_PROJECT_ID,
+                           data.get(VProps.VITRAGE_RESOURCE_PROJECT_ID))
 
-    def _persist_activate_edge(self, event_type, data):
+    def _persist_activate_edge(self, batch, data):
         event_timestamp = self.event_time(data)
 
         edge_row = \
@@ -134,16 +209,15 @@ class VitragePersistorEndpoint(object):
                 label=data.get(EProps.RELATIONSHIP_TYPE),
                 start_timestamp=event_timestamp,
                 payload=data)
-        self.db.edges.create(edge_row)
+        batch.create_edge(edge_row)
 
-    def _persist_deactivate_edge(self, event_type, data):
+    def _persist_deactivate_edge(self, batch, data):
         event_timestamp = self.event_time(data)
         source_id = data.get(EProps.SOURCE_ID)
         target_id = data.get(EProps.TARGET_ID)
-        self.db.edges.update(
-            source_id, target_id, end_timestamp=event_timestamp)
+        batch.update_edge(source_id, target_id, event_timestamp)
 
-    def _persist_change(self, event_type, data):
+    def _persist_change(self, batch, data):
         event_timestamp = self.event_time(data)
         change_row = \
             models.Change(
@@ -151,7 +225,7 @@ class VitragePersistorEndpoint(object):
                 timestamp=event_timestamp,
                 severity=data.get(VProps.VITRAGE_OPERATIONAL_SEVERITY),
                 payload=data)
-        self.db.changes.create(change_row)
+        batch.create_change(change_row)
 
     @staticmethod
     def event_time(data):
@@ -21,4 +21,13 @@ OPTS = [
     cfg.StrOpt('oid_mapping',
                default='',
                help='The default path of oid_mapping yaml file.'),
+    cfg.IntOpt('traps_queue_size',
+               default=10000,
+               min=1,
+               help='Maximal number of received snmp traps that wait to be '
+                    'parsed. Further traps are dropped'),
+    cfg.IntOpt('traps_batch_size',
+               default=100,
+               min=1,
+               help='Maximal number of snmp traps that are parsed together'),
     ]
@@ -14,6 +14,8 @@
 
 from datetime import datetime
 import json
+import os
+import threading
 
 import cotyledon
 from oslo_log import log
@@ -25,6 +27,7 @@ from pysnmp.carrier.asyncore.dgram import udp6
 from pysnmp.carrier.asyncore.dispatch import AsyncoreDispatcher
 from pysnmp.proto import api as snmp_api
 from pysnmp.proto.rfc1902 import Integer
+from six.moves import queue
 import sys
 
 from vitrage.common.constants import EventProperties
@@ -43,11 +46,19 @@ class SnmpParsingService(cotyledon.Service):
         super(SnmpParsingService, self).__init__(worker_id)
         self.conf = conf
         self.listening_port = conf.snmp_parsing.snmp_listening_port
+        self._oid_mapping = OidMapping(conf.snmp_parsing.oid_mapping)
+        self._traps = queue.Queue(maxsize=conf.snmp_parsing.traps_queue_size)
+        self._batch_size = conf.snmp_parsing.traps_batch_size
+        self._dropped_traps = 0
         self._init_oslo_notifier()
 
     def run(self):
         LOG.info("Vitrage SNMP Parsing Service - Starting...")
 
+        worker = threading.Thread(target=self._process_traps)
+        worker.daemon = True
+        worker.start()
+
         transport_dispatcher = AsyncoreDispatcher()
         transport_dispatcher.registerRecvCbFun(self.callback_func)
 
@@ -78,6 +89,43 @@ class SnmpParsingService(cotyledon.Service):
     # noinspection PyUnusedLocal
     def callback_func(self, transport_dispatcher, transport_domain,
                       transport_address, whole_msg):
+        # the traps are parsed by the worker thread, so that the dispatcher
+        # keeps receiving them
+        try:
+            self._traps.put_nowait(whole_msg)
+        except queue.Full:
+            if not self._dropped_traps % 1000:
+                LOG.warning('Dropping snmp traps, %d traps wait to be '
+                            'parsed. Dropped so far: %d',
+                            self._traps.qsize(), self._dropped_traps + 1)
+            self._dropped_traps += 1
+
+    def _process_traps(self):
+        while True:
+            messages = [self._traps.get()]
+            while len(messages) < self._batch_size:
+                try:
+                    messages.append(self._traps.get_nowait())
+                except queue.Empty:
+                    break
+            self._process_batch(messages)
+
+    def _process_batch(self, messages):
+        LOG.debug('Parsing %d snmp traps', len(messages))
+        try:
+            self._oid_mapping.refresh()
+        except Exception:
+            LOG.exception('Failed to load the snmp oid mapping')
+        for whole_msg in messages:
+            try:
+                for binds_dict in self._decode_traps(whole_msg):
+                    LOG.debug('Receive binds info after convert: %s',
+                              binds_dict)
+                    self._send_snmp_to_queue(binds_dict)
+            except Exception:
+                LOG.exception('Failed to parse snmp trap')
+
+    def _decode_traps(self, whole_msg):
         while whole_msg:
             msg_ver = int(snmp_api.decodeMessageVersion(whole_msg))
             if msg_ver in snmp_api.protoModules:
@@ -94,9 +142,7 @@ class SnmpParsingService(cotyledon.Service):
                     if msg_ver == snmp_api.protoVersion1 \
                     else p_mod.apiPDU.getVarBinds(req_pdu)
 
-                binds_dict = self._convert_binds_to_dict(ver_binds)
-                LOG.debug('Receive binds info after convert: %s' % binds_dict)
-                self._send_snmp_to_queue(binds_dict)
+                yield self._convert_binds_to_dict(ver_binds)
 
     def _convert_binds_to_dict(self, var_binds):
         binds_dict = {}
@@ -145,17 +191,72 @@ class SnmpParsingService(cotyledon.Service):
             LOG.warning('Snmp failed to post event. Exception: %s', e)
 
     def _get_event_type(self, snmp_trap):
-        yaml_file_content = load_yaml_file(self.conf.snmp_parsing.oid_mapping)
-        if not yaml_file_content:
+        return self._oid_mapping.get_event_type(snmp_trap)
+
+
+class OidMapping(object):
+    """The event types of the snmp traps, by their system
+
+    Loaded from the oid_mapping file, and loaded again on refresh if the
+    file was modified.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._file_stat = None
+        # {(system oid, system): (position in the file, event type)}
+        self._index = None
+        self._system_oids = []
+
+    def refresh(self):
+        try:
+            stat = os.stat(self._path)
+            file_stat = (stat.st_mtime, stat.st_size)
+        except OSError:
+            file_stat = None
+        if self._index is None or file_stat != self._file_stat:
+            self._file_stat = file_stat
+            self._load()
+
+    def get_event_type(self, snmp_trap):
+        if self._index is None:
+            self.refresh()
+        if not self._index:
             LOG.warning('No snmp trap is configured!')
             return None
 
-        for mapping_info in yaml_file_content:
-            system_oid = extract_field_value(mapping_info, SEProps.SYSTEM_OID)
-            conf_system = extract_field_value(mapping_info, SEProps.SYSTEM)
-            if conf_system == extract_field_value(snmp_trap, system_oid):
-                LOG.debug('snmp trap mapped the system: %s.' % conf_system)
-                return extract_field_value(mapping_info, SEProps.EVENT_TYPE)
+        # the first mapping in the file that matches the trap
+        matches = []
+        for system_oid in self._system_oids:
+            key = (system_oid, extract_field_value(snmp_trap, system_oid))
+            try:
+                match = self._index.get(key)
+            except TypeError:
+                # unhashable value
+                continue
+            if match:
+                matches.append(match)
+        if matches:
+            _, conf_system, event_type = min(matches)
+            LOG.debug('snmp trap mapped the system: %s.' % conf_system)
+            return event_type
 
         LOG.error("Snmp trap does not contain system info!")
         return None
+
+    def _load(self):
+        LOG.info('Loading the snmp oid mapping from %s', self._path)
+        yaml_file_content = load_yaml_file(self._path) or []
+        index = {}
+        system_oids = []
+        for position, mapping_info in enumerate(yaml_file_content):
+            system_oid = extract_field_value(mapping_info, SEProps.SYSTEM_OID)
+            conf_system = extract_field_value(mapping_info, SEProps.SYSTEM)
+            event_type = extract_field_value(mapping_info,
+                                             SEProps.EVENT_TYPE)
+            if system_oid not in system_oids:
+                system_oids.append(system_oid)
+            index.setdefault((system_oid, conf_system),
+                             (position, conf_system, event_type))
+        self._index = index
+        self._system_oids = system_oids
@@ -115,6 +115,28 @@ class ActiveActionsConnection(object):
         """Delete all active actions that match the filters."""
         raise NotImplementedError('delete active actions is not implemented')
 
+    @abc.abstractmethod
+    def query_similar(self, actions):
+        """Returns the active actions that are similar to any of the actions.
+
+        :param actions: (action_type, extra_info, source_vertex_id,
+                        target_vertex_id) tuples. As in query, a None field
+                        matches any value
+        :rtype: list of vitrage.storage.sqlalchemy.models.ActiveAction
+        """
+        raise NotImplementedError('query similar active actions is not '
+                                  'implemented')
+
+    @abc.abstractmethod
+    def bulk_update(self, created, deleted):
+        """Delete and then create active actions, in a single transaction.
+
+        :param created: list of vitrage.storage.sqlalchemy.models.ActiveAction
+        :param deleted: (action_id, trigger) of the actions to delete
+        """
+        raise NotImplementedError('bulk update active actions is not '
+                                  'implemented')
+
 
 @six.add_metaclass(abc.ABCMeta)
 class WebhooksConnection(object):
@@ -196,6 +218,16 @@ class EventsConnection(object):
         """
         raise NotImplementedError('create event is not implemented')
 
+    def create_batch(self, events):
+        """Create new events, in a single transaction.
+
+        The events are created in the order of the list, so their ids are
+        in that order as well.
+
+        :type events: list of vitrage.storage.sqlalchemy.models.Event
+        """
+        raise NotImplementedError('create events batch is not implemented')
+
     def update(self, event):
         """Update an existing event.
 
@@ -243,6 +275,19 @@ class GraphSnapshotsConnection(object):
         """
         raise NotImplementedError('query graph snapshot not implemented')
 
+    def query_deltas(self, base_snapshot_id):
+        """The snapshots stored after the base snapshot, by their order
+
+        :rtype: list of vitrage.storage.sqlalchemy.models.GraphSnapshot
+        """
+        raise NotImplementedError('query graph snapshot deltas not '
+                                  'implemented')
+
+    def delete_deltas(self, base_snapshot_id):
+        """Delete the snapshots stored after the base snapshot"""
+        raise NotImplementedError('delete graph snapshot deltas not '
+                                  'implemented')
+
     def delete(self):
         """Delete all graph snapshots taken until timestamp."""
         raise NotImplementedError('delete graph snapshots not implemented')
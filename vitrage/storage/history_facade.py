@@ -14,10 +14,13 @@
 
 from __future__ import absolute_import
 
+import sqlite3
+
 import pytz
 import sqlalchemy
 from sqlalchemy import and_
 from sqlalchemy import or_
+from sqlalchemy.orm import aliased
 
 from oslo_db.sqlalchemy import utils as sqlalchemyutils
 from oslo_log import log
@@ -38,6 +41,16 @@ LIMIT = 10000
 ASC = 'asc'
 DESC = 'desc'
 
+# filter operators
+EQ = 'eq'
+IN = 'in'
+PREFIX = 'prefix'
+CONTAINS = 'contains'
+FILTER_OPS = (EQ, IN, PREFIX, CONTAINS)
+
+# Maximal number of values in a single IN condition
+MAX_IN_VALUES = 500
+
 
 class HistoryFacadeConnection(object):
     def __init__(self, engine_facade, alarms, edges, changes):
@@ -45,6 +58,7 @@ class HistoryFacadeConnection(object):
         self._alarms = alarms
         self._edges = edges
         self._changes = changes
+        self._supports_recursive_cte = None
 
     def disable_alarms_in_history(self):
         end_time = db_time()
@@ -54,6 +68,57 @@ class HistoryFacadeConnection(object):
         self._edges.end_all_edges(end_time)
         self._changes.add_end_changes(changes_to_add, end_time)
 
+    def bulk_update(self, alarms=(), alarm_updates=None, edges=(),
+                    edge_updates=None, changes=()):
+        """Update and then create history rows, in a single transaction.
+
+        :param alarms: list of vitrage.storage.sqlalchemy.models.Alarm
+        :param alarm_updates: {vitrage_id: {column: value}} of existing alarms
+        :param edges: list of vitrage.storage.sqlalchemy.models.Edge
+        :param edge_updates: {(source_id, target_id): end_timestamp} of
+         existing edges
+        :param changes: list of vitrage.storage.sqlalchemy.models.Change
+        """
+        session = self._engine_facade.get_session()
+        with session.begin():
+            alarms_table = models.Alarm.__table__
+            updates_by_columns = {}
+            for vitrage_id, values in (alarm_updates or {}).items():
+                # bind parameters can not be named as the updated columns
+                params = {'new_' + column: value
+                          for column, value in values.items()}
+                params['_vitrage_id'] = vitrage_id
+                updates_by_columns.setdefault(
+                    tuple(sorted(values)), []).append(params)
+            for columns, params in updates_by_columns.items():
+                session.execute(
+                    alarms_table.update().where(
+                        alarms_table.c.vitrage_id ==
+                        sqlalchemy.bindparam('_vitrage_id')).values(
+                        {c: sqlalchemy.bindparam('new_' + c)
+                         for c in columns}),
+                    params)
+
+            if edge_updates:
+                edges_table = models.Edge.__table__
+                session.execute(
+                    edges_table.update().where(and_(
+                        edges_table.c.source_id ==
+                        sqlalchemy.bindparam('_source_id'),
+                        edges_table.c.target_id ==
+                        sqlalchemy.bindparam('_target_id'))).values(
+                        end_timestamp=sqlalchemy.bindparam('_end_timestamp')),
+                    [{'_source_id': source_id,
+                      '_target_id': target_id,
+                      '_end_timestamp': end_timestamp}
+                     for (source_id, target_id), end_timestamp
+                     in edge_updates.items()])
+
+            # the edges and changes refer to the alarms
+            session.bulk_save_objects(alarms)
+            session.bulk_save_objects(edges)
+            session.bulk_save_objects(changes)
+
     @staticmethod
     def add_utc_timezone(time):
         time = pytz.utc.localize(time)
@@ -62,27 +127,21 @@ class HistoryFacadeConnection(object):
     def count_active_alarms(self, project_id=None, is_admin_project=False):
 
         session = self._engine_facade.get_session()
-        query = session.query(models.Alarm)
+        query = session.query(models.Alarm.vitrage_operational_severity,
+                              sqlalchemy.func.count())
         query = query.filter(models.Alarm.end_timestamp > db_time())
         query = self._add_project_filtering_to_query(
             query, project_id, is_admin_project)
+        query = query.group_by(models.Alarm.vitrage_operational_severity)
 
-        query_severe = query.filter(
-            models.Alarm.vitrage_operational_severity == OSeverity.SEVERE)
-        query_critical = query.filter(
-            models.Alarm.vitrage_operational_severity == OSeverity.CRITICAL)
-        query_warning = query.filter(
-            models.Alarm.vitrage_operational_severity == OSeverity.WARNING)
-        query_ok = query.filter(
-            models.Alarm.vitrage_operational_severity == OSeverity.OK)
-        query_na = query.filter(
-            models.Alarm.vitrage_operational_severity == OSeverity.NA)
-
-        counts = {OSeverity.SEVERE: query_severe.count(),
-                  OSeverity.CRITICAL: query_critical.count(),
-                  OSeverity.WARNING: query_warning.count(),
-                  OSeverity.OK: query_ok.count(),
-                  OSeverity.NA: query_na.count()}
+        counts = {OSeverity.SEVERE: 0,
+                  OSeverity.CRITICAL: 0,
+                  OSeverity.WARNING: 0,
+                  OSeverity.OK: 0,
+                  OSeverity.NA: 0}
+        for severity, count in query.all():
+            if severity in counts:
+                counts[severity] = count
 
         return counts
 
@@ -94,6 +153,7 @@ class HistoryFacadeConnection(object):
                    sort_dirs=(ASC, ASC),
                    filter_by=None,
                    filter_vals=None,
+                   filter_ops=None,
                    next_page=True,
                    marker=None,
                    only_active_alarms=False,
@@ -146,7 +206,12 @@ class HistoryFacadeConnection(object):
         filter_by represents parameters to filter on,
         and filter_vals contains the values to filter on in corresponding
         order to the order of parameters in filter_by.
-        The filtering is according to SQL 'like' statement.
+        filter_ops contains the filter operator of every parameter:
+        'eq' and 'in' for values that are equal to one of the filter values,
+        'prefix' for values that start with one of them, and 'contains'
+        for values that contain one of them.
+        Without filter_ops, the filtering is by 'contains', according to SQL
+        'like' statement, which can not use the table indexes.
         It's possible to filter on each row of alarms table
         The filtering is also possible on list of values.
 
@@ -173,6 +238,13 @@ class HistoryFacadeConnection(object):
             in the DB with vitrage type containing the string 'zabbix'
             and with one of vitrage_ids that are in the list in filter_vals[1]
 
+        3. Following example is filtering with operators:
+            |   filter_by = ['vitrage_type', 'vitrage_id']
+            |   filter_vals = ['zab', ['123', '456', '789']]
+            |   filter_ops = ['prefix', 'in']
+            It will be evaluated to:
+                Alarm.vitrage_type like 'zab%'
+                and Alarm.vitrage_id in ('123', '456', '789')
 
         :param start: start of time frame
         :param end: end of time frame
@@ -186,6 +258,8 @@ class HistoryFacadeConnection(object):
         :param filter_by: array of attributes by which results will be filtered
         :param filter_vals: per-column array of filter values
         corresponding to filter_by
+        :param filter_ops: per-column array of filter operators
+        corresponding to filter_by ('eq', 'in', 'prefix' or 'contains')
         :param next_page: if True will return next page when marker is given,
          if False will return previous page when marker is given,
          otherwise, returns first page if no marker was given.
@@ -207,14 +281,15 @@ class HistoryFacadeConnection(object):
             query, project_id, is_admin_project)
 
         self.assert_args(start, end, filter_by, filter_vals,
-                         only_active_alarms, sort_dirs)
+                         only_active_alarms, sort_dirs, filter_ops)
 
         if only_active_alarms:
             query = query.filter(models.Alarm.end_timestamp > db_time())
         elif (start and end) or start:
             query = self._add_time_frame_to_query(query, start, end)
 
-        query = self._add_filtering_to_query(query, filter_by, filter_vals)
+        query = self._add_filtering_to_query(query, filter_by, filter_vals,
+                                             filter_ops)
 
         if limit:
             query = self._generate_alarms_paginate_query(query,
@@ -239,7 +314,8 @@ class HistoryFacadeConnection(object):
                     filter_by,
                     filter_vals,
                     only_active_alarms,
-                    sort_dirs):
+                    sort_dirs,
+                    filter_ops=None):
         if only_active_alarms and (start or end):
             raise VitrageInputError("'only_active_alarms' can't be used "
                                     "with 'start' or 'end' ")
@@ -251,6 +327,12 @@ class HistoryFacadeConnection(object):
         if filter_by and filter_vals and len(filter_by) != len(filter_vals):
             raise VitrageInputError("Cannot perform filtering, len of "
                                     "'filter_by' and 'filter_vals' differs")
+        if filter_ops and len(filter_ops) != len(filter_by or []):
+            raise VitrageInputError("Cannot perform filtering, len of "
+                                    "'filter_by' and 'filter_ops' differs")
+        for op in filter_ops or []:
+            if op not in FILTER_OPS:
+                raise VitrageInputError("Unknown filter operator %s", str(op))
         for d in sort_dirs:
             if d not in (ASC, DESC):
                 raise VitrageInputError("Unknown sort direction %s", str(d))
@@ -272,44 +354,60 @@ class HistoryFacadeConnection(object):
             query = query.filter(models.Alarm.end_timestamp >= start)
         return query
 
-    @staticmethod
-    def _add_project_filtering_to_query(query, project_id=None,
+    @classmethod
+    def _add_project_filtering_to_query(cls, query, project_id=None,
                                         is_admin_project=False):
-
-        if project_id:
-            if is_admin_project:
-                query = query.filter(or_(
-                    or_(models.Alarm.project_id == project_id,
-                        models.Alarm.vitrage_resource_project_id ==
-                        project_id),
-                    and_(
-                        or_(
-                            models.Alarm.project_id == project_id,
-                            models.Alarm.project_id == None),
-                        or_(
-                            models.Alarm.vitrage_resource_project_id ==
-                            project_id,
-                            models.Alarm.vitrage_resource_project_id == None)
-                    )))  # noqa
-            else:
-                query = query.filter(
-                    or_(models.Alarm.project_id == project_id,
-                        models.Alarm.vitrage_resource_project_id ==
-                        project_id))
+        cond = cls._project_filter(project_id, is_admin_project)
+        if cond is not None:
+            query = query.filter(cond)
         return query
 
     @staticmethod
-    def _add_filtering_to_query(query, filter_by, filter_vals):
+    def _project_filter(project_id=None, is_admin_project=False,
+                        alarm=models.Alarm):
+        """The condition on the alarm project, or None for any project
+
+        :param alarm: the Alarm model, an alias of it, or the columns of
+         an alias of the alarms table
+        """
+        if not project_id:
+            return None
+        if is_admin_project:
+            return or_(
+                or_(alarm.project_id == project_id,
+                    alarm.vitrage_resource_project_id == project_id),
+                and_(
+                    or_(
+                        alarm.project_id == project_id,
+                        alarm.project_id == None),
+                    or_(
+                        alarm.vitrage_resource_project_id == project_id,
+                        alarm.vitrage_resource_project_id == None)
+                ))  # noqa
+        return or_(alarm.project_id == project_id,
+                   alarm.vitrage_resource_project_id == project_id)
+
+    @staticmethod
+    def _add_filtering_to_query(query, filter_by, filter_vals,
+                                filter_ops=None):
 
         if not (filter_by or filter_vals):
             return query
 
         for i in range(len(filter_by)):
-            key = filter_by[i]
+            column = getattr(models.Alarm, filter_by[i])
             val = filter_vals[i]
             val = val if val and type(val) == list else [val]
-            cond = or_(*[getattr(models.Alarm, key).like(
-                '%' + val[j] + '%') for j in range(len(val))])
+            op = filter_ops[i] if filter_ops else CONTAINS
+            if op in (EQ, IN) and len(val) == 1:
+                cond = column == val[0]
+            elif op in (EQ, IN):
+                cond = or_(*[column.in_(val[j:j + MAX_IN_VALUES])
+                             for j in range(0, len(val), MAX_IN_VALUES)])
+            elif op == PREFIX:
+                cond = or_(*[column.like(v + '%') for v in val])
+            else:
+                cond = or_(*[column.like('%' + v + '%') for v in val])
             query = query.filter(cond)
         return query
 
@@ -371,6 +469,20 @@ class HistoryFacadeConnection(object):
                   depth=None,
                   project_id=None,
                   admin=False):
+        """The alarms that cause or are caused by the alarm, and their edges
+
+        Walks the 'causes' edges with a recursive query, or level by level
+        on engines that do not support recursive common table expressions.
+
+        :param depth: the maximal number of edges from the alarm, unlimited
+         if not given
+        :return: (alarms, edges) lists of
+         vitrage.storage.sqlalchemy.models.Alarm and
+         vitrage.storage.sqlalchemy.models.Edge
+        """
+        if self._recursive_cte_supported():
+            return self._cte_rca(alarm_id, forward, backward, depth,
+                                 project_id, admin)
 
         n_result_f = []
         e_result_f = []
@@ -388,12 +500,119 @@ class HistoryFacadeConnection(object):
 
         n_result = self.get_alarms(limit=0,
                                    filter_by=[HProps.VITRAGE_ID],
-                                   filter_vals=[n_result_f + n_result_b])
+                                   filter_vals=[n_result_f + n_result_b],
+                                   filter_ops=[IN])
 
         e_result = e_result_f + e_result_b
 
         return n_result, e_result
 
+    def _recursive_cte_supported(self):
+        if self._supports_recursive_cte is None:
+            dialect = self._engine_facade.get_engine().dialect
+            version = dialect.server_version_info or ()
+            if dialect.name == 'sqlite':
+                supported = sqlite3.sqlite_version_info >= (3, 8, 3)
+            elif dialect.name == 'postgresql':
+                supported = True
+            elif dialect.name == 'mysql':
+                if getattr(dialect, '_is_mariadb', False):
+                    supported = version >= (10, 2)
+                else:
+                    supported = version >= (8,)
+            else:
+                supported = False
+            LOG.info('Recursive queries are %ssupported by %s %s',
+                     '' if supported else 'not ', dialect.name, version)
+            self._supports_recursive_cte = supported
+        return self._supports_recursive_cte
+
+    def _cte_rca(self, alarm_id, forward, backward, depth, project_id,
+                 admin):
+        session = self._engine_facade.get_session()
+        source = aliased(models.Alarm)
+        target = aliased(models.Alarm)
+        query = session.query(models.Edge, source, target)\
+            .outerjoin(source, models.Edge.source)\
+            .join(target, models.Edge.target)\
+            .filter(models.Edge.label == ELable.CAUSES)
+        project_filter = self._project_filter(project_id, admin, target)
+        if project_filter is not None:
+            query = query.filter(project_filter)
+
+        # the alarms whose edges are in the rca, in each direction
+        expanded = []
+        if forward:
+            nodes = self._rca_cte(alarm_id, HProps.SOURCE_ID,
+                                  HProps.TARGET_ID, depth, project_id, admin)
+            expanded.append(models.Edge.source_id.in_(
+                sqlalchemy.select([nodes.c.vitrage_id])))
+        if backward:
+            # the alarms are expanded as targets of the edges, and so they
+            # must match the project filter themselves
+            nodes = self._rca_cte(alarm_id, HProps.TARGET_ID,
+                                  HProps.SOURCE_ID, depth, project_id, admin)
+            expanded.append(models.Edge.target_id.in_(
+                sqlalchemy.select([nodes.c.vitrage_id])))
+        if not expanded:
+            rows = []
+        else:
+            rows = query.filter(or_(*expanded)).all()
+
+        edges = []
+        alarms = {}
+        for edge, source_alarm, target_alarm in rows:
+            edges.append(edge)
+            for alarm in (source_alarm, target_alarm):
+                if alarm is not None:
+                    alarms[alarm.vitrage_id] = alarm
+        if alarm_id not in alarms:
+            root = session.query(models.Alarm)\
+                .filter(models.Alarm.vitrage_id == alarm_id).first()
+            if root is not None:
+                alarms[alarm_id] = root
+
+        nodes = sorted(alarms.values(),
+                       key=lambda a: (a.start_timestamp, a.vitrage_id))
+        return nodes, edges
+
+    def _rca_cte(self, alarm_id, from_column, to_column, depth, project_id,
+                 admin):
+        """The alarms that are expanded when walking the rca edges
+
+        Starting from the alarm, the edges are walked from their from_column
+        to their to_column, for up to depth - 1 edges. An edge is walked only
+        if its target alarm matches the project filter.
+        """
+        vitrage_id = sqlalchemy.cast(sqlalchemy.literal(alarm_id),
+                                     models.Edge.source_id.type)
+        limited = bool(depth)
+        if limited:
+            nodes = sqlalchemy.select([
+                vitrage_id.label('vitrage_id'),
+                sqlalchemy.literal(0).label('depth')])
+        else:
+            # without the depth, UNION removes the alarms that were already
+            # found, and so the query ends on cycles
+            nodes = sqlalchemy.select([vitrage_id.label('vitrage_id')])
+        nodes = nodes.cte('rca_%s' % from_column, recursive=True)
+        prev = nodes.alias()
+
+        edges = models.Edge.__table__
+        target = models.Alarm.__table__.alias()
+        conditions = [getattr(edges.c, from_column) == prev.c.vitrage_id,
+                      edges.c.label == ELable.CAUSES,
+                      target.c.vitrage_id == edges.c.target_id]
+        project_filter = self._project_filter(project_id, admin, target.c)
+        if project_filter is not None:
+            conditions.append(project_filter)
+        columns = [getattr(edges.c, to_column)]
+        if limited:
+            conditions.append(prev.c.depth < depth - 1)
+            columns.append(prev.c.depth + 1)
+
+        return nodes.union(sqlalchemy.select(columns).where(and_(*conditions)))
+
     def _rca_edges(self, filter_by, a_ids, proj_id, admin):
         alarm_ids = [str(alarm) for alarm in a_ids]
         session = self._engine_facade.get_session()
@@ -426,9 +645,9 @@ class HistoryFacadeConnection(object):
             node_ids = nodes_q.pop(curr_depth)
             if depth and curr_depth >= depth:
                 break
-            for node_id in node_ids:
-                if node_id in visited_nodes:
-                    node_ids.remove(node_id)
+            node_ids = [n for n in node_ids if n not in visited_nodes]
+            if not node_ids:
+                break
             visited_nodes.update(node_ids)
             e_list = neighbors_func(node_ids, project_id, admin)
             n_list = \
@@ -20,6 +20,8 @@ from oslo_log import log
 from sqlalchemy import and_
 from sqlalchemy.engine import url as sqlalchemy_url
 from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import true
 
 from vitrage.common.exception import VitrageInputError
 from vitrage.entity_graph.mappings.operational_alarm_severity import \
@@ -32,6 +34,9 @@ from vitrage.storage.sqlalchemy.models import Template
 
 LOG = log.getLogger(__name__)
 
+# Maximal number of OR-ed conditions in a single statement
+MAX_OR_CONDITIONS = 100
+
 
 class Connection(base.Connection):
     def __init__(self, conf, url):
@@ -244,6 +249,38 @@ class ActiveActionsConnection(base.ActiveActionsConnection, BaseTableConn):
             trigger=trigger)
         return query.delete()
 
+    def query_similar(self, actions):
+        model = models.ActiveAction
+        fields = (model.action_type, model.extra_info,
+                  model.source_vertex_id, model.target_vertex_id)
+        conditions = []
+        for action in set(actions):
+            field_conditions = [field == value
+                                for field, value in zip(fields, action)
+                                if value is not None]
+            conditions.append(and_(*field_conditions)
+                              if field_conditions else true())
+
+        session = self._engine_facade.get_session()
+        result = []
+        for i in range(0, len(conditions), MAX_OR_CONDITIONS):
+            result.extend(session.query(model).filter(
+                or_(*conditions[i:i + MAX_OR_CONDITIONS])).all())
+        return result
+
+    def bulk_update(self, created, deleted):
+        model = models.ActiveAction
+        conditions = [and_(model.action_id == action_id,
+                           model.trigger == trigger)
+                      for action_id, trigger in deleted]
+        session = self._engine_facade.get_session()
+        with session.begin():
+            for i in range(0, len(conditions), MAX_OR_CONDITIONS):
+                session.query(model).filter(
+                    or_(*conditions[i:i + MAX_OR_CONDITIONS])).delete(
+                    synchronize_session=False)
+            session.add_all(created)
+
 
 class WebhooksConnection(base.WebhooksConnection,
                          BaseTableConn):
@@ -286,6 +323,11 @@ class EventsConnection(base.EventsConnection, BaseTableConn):
         with session.begin():
             session.add(event)
 
+    def create_batch(self, events):
+        session = self._engine_facade.get_session()
+        with session.begin():
+            session.bulk_save_objects(events)
+
     def update(self, event):
         session = self._engine_facade.get_session()
         with session.begin():
@@ -296,15 +338,20 @@ class EventsConnection(base.EventsConnection, BaseTableConn):
         query = session.query(models.Event.event_id)
         return query.order_by(models.Event.event_id.desc()).first()
 
-    def get_replay_events(self, event_id):
-        """Get all events that occurred after the specified event_id
+    def get_replay_events(self, event_id, limit=None):
+        """Get the events that occurred after the specified event_id
 
+        :param limit: get only the first events, the next ones are queried
+         after the event_id of the last of them
         :rtype: list of vitrage.storage.sqlalchemy.models.Event
         """
         session = self._engine_facade.get_session()
         query = session.query(models.Event)
         query = query.filter(models.Event.event_id > event_id)
-        return query.order_by(models.Event.event_id.asc()).all()
+        query = query.order_by(models.Event.event_id.asc())
+        if limit:
+            query = query.limit(limit)
+        return query.all()
 
     def query(self,
               event_id=None,
@@ -374,15 +421,27 @@ class GraphSnapshotsConnection(base.GraphSnapshotsConnection, BaseTableConn):
 
     def query(self):
         query = self.query_filter(models.GraphSnapshot)
-        return query.first()
+        return query.order_by(models.GraphSnapshot.snapshot_id).first()
+
+    def query_deltas(self, base_snapshot_id):
+        query = self.query_filter(models.GraphSnapshot)
+        query = query.filter(
+            models.GraphSnapshot.snapshot_id > base_snapshot_id)
+        return query.order_by(models.GraphSnapshot.snapshot_id).all()
 
     def query_snapshot_event_id(self):
-        """Select the event_id of the stored snapshot"""
+        """Select the event_id of the latest stored snapshot"""
         session = self._engine_facade.get_session()
-        query = session.query(models.GraphSnapshot.event_id)
+        query = session.query(func.max(models.GraphSnapshot.event_id))
         result = query.first()
         return result[0] if result else None
 
+    def delete_deltas(self, base_snapshot_id):
+        query = self.query_filter(models.GraphSnapshot)
+        query = query.filter(
+            models.GraphSnapshot.snapshot_id > base_snapshot_id)
+        query.delete()
+
     def delete(self):
         """Delete all graph snapshots"""
         query = self.query_filter(models.GraphSnapshot)
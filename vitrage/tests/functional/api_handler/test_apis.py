@@ -12,12 +12,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from datetime import timedelta
+import fixtures
 import json
+import os
 
 from testtools import matchers
 
 from oslo_config import cfg
 
+from vitrage.api_handler.apis.alarm import ActiveAlarmsCounter
 from vitrage.api_handler.apis.alarm import AlarmApis
 from vitrage.api_handler.apis.rca import RcaApis
 from vitrage.api_handler.apis.resource import ResourceApis
@@ -26,6 +30,7 @@ from vitrage.common.constants import EdgeLabel
 from vitrage.common.constants import EdgeProperties
 from vitrage.common.constants import EntityCategory
 from vitrage.common.constants import VertexProperties as VProps
+from vitrage.common.exception import VitrageInputError
 from vitrage.datasources import NOVA_HOST_DATASOURCE
 from vitrage.datasources import NOVA_INSTANCE_DATASOURCE
 from vitrage.datasources import NOVA_ZONE_DATASOURCE
@@ -36,8 +41,10 @@ from vitrage.entity_graph.mappings.operational_alarm_severity import \
 from vitrage.entity_graph.processor.notifier import PersistNotifier
 from vitrage.graph.driver.networkx_graph import edge_copy
 from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.graph.driver.shared_graph import SharedGraph
 import vitrage.graph.utils as graph_utils
 from vitrage.persistency.service import VitragePersistorEndpoint
+from vitrage.storage.sqlalchemy import models
 from vitrage.tests.base import IsEmpty
 from vitrage.tests.functional.test_configuration import TestConfiguration
 from vitrage.tests.unit.entity_graph.base import TestEntityGraphUnitBase
@@ -128,6 +135,81 @@ class TestApis(TestEntityGraphUnitBase, TestConfiguration):
         self.assertEqual(0, counts['OK'])
         self.assertEqual(0, counts['N/A'])
 
+    def test_get_alarm_counts_from_graph(self):
+        # Setup
+        graph = self._create_graph()
+        counter = ActiveAlarmsCounter(graph)
+        db_apis = AlarmApis(graph, self.conf, self._db)
+        graph_apis = AlarmApis(graph, self.conf, self._db, counter)
+
+        def assert_same_counts():
+            for ctx in ({'tenant': 'project_1', 'is_admin': True},
+                        {'tenant': 'project_2', 'is_admin': False},
+                        {'tenant': 'project_3', 'is_admin': True}):
+                for all_tenants in (True, False):
+                    self.assertEqual(
+                        json.loads(db_apis.get_alarm_counts(ctx, all_tenants)),
+                        json.loads(graph_apis.get_alarm_counts(ctx,
+                                                               all_tenants)))
+
+        # Test assertions
+        assert_same_counts()
+
+        # Action
+        alarm = graph.get_vertices(vertex_attr_filter={
+            VProps.VITRAGE_CATEGORY: EntityCategory.ALARM})[0]
+        before = graph.get_vertex(alarm.vertex_id)
+        alarm[VProps.VITRAGE_IS_DELETED] = True
+        # the database times are in seconds
+        alarm[VProps.UPDATE_TIMESTAMP] = \
+            str(utcnow() - timedelta(seconds=1))
+        graph.update_vertex(alarm)
+        counter.update(before, graph.get_vertex(alarm.vertex_id))
+
+        # Test assertions
+        assert_same_counts()
+        self.assertEqual(ActiveAlarmsCounter(graph).count(), counter.count())
+
+    def test_get_alarms_with_filter_ops(self):
+        # Setup
+        self._create_graph()
+        history = self._db.history_facade
+        alarms = history.get_alarms(limit=0)
+        alarm_ids = sorted(a.vitrage_id for a in alarms)
+        resource_id = alarms[0].vitrage_resource_id
+
+        def filtered_ids(filter_by, filter_vals, filter_ops):
+            return sorted(a.vitrage_id for a in history.get_alarms(
+                limit=0, filter_by=filter_by, filter_vals=filter_vals,
+                filter_ops=filter_ops))
+
+        # Test assertions
+        self.assertEqual(alarm_ids[:1],
+                         filtered_ids(['vitrage_id'], [alarm_ids[0]], ['eq']))
+        self.assertEqual(alarm_ids[1:3],
+                         filtered_ids(['vitrage_id'], [alarm_ids[1:3]],
+                                      ['in']))
+        self.assertEqual(
+            [],
+            filtered_ids(['vitrage_id'], [alarm_ids[0][1:]], ['eq']))
+        self.assertEqual(
+            alarm_ids[:1],
+            filtered_ids(['vitrage_id'], [alarm_ids[0][:-1]], ['prefix']))
+        self.assertEqual(
+            alarm_ids[:1],
+            filtered_ids(['vitrage_id'], [alarm_ids[0][1:]], ['contains']))
+        self.assertEqual(
+            sorted(a.vitrage_id for a in alarms
+                   if a.vitrage_resource_id == resource_id),
+            filtered_ids(['vitrage_resource_id', 'vitrage_id'],
+                         [resource_id, alarm_ids], ['eq', 'in']))
+        self.assertRaises(VitrageInputError, history.get_alarms,
+                          filter_by=['vitrage_id'], filter_vals=['a'],
+                          filter_ops=['like'])
+        self.assertRaises(VitrageInputError, history.get_alarms,
+                          filter_by=['vitrage_id'], filter_vals=['a'],
+                          filter_ops=['eq', 'eq'])
+
     def test_get_rca_with_admin_project(self):
         # Setup
         graph = self._create_graph()
@@ -186,6 +268,69 @@ class TestApis(TestEntityGraphUnitBase, TestConfiguration):
         self.assertThat(graph_rca['nodes'], matchers.HasLength(5))
         self._check_projects_entities(graph_rca['nodes'], None, True)
 
+    def test_get_rca_with_recursive_query(self):
+        # Setup
+        self._db.alarms.delete()
+        self._db.edges.delete()
+        history = self._db.history_facade
+        now = utcnow()
+        projects = {'a': 'project_1', 'b': 'project_1', 'c': 'project_1',
+                    'd': 'project_1', 'e': 'project_2', 'f': 'project_2',
+                    'x': 'project_1'}
+        alarms = [models.Alarm(vitrage_id=vitrage_id,
+                               start_timestamp=now,
+                               name=vitrage_id,
+                               vitrage_type='zabbix',
+                               vitrage_aggregated_severity='WARNING',
+                               vitrage_operational_severity='WARNING',
+                               project_id=project_id,
+                               payload={})
+                  for vitrage_id, project_id in projects.items()]
+        causes = [('a', 'b'), ('b', 'c'), ('c', 'a'), ('c', 'd'),
+                  ('e', 'a'), ('b', 'f'), ('f', 'd')]
+        edges = [models.Edge(source_id=source_id, target_id=target_id,
+                             label=EdgeLabel.CAUSES, start_timestamp=now,
+                             payload={})
+                 for source_id, target_id in causes]
+        edges.append(models.Edge(source_id='x', target_id='b',
+                                 label=EdgeLabel.ON, start_timestamp=now,
+                                 payload={}))
+        history.bulk_update(alarms=alarms, edges=edges)
+        self.addCleanup(self._db.edges.delete)
+        self.addCleanup(self._db.alarms.delete)
+
+        def rca(root, **kwargs):
+            nodes, edges = history.alarm_rca(root, **kwargs)
+            return (sorted(n.vitrage_id for n in nodes),
+                    sorted({(e.source_id, e.target_id) for e in edges}))
+
+        # Test assertions
+        self.assertTrue(history._recursive_cte_supported())
+        self.assertEqual((['a', 'b', 'c', 'd', 'e', 'f'],
+                          sorted(causes)), rca('a'))
+        self.assertEqual((['a', 'b', 'c', 'e'],
+                          [('a', 'b'), ('c', 'a'), ('e', 'a')]),
+                         rca('a', depth=1))
+        # e is of another project, and only its edge to a is in the rca
+        self.assertEqual((['a', 'b', 'c', 'e'],
+                          [('a', 'b'), ('b', 'c'), ('c', 'a'), ('e', 'a')]),
+                         rca('a', project_id='project_1', depth=2))
+        self.assertEqual((['d'], []), rca('d', forward=False,
+                                          project_id='project_2'))
+
+        results = {}
+        for supported in (True, False):
+            history._supports_recursive_cte = supported
+            results[supported] = [
+                rca(root, depth=depth, project_id=project_id, admin=admin)
+                for root in ('a', 'c', 'f', 'x')
+                for depth in (None, 1, 2, 3)
+                for project_id, admin in ((None, False),
+                                          ('project_1', False),
+                                          ('project_2', True))]
+        history._supports_recursive_cte = None
+        self.assertEqual(results[False], results[True])
+
     def test_get_topology_with_admin_project(self):
         # Setup
         graph = self._create_graph()
@@ -329,6 +474,44 @@ class TestApis(TestEntityGraphUnitBase, TestConfiguration):
         # Test assertions
         self.assertThat(resources, matchers.HasLength(7))
 
+    def test_get_topology_and_resources_from_shared_graph(self):
+        # Setup
+        graph = self._create_graph()
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, 'graph')
+        SharedGraph.write_snapshot(graph, path)
+        shared_graph = SharedGraph(path)
+
+        for ctx, all_tenants in (
+                ({'tenant': 'project_1', 'is_admin': True}, False),
+                ({'tenant': 'project_2', 'is_admin': False}, False),
+                ({'tenant': 'project_1', 'is_admin': False}, True)):
+            # Action
+            topology = TopologyApis(graph, None).get_topology(
+                ctx, graph_type='graph', depth=10, query=None, root=None,
+                all_tenants=all_tenants)
+            shared_topology = TopologyApis(shared_graph, None).get_topology(
+                ctx, graph_type='graph', depth=10, query=None, root=None,
+                all_tenants=all_tenants)
+            resources = ResourceApis(graph, None).get_resources(
+                ctx, resource_type=None, all_tenants=all_tenants)
+            shared_resources = ResourceApis(shared_graph, None).get_resources(
+                ctx, resource_type=None, all_tenants=all_tenants)
+
+            # Test assertions
+            self.assertEqual(
+                sorted(n[VProps.VITRAGE_ID]
+                       for n in json.loads(topology)['nodes']),
+                sorted(n[VProps.VITRAGE_ID]
+                       for n in json.loads(shared_topology)['nodes']))
+            self.assertThat(json.loads(shared_topology)['links'],
+                            matchers.HasLength(
+                                len(json.loads(topology)['links'])))
+            self.assertEqual(
+                sorted(r[VProps.VITRAGE_ID]
+                       for r in json.loads(resources)['resources']),
+                sorted(r[VProps.VITRAGE_ID]
+                       for r in json.loads(shared_resources)['resources']))
+
     def test_resource_show_with_admin_and_no_project_resource(self):
         # Setup
         graph = self._create_graph()
@@ -34,6 +34,7 @@ from vitrage.graph.driver.networkx_graph import NXGraph
 from vitrage.tests.functional.base import TestFunctionalBase
 from vitrage.tests.functional.test_configuration import TestConfiguration
 from vitrage.tests.mocks import utils
+from vitrage.utils.datetime import timestamp_ns
 from vitrage.utils.datetime import utcnow
 
 
@@ -241,7 +242,8 @@ class TestConsistencyFunctional(TestFunctionalBase, TestConfiguration):
         # set part of the instances as deleted
         for i in range(6, 9):
             instance_vertices[i][VProps.VITRAGE_IS_DELETED] = True
-            instance_vertices[i][VProps.VITRAGE_SAMPLE_TIMESTAMP] = str(
+            self._set_sample_timestamp(
+                instance_vertices[i],
                 current_time + timedelta(seconds=2 * consistency_interval + 1))
             self.processor.entity_graph.update_vertex(instance_vertices[i])
 
@@ -261,9 +263,14 @@ class TestConsistencyFunctional(TestFunctionalBase, TestConfiguration):
 
     def _update_timestamp(self, lst, timestamp):
         for vertex in lst:
-            vertex[VProps.VITRAGE_SAMPLE_TIMESTAMP] = str(timestamp)
+            self._set_sample_timestamp(vertex, timestamp)
             self.processor.entity_graph.update_vertex(vertex)
 
+    @staticmethod
+    def _set_sample_timestamp(vertex, timestamp):
+        vertex[VProps.VITRAGE_SAMPLE_TIMESTAMP] = str(timestamp)
+        vertex[VProps.VITRAGE_SAMPLE_TIMESTAMP_NS] = timestamp_ns(timestamp)
+
     def _process_events(self):
         num_retries = 0
         while True:
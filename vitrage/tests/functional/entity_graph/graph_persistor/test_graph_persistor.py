@@ -12,12 +12,17 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 from oslo_config import cfg
+from six.moves import cPickle
+from testtools import matchers
 
 from vitrage.common.constants import EdgeProperties
 from vitrage.common.constants import VertexProperties
+from vitrage.datasources.transformer_base import TransformerBase
 from vitrage.graph.driver.networkx_graph import NXGraph
 
 from vitrage.entity_graph import graph_persistency
+from vitrage import persistency
+from vitrage.storage.sqlalchemy import models
 from vitrage.tests.functional.base import TestFunctionalBase
 from vitrage.tests.functional.test_configuration import TestConfiguration
 from vitrage.tests.mocks.graph_generator import GraphGenerator
@@ -32,6 +37,7 @@ class TestGraphPersistor(TestFunctionalBase, TestConfiguration):
         cls.conf = cfg.ConfigOpts()
         cls.conf.register_opts(cls.PROCESSOR_OPTS, group='entity_graph')
         cls.conf.register_opts(cls.DATASOURCES_OPTS, group='datasources')
+        cls.conf.register_opts(persistency.OPTS, group='persistency')
         cls.add_db(cls.conf)
         cls.load_datasources(cls.conf)
 
@@ -41,7 +47,8 @@ class TestGraphPersistor(TestFunctionalBase, TestConfiguration):
                                                              self._db, g)
         graph_persistor.store_graph()
         recovered_data = graph_persistor.query_recent_snapshot()
-        recovered_graph = self.load_snapshot(recovered_data)
+        recovered_graph = self.load_snapshot(recovered_data,
+                                             graph_persistor)
         self.assert_graph_equal(g, recovered_graph)
 
     def test_event_store_and_replay_events(self):
@@ -87,10 +94,12 @@ class TestGraphPersistor(TestFunctionalBase, TestConfiguration):
         g.update_edge(edge)
 
         self.assertIsNone(self.fail_msg, 'callback failed')
+        graph_persistor.flush_events()
 
         # Reload snapshot
         recovered_data = graph_persistor.query_recent_snapshot()
-        recovered_graph = self.load_snapshot(recovered_data)
+        recovered_graph = self.load_snapshot(recovered_data,
+                                             graph_persistor)
 
         # Replay events:
         self.assertEqual(3, recovered_data.event_id, 'graph snapshot event_id')
@@ -98,6 +107,203 @@ class TestGraphPersistor(TestFunctionalBase, TestConfiguration):
 
         self.assert_graph_equal(g, recovered_graph)
 
+    def test_replay_events_in_chunks(self):
+        self.conf.set_override('replay_events_chunk_size', 2, 'persistency')
+        self.addCleanup(self.conf.clear_override, 'replay_events_chunk_size',
+                        'persistency')
+        self._db.events.delete()
+        self.addCleanup(self._db.events.delete)
+        g = GraphGenerator().create_graph()
+        vertices = g.get_vertices()
+        recovered_graph = g.copy()
+        graph_persistor = graph_persistency.GraphPersistency(self.conf,
+                                                             self._db, g)
+        event_ids = iter(range(1, 10))
+
+        def callback(before, current, is_vertex, graph):
+            graph_persistor.persist_event(before, current, is_vertex, graph,
+                                          next(event_ids))
+        g.subscribe(callback)
+
+        # the events of the same vertex are merged in a chunk
+        vertices[0][VertexProperties.NAME] = 'first'
+        g.update_vertex(vertices[0])
+        vertices[0][VertexProperties.NAME] = 'second'
+        g.update_vertex(vertices[0])
+        vertices[1][VertexProperties.NAME] = 'other'
+        g.update_vertex(vertices[1])
+        edge = g.get_edges(vertices[1].vertex_id).pop()
+        edge[EdgeProperties.RELATIONSHIP_TYPE] = 'kuku'
+        g.update_edge(edge)
+        vertices[1][VertexProperties.NAME] = 'last'
+        g.update_vertex(vertices[1])
+        graph_persistor.flush_events()
+
+        graph_persistor.replay_events(recovered_graph, 0)
+
+        self.assert_graph_equal(g, recovered_graph)
+        self.assertEqual(
+            'second',
+            recovered_graph.get_vertex(vertices[0].vertex_id).get(
+                VertexProperties.NAME))
+
+    def test_buffered_events(self):
+        self.conf.set_override('events_buffer_size', 3, 'persistency')
+        self.conf.set_override('events_flush_interval', 60, 'persistency')
+        self.addCleanup(self.conf.clear_override, 'events_buffer_size',
+                        'persistency')
+        self.addCleanup(self.conf.clear_override, 'events_flush_interval',
+                        'persistency')
+        self._db.events.delete()
+        self.addCleanup(self._db.events.delete)
+        g = GraphGenerator().create_graph()
+        vertices = g.get_vertices()
+        graph_persistor = graph_persistency.GraphPersistency(self.conf,
+                                                             self._db, g)
+        event_ids = iter(range(1, 10))
+
+        # sqlite does not generate the BigInteger event ids
+        def callback(before, current, is_vertex, graph):
+            graph_persistor.persist_event(before, current, is_vertex, graph,
+                                          next(event_ids))
+        g.subscribe(callback)
+
+        for v in vertices[:2]:
+            v[VertexProperties.NAME] = 'buffered'
+            g.update_vertex(v)
+        self.assertEqual([], self._db.events.get_replay_events(0))
+
+        vertices[2][VertexProperties.NAME] = 'flushed'
+        g.update_vertex(vertices[2])
+        vertices[3][VertexProperties.NAME] = 'flushed'
+        g.update_vertex(vertices[3])
+        events = self._db.events.get_replay_events(0)
+        self.assertEqual([v.vertex_id for v in vertices[:3]],
+                         [e.payload['vertex_id'] for e in events])
+
+        graph_persistor.flush_events()
+        events = self._db.events.get_replay_events(0)
+        self.assertEqual([v.vertex_id for v in vertices[:4]],
+                         [e.payload['vertex_id'] for e in events])
+
+    def test_failed_events_batch_is_stored_one_by_one(self):
+        self._db.events.delete()
+        self.addCleanup(self._db.events.delete)
+        g = GraphGenerator().create_graph()
+        vertices = g.get_vertices()
+        graph_persistor = graph_persistency.GraphPersistency(self.conf,
+                                                             self._db, g)
+        # the second event id is already stored, so the batch fails
+        event_ids = iter([1, 1, 2])
+
+        def callback(before, current, is_vertex, graph):
+            graph_persistor.persist_event(before, current, is_vertex, graph,
+                                          next(event_ids))
+        g.subscribe(callback)
+
+        vertices[0][VertexProperties.NAME] = 'changed'
+        g.update_vertex(vertices[0])
+        graph_persistor.flush_events()
+        for v in vertices[1:3]:
+            v[VertexProperties.NAME] = 'changed'
+            g.update_vertex(v)
+        graph_persistor.flush_events()
+
+        events = self._db.events.get_replay_events(0)
+        self.assertEqual([vertices[0].vertex_id, vertices[2].vertex_id],
+                         [e.payload['vertex_id'] for e in events])
+
+    def test_store_and_load_ids_cache(self):
+        g = GraphGenerator().create_graph()
+        graph_persistor = graph_persistency.GraphPersistency(self.conf,
+                                                             self._db, g)
+        cache = TransformerBase.key_to_uuid_cache
+        stored_ids = cache.dump()
+        self.addCleanup(cache.load, stored_ids)
+        cache.load({'ab' * 16: 'vitrage-id-1', 'cd' * 16: 'vitrage-id-2'})
+
+        graph_persistor.store_graph()
+        cache.clear()
+        recovered_data = graph_persistor.query_recent_snapshot()
+        recovered_graph = self.load_snapshot(recovered_data, graph_persistor)
+
+        self.assert_graph_equal(g, recovered_graph)
+        self.assertEqual('vitrage-id-1', cache.get('ab' * 16))
+        self.assertEqual('vitrage-id-2', cache.get('cd' * 16))
+        self.assertThat(cache, matchers.HasLength(2))
+
+    def test_store_and_load_deltas(self):
+        self.conf.set_override('graph_snapshot_deltas', 2, 'persistency')
+        self.addCleanup(self.conf.clear_override, 'graph_snapshot_deltas',
+                        'persistency')
+        g = GraphGenerator().create_graph()
+        graph_persistor = graph_persistency.GraphPersistency(self.conf,
+                                                             self._db, g)
+        graph_persistor.track_changes()
+        vertices = g.get_vertices()
+
+        def store_and_load(expected_deltas):
+            graph_persistor.store_graph()
+            self.assertThat(
+                self._db.graph_snapshots.query_deltas(
+                    graph_persistency.BASE_SNAPSHOT_ID),
+                matchers.HasLength(expected_deltas))
+            recovered_graph = self.load_snapshot(
+                graph_persistor.query_recent_snapshot(), graph_persistor)
+            self.assert_graph_equal(g, recovered_graph)
+
+        store_and_load(0)
+
+        vertices[0][VertexProperties.VITRAGE_IS_DELETED] = True
+        g.update_vertex(vertices[0])
+        store_and_load(1)
+
+        g.remove_vertex(vertices[1])
+        edge = g.get_edges(vertices[2].vertex_id).pop()
+        g.remove_edge(edge)
+        store_and_load(2)
+
+        # the number of deltas is reached, so a full snapshot is stored
+        vertices[3][VertexProperties.NAME] = 'kuku'
+        g.update_vertex(vertices[3])
+        store_and_load(0)
+
+    def test_load_old_snapshot_format(self):
+        g = GraphGenerator().create_graph()
+        graph_persistor = graph_persistency.GraphPersistency(self.conf,
+                                                             self._db, g)
+        self._db.graph_snapshots.delete()
+        self._db.graph_snapshots.update(models.GraphSnapshot(
+            snapshot_id=graph_persistency.BASE_SNAPSHOT_ID,
+            event_id=7,
+            graph_snapshot=g.write_gpickle()))
+
+        graph = NXGraph()
+        event_id = graph_persistor.load_graph(
+            graph_persistor.query_recent_snapshot(), graph)
+
+        self.assertEqual(7, event_id)
+        self.assert_graph_equal(g, graph)
+
+        # the graph pickled together with the ids cache
+        self._db.graph_snapshots.update(models.GraphSnapshot(
+            snapshot_id=graph_persistency.BASE_SNAPSHOT_ID,
+            event_id=8,
+            graph_snapshot=cPickle.dumps((g.write_gpickle(), {'key': 'id'}))))
+
+        graph = NXGraph()
+        event_id = graph_persistor.load_graph(
+            graph_persistor.query_recent_snapshot(), graph)
+
+        self.assertEqual(8, event_id)
+        self.assert_graph_equal(g, graph)
+        self.assertEqual({'key': 'id'},
+                         TransformerBase.key_to_uuid_cache.dump())
+
     @staticmethod
-    def load_snapshot(data):
-        return NXGraph.read_gpickle(data.graph_snapshot) if data else None
+    def load_snapshot(data, graph_persistor):
+        if not data:
+            return None
+        graph = NXGraph()
+        graph_persistor.load_graph(data, graph)
+        return graph
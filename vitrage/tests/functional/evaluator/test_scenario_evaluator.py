@@ -40,11 +40,13 @@ from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
 from vitrage.datasources.nova.zone import NOVA_ZONE_DATASOURCE
 from vitrage.entity_graph.mappings.operational_resource_state import \
     OperationalResourceState
+from vitrage.evaluator.actions.base import ActionMode
 from vitrage.evaluator.actions.evaluator_event_transformer \
     import VITRAGE_DATASOURCE
 from vitrage.evaluator.scenario_evaluator import ScenarioEvaluator
 from vitrage.evaluator.scenario_repository import ScenarioRepository
 from vitrage.graph import create_edge
+from vitrage.storage.sqlalchemy import models
 from vitrage.tests.base import IsEmpty
 from vitrage.tests.functional.base import \
     TestFunctionalBase
@@ -1360,6 +1362,72 @@ class TestScenarioEvaluator(TestFunctionalBase, TestConfiguration):
                                              processor.entity_graph)
         return host_v
 
+    def test_concurrent_scenarios_matching(self):
+        event_queue, processor, evaluator = self._init_system()
+        threaded_evaluator = ScenarioEvaluator(self.conf,
+                                               processor.entity_graph,
+                                               self.scenario_repository,
+                                               event_queue.put,
+                                               enabled=False,
+                                               scenario_threads=4)
+
+        # generate nagios alarm to trigger template scenarios
+        test_vals = {NagiosProperties.STATUS: NagiosTestStatus.WARNING,
+                     NagiosProperties.SERVICE: 'cause_suboptimal_state'}
+        test_vals.update(_NAGIOS_TEST_INFO)
+        generator = mock_driver.simple_nagios_alarm_generators(1, 1, test_vals)
+        warning_test = mock_driver.generate_random_events_list(generator)[0]
+        self.get_host_after_event(event_queue, warning_test,
+                                  processor, _TARGET_HOST)
+
+        # the actions are the same, in the same order, as when the scenarios
+        # are matched one after the other
+        num_actions = 0
+        for vertex in processor.entity_graph.get_vertices():
+            scenarios = evaluator._get_element_scenarios(vertex, True)
+            actions = evaluator._process_and_get_actions(
+                vertex, scenarios, ActionMode.DO)
+            self.assertEqual(actions,
+                             threaded_evaluator._process_and_get_actions(
+                                 vertex, scenarios, ActionMode.DO))
+            num_actions += len(actions)
+        self.assertGreater(num_actions, 1)
+
+        # disable the alarm
+        warning_test[NagiosProperties.STATUS] = NagiosTestStatus.OK
+        self.get_host_after_event(event_queue, warning_test,
+                                  processor, _TARGET_HOST)
+
+    def test_active_actions_bulk_update(self):
+        def active_action(action_id, trigger, target, extra_info=None):
+            return models.ActiveAction(action_type='bulk_test',
+                                       extra_info=extra_info,
+                                       target_vertex_id=target,
+                                       action_id=action_id,
+                                       trigger=trigger,
+                                       score=0)
+
+        active_actions = self._db.active_actions
+        active_actions.bulk_update(
+            [active_action('a1', 't1', 'host-1', 'alarm'),
+             active_action('a2', 't2', 'host-1'),
+             active_action('a3', 't3', 'host-2')],
+            [])
+        active_actions.bulk_update([active_action('a4', 't4', 'host-2')],
+                                   [('a3', 't3')])
+
+        # a None field matches any value
+        similar = active_actions.query_similar(
+            [('bulk_test', None, None, 'host-1'),
+             ('bulk_test', 'alarm', None, 'host-2')])
+        self.assertEqual(['a1', 'a2'],
+                         sorted(a.action_id for a in similar))
+        similar = active_actions.query_similar(
+            [('bulk_test', None, None, 'host-2')])
+        self.assertEqual(['a4'], [a.action_id for a in similar])
+
+        active_actions.delete(action_type='bulk_test')
+
     def _init_system(self):
         processor = self._create_processor_with_graph(self.conf)
         event_queue = queue.Queue()
@@ -0,0 +1,134 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+from six.moves import BaseHTTPServer
+
+from vitrage.common.constants import NotifierEventTypes as NETypes
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.notifier.plugins import webhook as webhook_plugin
+from vitrage.notifier.plugins.webhook.webhook import Webhook
+from vitrage.storage.sqlalchemy import models
+from vitrage.tests import base
+from vitrage.tests.functional.test_configuration import TestConfiguration
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['content-length']))
+        self.server.posts.append((self.path, self.headers.get('x-test'),
+                                  jsonutils.loads(body)))
+        self.send_response(503 if self.path == '/error' else 200)
+        self.send_header('content-length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestWebhook(base.BaseTest, TestConfiguration):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestWebhook, cls).setUpClass()
+        cls.conf = cfg.ConfigOpts()
+        cls.conf.register_opts(webhook_plugin.OPTS, group='webhook')
+        cls.add_db(cls.conf)
+
+    def setUp(self):
+        super(TestWebhook, self).setUp()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.posts = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:%s' % self.server.server_port
+        self._db.webhooks.delete()
+
+    def _add_webhook(self, webhook_id, path, regex_filter='', headers=''):
+        self._db.webhooks.create(models.Webhooks(
+            id=webhook_id, project_id='p1', is_admin_webhook=True,
+            created_at=datetime(2018, 1, 1), url=self.url + path,
+            headers=headers, regex_filter=regex_filter))
+
+    def _wait_for_posts(self, count):
+        for _ in range(100):
+            if len(self.server.posts) >= count:
+                break
+            time.sleep(0.05)
+        return sorted(self.server.posts,
+                      key=lambda post: (post[0], post[2]['notification']))
+
+    def test_post_to_cached_webhooks(self):
+        self._add_webhook('all', '/all', headers="{'x-test': 'h'}")
+        self._add_webhook('zabbix', '/zabbix',
+                          regex_filter="{'vitrage_type': 'zabbix.*'}")
+        notifier = Webhook(self.conf)
+        alarm = {VProps.VITRAGE_ID: 'a1', VProps.VITRAGE_TYPE: 'nagios',
+                 'not_posted': 1}
+
+        notifier.process_event(alarm, NETypes.ACTIVATE_ALARM_EVENT)
+        notifier.process_event(dict(alarm, vitrage_type='zabbix_alarm'),
+                               NETypes.DEACTIVATE_ALARM_EVENT)
+        notifier.process_event(alarm, NETypes.ACTIVATE_DEDUCED_ALARM_EVENT)
+
+        posts = self._wait_for_posts(3)
+        self.assertEqual(
+            [('/all', 'h', {'notification': NETypes.ACTIVATE_ALARM_EVENT,
+                            'payload': {VProps.VITRAGE_ID: 'a1',
+                                        VProps.VITRAGE_TYPE: 'nagios'}}),
+             ('/all', 'h', {'notification': NETypes.DEACTIVATE_ALARM_EVENT,
+                            'payload': {VProps.VITRAGE_ID: 'a1',
+                                        VProps.VITRAGE_TYPE: 'zabbix_alarm'}}),
+             ('/zabbix', None,
+              {'notification': NETypes.DEACTIVATE_ALARM_EVENT,
+               'payload': {VProps.VITRAGE_ID: 'a1',
+                           VProps.VITRAGE_TYPE: 'zabbix_alarm'}})],
+            posts)
+
+        # the webhooks are cached until they change
+        self._db.webhooks.delete('all')
+        notifier.process_event(alarm, NETypes.ACTIVATE_ALARM_EVENT)
+        self.assertEqual(4, len(self._wait_for_posts(4)))
+
+        notifier.process_event({'id': 'all'},
+                               NETypes.CHANGE_IN_WEBHOOKS_EVENT)
+        notifier.process_event(alarm, NETypes.ACTIVATE_ALARM_EVENT)
+        self._add_webhook('new', '/new')
+        notifier.process_event({'id': 'new'},
+                               NETypes.CHANGE_IN_WEBHOOKS_EVENT)
+        notifier.process_event(alarm, NETypes.ACTIVATE_ALARM_EVENT)
+        self.assertEqual(['/all', '/all', '/all', '/new', '/zabbix'],
+                         [path for path, _, _ in self._wait_for_posts(5)])
+
+    def test_post_is_not_repeated_on_error_response(self):
+        self._add_webhook('error', '/error')
+        self._add_webhook('ok', '/ok')
+        notifier = Webhook(self.conf)
+
+        notifier.process_event({VProps.VITRAGE_ID: 'a1'},
+                               NETypes.ACTIVATE_ALARM_EVENT)
+
+        self.assertEqual(2, len(self._wait_for_posts(2)))
+        time.sleep(0.5)
+        self.assertEqual(['/error', '/ok'],
+                         [path for path, _, _ in self._wait_for_posts(2)])
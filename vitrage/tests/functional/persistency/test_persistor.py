@@ -0,0 +1,109 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.common.constants import NotifierEventTypes as NETypes
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.persistency.service import VitragePersistorEndpoint
+from vitrage.storage.sqlalchemy import models
+from vitrage.tests.functional.base import TestFunctionalBase
+from vitrage.tests.functional.test_configuration import TestConfiguration
+
+
+def _alarm(vitrage_id, timestamp, **kwargs):
+    alarm = {VProps.VITRAGE_ID: vitrage_id,
+             VProps.NAME: 'alarm %s' % vitrage_id,
+             VProps.VITRAGE_TYPE: 'zabbix',
+             VProps.VITRAGE_AGGREGATED_SEVERITY: 'WARNING',
+             VProps.VITRAGE_OPERATIONAL_SEVERITY: 'WARNING',
+             VProps.UPDATE_TIMESTAMP: '2018-01-01 10:00:%02d' % timestamp}
+    alarm.update(kwargs)
+    return alarm
+
+
+def _edge(source_id, target_id, timestamp):
+    return {EProps.SOURCE_ID: source_id,
+            EProps.TARGET_ID: target_id,
+            EProps.RELATIONSHIP_TYPE: 'causes',
+            EProps.UPDATE_TIMESTAMP: '2018-01-01 10:00:%02d' % timestamp}
+
+
+class TestPersistor(TestFunctionalBase, TestConfiguration):
+
+    # noinspection PyAttributeOutsideInit,PyPep8Naming
+    @classmethod
+    def setUpClass(cls):
+        super(TestPersistor, cls).setUpClass()
+        cls.conf = cfg.ConfigOpts()
+        cls.add_db(cls.conf)
+
+    def setUp(self):
+        super(TestPersistor, self).setUp()
+        self._db.changes.delete()
+        self._db.edges.delete()
+        self._db.alarms.delete()
+        self.endpoint = VitragePersistorEndpoint(self._db)
+
+    def _rows(self, model):
+        return self._db.alarms.query_filter(model).all()
+
+    def test_batch_of_events(self):
+        self.endpoint.process_event(NETypes.ACTIVATE_ALARM_EVENT,
+                                    _alarm('stored', 0))
+
+        self.endpoint.process_events([
+            (NETypes.ACTIVATE_ALARM_EVENT, _alarm('a1', 1)),
+            (NETypes.CHANGE_IN_ALARM_EVENT, _alarm('a1', 1)),
+            (NETypes.ACTIVATE_ALARM_EVENT, _alarm('a2', 2)),
+            (NETypes.ACTIVATE_CAUSAL_RELATION, _edge('a1', 'a2', 3)),
+            (NETypes.CHANGE_PROJECT_ID_EVENT,
+             _alarm('a2', 4, vitrage_resource_project_id='p2')),
+            (NETypes.DEACTIVATE_ALARM_EVENT, _alarm('a1', 5)),
+            (NETypes.DEACTIVATE_CAUSAL_RELATION, _edge('a1', 'a2', 6)),
+            (NETypes.DEACTIVATE_ALARM_EVENT, _alarm('stored', 7)),
+            ('unknown', {}),
+        ])
+
+        alarms = {a.vitrage_id: a for a in self._rows(models.Alarm)}
+        self.assertEqual({'stored', 'a1', 'a2'}, set(alarms))
+        self.assertEqual(5, alarms['a1'].end_timestamp.second)
+        self.assertEqual(7, alarms['stored'].end_timestamp.second)
+        self.assertEqual(1, alarms['a1'].start_timestamp.second)
+        self.assertEqual('p2', alarms['a2'].vitrage_resource_project_id)
+        self.assertGreater(alarms['a2'].end_timestamp.year, 2018)
+
+        edges = self._rows(models.Edge)
+        self.assertEqual([('a1', 'a2', 6)],
+                         [(e.source_id, e.target_id, e.end_timestamp.second)
+                          for e in edges])
+        self.assertEqual(['a1'],
+                         [c.vitrage_id for c in self._rows(models.Change)])
+
+    def test_failed_batch_is_stored_one_by_one(self):
+        self.endpoint.process_event(NETypes.ACTIVATE_ALARM_EVENT,
+                                    _alarm('stored', 0))
+
+        # the alarm is already stored, so the batch fails
+        self.endpoint.process_events([
+            (NETypes.ACTIVATE_ALARM_EVENT, _alarm('a1', 1)),
+            (NETypes.ACTIVATE_ALARM_EVENT, _alarm('stored', 2)),
+            (NETypes.DEACTIVATE_ALARM_EVENT, _alarm('a1', 3)),
+        ])
+
+        alarms = {a.vitrage_id: a for a in self._rows(models.Alarm)}
+        self.assertEqual({'stored', 'a1'}, set(alarms))
+        self.assertEqual(0, alarms['stored'].start_timestamp.second)
+        self.assertEqual(3, alarms['a1'].end_timestamp.second)
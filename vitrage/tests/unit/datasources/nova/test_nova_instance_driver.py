@@ -0,0 +1,81 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import types
+
+from oslo_config import cfg
+
+from vitrage.common.constants import DatasourceAction
+from vitrage.common.constants import DatasourceProperties as DSProps
+from vitrage.common.constants import GraphAction
+from vitrage.datasources.nova.instance.driver import InstanceDriver
+from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
+from vitrage.datasources.nova.instance import OPTS
+from vitrage.tests import base
+
+
+class FakeServer(object):
+
+    def __init__(self, server_id):
+        self.id = server_id
+        self.status = 'ACTIVE'
+
+
+class FakeServers(object):
+
+    def __init__(self, num_servers):
+        self.servers = [FakeServer(str(i)) for i in range(num_servers)]
+        self.requests = []
+
+    def list(self, search_opts=None, marker=None, limit=None):
+        self.requests.append(marker)
+        ids = [s.id for s in self.servers]
+        start = ids.index(marker) + 1 if marker else 0
+        return self.servers[start:start + limit]
+
+
+class FakeClient(object):
+
+    def __init__(self, num_servers):
+        self.servers = FakeServers(num_servers)
+
+
+class TestInstanceDriver(base.BaseTest):
+
+    def setUp(self):
+        super(TestInstanceDriver, self).setUp()
+        self.conf = cfg.ConfigOpts()
+        self.conf.register_opts(OPTS, group=NOVA_INSTANCE_DATASOURCE)
+        self.conf.set_override('page_size', 2,
+                               group=NOVA_INSTANCE_DATASOURCE)
+
+    def test_get_all_by_pages(self):
+        driver = InstanceDriver(self.conf)
+        driver._client = FakeClient(5)
+
+        events = driver.get_all(DatasourceAction.INIT_SNAPSHOT)
+        self.assertIsInstance(events, types.GeneratorType)
+        self.assertEqual([], driver.client.servers.requests)
+
+        events = list(events)
+        self.assertEqual([None, '1', '3', '4'], driver.client.servers.requests)
+        self.assertEqual(['0', '1', '2', '3', '4'],
+                         [e['id'] for e in events[:-1]])
+        for event in events[:-1]:
+            self.assertEqual(NOVA_INSTANCE_DATASOURCE,
+                             event[DSProps.ENTITY_TYPE])
+            self.assertEqual(DatasourceAction.INIT_SNAPSHOT,
+                             event[DSProps.DATASOURCE_ACTION])
+        self.assertEqual(GraphAction.END_MESSAGE,
+                         events[-1][DSProps.EVENT_TYPE])
@@ -17,22 +17,31 @@ from oslo_config import cfg
 from testtools import matchers
 
 from vitrage.common.constants import DatasourceProperties as DSProps
+from vitrage.common.constants import EdgeLabel
+from vitrage.common.constants import EntityCategory
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.datasources.neutron.port import NEUTRON_PORT_DATASOURCE
+from vitrage.datasources.nova.instance import NOVA_INSTANCE_DATASOURCE
+from vitrage.datasources.prometheus.driver import InstanceIdCache
 from vitrage.datasources.prometheus.driver import PROMETHEUS_EVENT_TYPE
 from vitrage.datasources.prometheus.driver import PrometheusDriver
+from vitrage.datasources.prometheus.driver import UNRESOLVED_INSTANCE_TTL
+from vitrage.datasources.prometheus import OPTS
 from vitrage.datasources.prometheus import PROMETHEUS_DATASOURCE
+from vitrage.graph.driver.networkx_graph import NXGraph
+import vitrage.graph.utils as graph_utils
 from vitrage.tests import base
 from vitrage.tests.mocks import mock_driver
 
 
 # noinspection PyProtectedMember
 class PrometheusDriverTest(base.BaseTest):
-    OPTS = []
 
     # noinspection PyPep8Naming
     @classmethod
     def setUpClass(cls):
         cls.conf = cfg.ConfigOpts()
-        cls.conf.register_opts(cls.OPTS, group=PROMETHEUS_DATASOURCE)
+        cls.conf.register_opts(OPTS, group=PROMETHEUS_DATASOURCE)
 
     def test_enrich_event(self):
         with (mock.patch('vitrage.datasources.prometheus.driver.'
@@ -50,6 +59,148 @@ class PrometheusDriverTest(base.BaseTest):
             # Test assertions
             self._assert_event_equal(created_events, PROMETHEUS_EVENT_TYPE)
 
+    def test_enrich_event_instance_ids(self):
+        with (mock.patch('vitrage.datasources.prometheus.driver.'
+                         'PrometheusDriver.nova_client')) as mock_nova_client:
+
+            nova_vm = mock.Mock(id='nova-vm')
+            mock_nova_client.servers.list.side_effect = \
+                lambda search_opts: \
+                [nova_vm] if search_opts['ip'] == '10.0.0.3' else []
+
+            # Test setup
+            driver = PrometheusDriver(self.conf)
+            driver.set_graph(self._create_graph())
+            instances = ['10.0.0.1:9100', '10.0.0.1:9100', 'vm2',
+                         '10.0.0.3:9100', '10.0.0.3', 'localhost:9100', 'dup']
+
+            # Enrich event
+            created_events = driver.enrich_event(
+                self._generate_alerts_event(instances), PROMETHEUS_EVENT_TYPE)
+            driver.enrich_event(self._generate_alerts_event(instances),
+                                PROMETHEUS_EVENT_TYPE)
+
+            # Test assertions
+            self.assertEqual(
+                ['vm1-id', 'vm1-id', 'vm2-id', 'nova-vm', 'nova-vm',
+                 'localhost', 'dup'],
+                [event['instance_id'] for event in created_events])
+            # the graph instances are not looked up in nova, and the other
+            # instances are looked up once, in the first event. 'dup' is the
+            # hostname of two instances in the graph.
+            self.assertEqual(
+                ['10.0.0.3', 'dup', 'localhost'],
+                sorted(call[1]['search_opts']['ip'] for call in
+                       mock_nova_client.servers.list.call_args_list))
+
+    def test_enrich_event_graph_changes(self):
+        with (mock.patch('vitrage.datasources.prometheus.driver.'
+                         'PrometheusDriver.nova_client')) as mock_nova_client:
+
+            mock_nova_client.servers.list.return_value = []
+
+            # Test setup
+            graph = self._create_graph()
+            driver = PrometheusDriver(self.conf)
+            driver.set_graph(graph)
+
+            # Test action - the instances are changed after set_graph
+            graph.add_vertex(graph_utils.create_vertex(
+                'vm5', vitrage_category=EntityCategory.RESOURCE,
+                vitrage_type=NOVA_INSTANCE_DATASOURCE,
+                entity_id='vm5-id', metadata={VProps.NAME: 'vm5'}))
+            graph.add_vertex(graph_utils.create_vertex(
+                'port2', vitrage_category=EntityCategory.RESOURCE,
+                vitrage_type=NEUTRON_PORT_DATASOURCE, entity_id='port2',
+                metadata={'ip_addresses': ('10.0.0.5',)}))
+            graph.add_edge(graph_utils.create_edge('port2', 'vm5',
+                                                   EdgeLabel.ATTACHED))
+            vm2 = graph.get_vertex('vm2')
+            vm2[VProps.VITRAGE_IS_DELETED] = True
+            graph.update_vertex(vm2)
+            graph.remove_vertex(graph.get_vertex('vm4'))
+            graph.remove_edge(graph.get_edge('port1', 'vm1',
+                                             EdgeLabel.ATTACHED))
+
+            created_events = driver.enrich_event(
+                self._generate_alerts_event(
+                    ['10.0.0.5', 'vm5', 'vm2', 'dup', '10.0.0.1']),
+                PROMETHEUS_EVENT_TYPE)
+
+            # Test assertions
+            self.assertEqual(
+                ['vm5-id', 'vm5-id', 'vm2', 'vm3-id', '10.0.0.1'],
+                [event['instance_id'] for event in created_events])
+
+    def test_unresolved_instances_expire_sooner(self):
+        with (mock.patch('vitrage.datasources.prometheus.driver.'
+                         'PrometheusDriver.nova_client')) as mock_nova_client,\
+                mock.patch('vitrage.datasources.prometheus.driver.time.time'
+                           ) as mock_time:
+
+            nova_vm = mock.Mock(id='nova-vm')
+            mock_nova_client.servers.list.return_value = []
+            mock_time.return_value = 1000
+
+            # Test setup
+            driver = PrometheusDriver(self.conf)
+            event = self._generate_alerts_event(['10.0.0.3'])
+            created_events = driver.enrich_event(event, PROMETHEUS_EVENT_TYPE)
+            self.assertEqual('10.0.0.3', created_events[0]['instance_id'])
+
+            # Test action - the instance is created in nova
+            mock_nova_client.servers.list.return_value = [nova_vm]
+            driver.enrich_event(event, PROMETHEUS_EVENT_TYPE)
+            mock_time.return_value = 1000 + UNRESOLVED_INSTANCE_TTL
+            created_events = driver.enrich_event(event, PROMETHEUS_EVENT_TYPE)
+
+            # Test assertions
+            self.assertEqual('nova-vm', created_events[0]['instance_id'])
+            self.assertEqual(2, mock_nova_client.servers.list.call_count)
+
+    def test_instance_id_cache(self):
+        cache = InstanceIdCache(ttl=60, max_size=2)
+        cache.put('a', 'a-id')
+        cache.put('b', 'b-id')
+        self.assertEqual('a-id', cache.get('a'))
+        cache.put('c', 'c-id')
+
+        # the least recently used entry is evicted
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual('a-id', cache.get('a'))
+        self.assertEqual('c-id', cache.get('c'))
+
+        disabled = InstanceIdCache(ttl=0, max_size=2)
+        disabled.put('a', 'a-id')
+        self.assertIsNone(disabled.get('a'))
+
+    @staticmethod
+    def _create_graph():
+        graph = NXGraph()
+        for vm, name in (('vm1', 'vm1'), ('vm2', 'vm2'), ('vm3', 'dup'),
+                         ('vm4', 'dup')):
+            graph.add_vertex(graph_utils.create_vertex(
+                vm, vitrage_category=EntityCategory.RESOURCE,
+                vitrage_type=NOVA_INSTANCE_DATASOURCE,
+                entity_id=vm + '-id', metadata={VProps.NAME: name}))
+        graph.add_vertex(graph_utils.create_vertex(
+            'port1', vitrage_category=EntityCategory.RESOURCE,
+            vitrage_type=NEUTRON_PORT_DATASOURCE, entity_id='port1',
+            metadata={'ip_addresses': ('10.0.0.1', '10.0.0.2')}))
+        graph.add_edge(graph_utils.create_edge('port1', 'vm1',
+                                               EdgeLabel.ATTACHED))
+        return graph
+
+    @staticmethod
+    def _generate_alerts_event(instances):
+        return {'details': {
+            'status': 'firing',
+            'alerts': [{'status': 'firing',
+                        'startsAt': '2018-05-03T12:25:38.231388525Z',
+                        'labels': {'alertname': 'alert%s' % i,
+                                   'instance': instance}}
+                       for i, instance in enumerate(instances)]}}
+
     @staticmethod
     def _generate_event():
         generators = mock_driver.simple_prometheus_alarm_generators(
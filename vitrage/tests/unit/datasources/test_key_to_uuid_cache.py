@@ -0,0 +1,74 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_utils import uuidutils
+from testtools import matchers
+
+from vitrage.common.utils import md5
+from vitrage.datasources.transformer_base import KeyToUuidCache
+from vitrage.tests import base
+
+
+class KeyToUuidCacheTest(base.BaseTest):
+
+    def _check_cache(self, cache):
+        keys = [md5('key-%s' % i) for i in range(10)]
+        uuids = [uuidutils.generate_uuid() for _ in keys]
+        for key, vitrage_id in zip(keys, uuids):
+            cache.put(key, vitrage_id)
+        cache.put('not-an-md5', 'not-a-uuid')
+
+        self.assertThat(cache, matchers.HasLength(11))
+        self.assertEqual(uuids[3], cache.get(keys[3]))
+        self.assertEqual('not-a-uuid', cache.get('not-an-md5'))
+        self.assertIsNone(cache.get(md5('missing')))
+        self.assertIn(keys[5], cache)
+
+        cache.delete_uuid(uuids[3])
+        cache.delete_uuid('not-a-uuid')
+        cache.delete_uuid(uuidutils.generate_uuid())
+        self.assertThat(cache, matchers.HasLength(9))
+        self.assertIsNone(cache.get(keys[3]))
+        self.assertNotIn('not-an-md5', cache)
+
+        # a key that moves to a new vitrage id
+        new_uuid = uuidutils.generate_uuid()
+        cache.put(keys[4], new_uuid)
+        cache.delete_uuid(uuids[4])
+        self.assertEqual(new_uuid, cache.get(keys[4]))
+
+        expected = dict(zip(keys, uuids))
+        del expected[keys[3]]
+        expected[keys[4]] = new_uuid
+        self.assertEqual(expected, cache.dump())
+
+        restored = KeyToUuidCache(compact=not cache.compact)
+        restored.load(cache.dump())
+        self.assertEqual(expected, restored.dump())
+
+    def test_cache(self):
+        self._check_cache(KeyToUuidCache())
+
+    def test_compact_cache(self):
+        self._check_cache(KeyToUuidCache(compact=True))
+
+    def test_set_compact(self):
+        cache = KeyToUuidCache()
+        key_to_uuid = {md5('key'): uuidutils.generate_uuid()}
+        cache.load(key_to_uuid)
+
+        cache.set_compact(True)
+
+        self.assertEqual(key_to_uuid, cache.dump())
+        self.assertEqual(key_to_uuid[md5('key')], cache.get(md5('key')))
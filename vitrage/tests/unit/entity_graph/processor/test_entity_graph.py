@@ -15,9 +15,15 @@ from testtools import matchers
 
 from vitrage.common.constants import EdgeLabel
 from vitrage.common.constants import EntityCategory
+from vitrage.common.constants import VertexProperties as VProps
 from vitrage.entity_graph.processor import processor_utils as PUtils
 from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.graph import utils as graph_utils
+from vitrage.graph import Vertex
 from vitrage.tests.unit.entity_graph.processor import base
+from vitrage.utils.datetime import parse_timestamp_ns
+from vitrage.utils.datetime import timestamp_ns
+from vitrage.utils.datetime import utcnow
 
 
 class TestEntityGraphManager(base.TestBaseProcessor):
@@ -68,6 +74,51 @@ class TestEntityGraphManager(base.TestBaseProcessor):
         PUtils.mark_deleted(entity_graph, vertex)
         self.assertTrue(PUtils.is_deleted(vertex))
 
+    def test_is_newer_vertex(self):
+        old = graph_utils.create_vertex(
+            'v', vitrage_sample_timestamp='2018-01-02 03:04:05.5+00:00')
+        new = graph_utils.create_vertex(
+            'v', vitrage_sample_timestamp='2018-01-02T05:04:05.6+02:00')
+        # a vertex stored before the numeric timestamp was added
+        old_str = Vertex('v', {VProps.VITRAGE_SAMPLE_TIMESTAMP:
+                               '2018-01-02T03:04:05.5Z'})
+
+        self.assertEqual(1514862245500000000,
+                         old[VProps.VITRAGE_SAMPLE_TIMESTAMP_NS])
+        self.assertTrue(PUtils.is_newer_vertex(old, new))
+        self.assertFalse(PUtils.is_newer_vertex(new, old))
+        self.assertTrue(PUtils.is_newer_vertex(old_str, old))
+        self.assertFalse(PUtils.is_newer_vertex(new, old_str))
+        self.assertTrue(PUtils.is_newer_vertex(Vertex('v', {}), old))
+        self.assertTrue(PUtils.is_newer_vertex(old, Vertex('v', {})))
+
+    def test_parse_timestamp_ns(self):
+        now = utcnow()
+        self.assertEqual(timestamp_ns(now), parse_timestamp_ns(str(now)))
+        for timestamp in ('2018-01-02T03:04:05Z',
+                          '2018-01-02 03:04:05',
+                          '2018-01-02 05:04:05+02:00',
+                          '2018-01-02T00:34:05-0230',
+                          'Tue, 02 Jan 2018 03:04:05 GMT'):
+            self.assertEqual(1514862245000000000,
+                             parse_timestamp_ns(timestamp), timestamp)
+        self.assertEqual(1514862245000000001,
+                         parse_timestamp_ns('2018-01-02T03:04:05.000000001Z'))
+
+    def test_mark_vertex_as_deleted_updates_sample_time(self):
+        entity_graph = NXGraph("Entity Graph")
+        vertex = graph_utils.create_vertex(
+            'v', vitrage_sample_timestamp='2018-01-02 03:04:05+00:00')
+        entity_graph.add_vertex(vertex)
+
+        PUtils.mark_deleted(entity_graph, vertex)
+
+        self.assertEqual(
+            parse_timestamp_ns(vertex[VProps.VITRAGE_SAMPLE_TIMESTAMP]),
+            vertex[VProps.VITRAGE_SAMPLE_TIMESTAMP_NS])
+        self.assertGreater(vertex[VProps.VITRAGE_SAMPLE_TIMESTAMP_NS],
+                           1514862245000000000)
+
     def test_mark_edge_as_deleted(self):
         entity_graph = NXGraph("Entity Graph")
 
@@ -0,0 +1,110 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+import mock
+from oslo_config import cfg
+
+from vitrage import datasources
+from vitrage.datasources import utils
+from vitrage.entity_graph import driver_exec
+from vitrage.tests import base
+
+
+class FakeDriver(object):
+
+    def __init__(self, name, delay, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+
+    def get_all(self, action):
+        time.sleep(self.delay)
+        if self.fail:
+            raise Exception('get_all failed')
+        return [(self.name, i) for i in range(3)]
+
+
+class FakeStreamDriver(FakeDriver):
+
+    def get_all(self, action):
+        time.sleep(self.delay)
+        for i in range(3):
+            if self.fail and i == 2:
+                raise Exception('get_all failed')
+            yield self.name, i
+            time.sleep(0.02)
+
+
+class FakePersist(object):
+
+    def __init__(self):
+        self.stored = 0
+
+    def store_graph(self):
+        self.stored += 1
+
+
+class TestDriverExec(base.BaseTest):
+
+    DRIVERS = [FakeDriver('slow', 0.6),
+               FakeDriver('fast', 0.1),
+               FakeDriver('broken', 0.1, fail=True),
+               FakeDriver('medium', 0.4),
+               FakeStreamDriver('stream', 0.2),
+               FakeStreamDriver('broken_stream', 0.8, fail=True)]
+
+    def setUp(self):
+        super(TestDriverExec, self).setUp()
+        self.conf = cfg.ConfigOpts()
+        self.conf.register_opts(datasources.OPTS, group='datasources')
+        self.conf.set_override('types', [d.name for d in self.DRIVERS],
+                               group='datasources')
+        patcher = mock.patch.dict(utils.drivers,
+                                  {d.name: d for d in self.DRIVERS})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshot_get_all(self):
+        processed = []
+
+        def process(events):
+            processed.append((threading.current_thread(), list(events)))
+            return len(events)
+
+        persist = FakePersist()
+        executor = driver_exec.DriverExec(self.conf, process, persist)
+
+        t1 = time.time()
+        executor.snapshot_get_all()
+        duration = time.time() - t1
+
+        # the drivers are queried concurrently
+        self.assertLess(duration, 1.5)
+        # each driver events are processed together, in the calling thread,
+        # in the order the drivers started returning them
+        self.assertEqual(['fast', 'stream', 'medium', 'slow', 'broken_stream'],
+                         [events[0][0] for _, events in processed])
+        for thread, events in processed:
+            self.assertEqual(threading.current_thread(), thread)
+        self.assertEqual([3, 3, 3, 3, 2],
+                         [len(events) for _, events in processed])
+        self.assertEqual(1, persist.stored)
+
+        # all the drivers locks were released
+        for d in self.DRIVERS:
+            self.assertTrue(driver_exec.LOCK_BY_DRIVER.acquire(d.name, False))
+            driver_exec.LOCK_BY_DRIVER.release(d.name)
@@ -12,6 +12,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 import threading
+import time
 
 from vitrage.entity_graph.graph_init import EventsCoordination
 from vitrage.tests import base
@@ -65,6 +66,42 @@ class EventsCoordinationTest(base.BaseTest):
         self._start_and_join(t1, t2, t3, t4)
         self.assertEqual(20000, self.calc_result, explain)
 
+    def test_low_priority_batches(self):
+        batches = []
+        priority_listener = EventsCoordination(
+            None, self.do_work, batches.append, batch_size=3)
+
+        count = priority_listener.handle_multiple_low_priority(
+            (i for i in range(7)))
+
+        self.assertEqual(7, count)
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], batches)
+        self.assertEqual(0, priority_listener.handle_multiple_low_priority([]))
+
+    def test_high_priority_between_batches(self):
+        batches = []
+
+        def do_batch(events):
+            batches.append(events)
+            if len(batches) == 1:
+                # arrives while the first batch is processed
+                t = threading.Thread(
+                    target=priority_listener._do_high_priority_work,
+                    args=('high',))
+                t.start()
+                self.addCleanup(t.join)
+                while not priority_listener._high_events_waiting:
+                    time.sleep(0.001)
+
+        def do_work(event):
+            batches.append(event)
+
+        priority_listener = EventsCoordination(
+            None, do_work, do_batch, batch_size=2)
+        priority_listener.handle_multiple_low_priority([1, 2, 3, 4])
+
+        self.assertEqual([[1, 2], 'high', [3, 4]], batches)
+
     def _start_and_join(self, *args):
         for t in args:
             t.start()
@@ -0,0 +1,131 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import fixtures
+
+from vitrage.entity_graph.workers import GraphDelta
+from vitrage.entity_graph.workers import SharedGraphFiles
+from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.graph.driver.shared_graph import SharedGraph
+from vitrage.graph import Edge
+from vitrage.graph import Vertex
+from vitrage.tests import base
+
+
+class TestGraphDelta(base.BaseTest):
+
+    def test_coalesce_updates(self):
+        v1 = Vertex('v1', {'state': 'a'})
+        v1_updated = Vertex('v1', {'state': 'b'})
+        v2 = Vertex('v2', {'state': 'a'})
+        e = Edge('v1', 'v2', 'on', {'vitrage_is_deleted': False})
+
+        delta = GraphDelta()
+        delta.add(None, v1, True)
+        delta.add(None, v2, True)
+        delta.add(None, e, False)
+        delta.add(v1, v1_updated, True)
+
+        self.assertEqual([(None, v1_updated, True),
+                          (None, v2, True),
+                          (None, e, False)],
+                         delta.changes())
+
+    def test_vertex_is_updated_before_its_edges(self):
+        host = Vertex('h', {'state': 'a'})
+        host_updated = Vertex('h', {'state': 'b'})
+        instance = Vertex('i', {'state': 'a'})
+        e = Edge('h', 'i', 'contains', {'vitrage_is_deleted': False})
+
+        delta = GraphDelta()
+        delta.add(None, host, True)
+        delta.add(None, instance, True)
+        delta.add(None, e, False)
+        delta.add(host, host_updated, True)
+
+        self.assertEqual(['h', 'i', ('h', 'i')],
+                         [c[1].vertex_id if c[2] else
+                          (c[1].source_id, c[1].target_id)
+                          for c in delta.changes()])
+        self.assertEqual(host_updated, delta.changes()[0][1])
+
+    def test_removals_are_kept_in_order(self):
+        v1 = Vertex('v1', {'state': 'a'})
+        v1_new = Vertex('v1', {'state': 'new'})
+        v2 = Vertex('v2', {'state': 'a'})
+        e = Edge('v1', 'v2', 'on', {'vitrage_is_deleted': False})
+
+        delta = GraphDelta()
+        delta.add(None, v1, True)
+        delta.add(None, e, False)
+        delta.add(v1, None, True)
+        delta.add(None, v1_new, True)
+        delta.add(None, v2, True)
+        delta.add(v2, None, True)
+
+        self.assertEqual([(None, v1, True),
+                          (None, e, False),
+                          (v1, None, True),
+                          (None, v1_new, True),
+                          (None, v2, True),
+                          (v2, None, True)],
+                         delta.changes())
+        self.assertEqual([], GraphDelta().changes())
+
+    def test_edge_is_not_coalesced_before_a_vertex_removal(self):
+        a = Vertex('a', {'state': 'a'})
+        b = Vertex('b', {'state': 'a'})
+        e = Edge('a', 'b', 'on', {'state': 'a'})
+        e_updated = Edge('a', 'b', 'on', {'state': 'b'})
+
+        delta = GraphDelta()
+        delta.add(None, e, False)
+        # removing a also removes its edges in the workers graphs
+        delta.add(a, None, True)
+        delta.add(None, a, True)
+        delta.add(e, e_updated, False)
+        delta.add(None, b, True)
+
+        self.assertEqual([(None, e, False),
+                          (a, None, True),
+                          (None, a, True),
+                          (None, e_updated, False),
+                          (None, b, True)],
+                         delta.changes())
+
+
+class TestSharedGraphFiles(base.BaseTest):
+
+    def test_current_snapshot(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        graph = NXGraph('graph')
+        graph.add_vertex(Vertex('v1', {'state': 'a'}))
+        files = SharedGraphFiles(tmp_dir)
+        self.assertIsNone(files.current_path())
+        first_path = files.write(graph)
+
+        graph.add_vertex(Vertex('v2', {'state': 'a'}))
+        path = files.write(graph)
+        os.remove(first_path)
+
+        # a restarted api worker maps the newest snapshot
+        self.assertNotEqual(first_path, path)
+        self.assertEqual(path, files.current_path())
+        self.assertEqual(2, SharedGraph(files.current_path()).num_vertices())
+
+        files.remove()
+        self.assertIsNone(files.current_path())
+        self.assertFalse(os.path.exists(path))
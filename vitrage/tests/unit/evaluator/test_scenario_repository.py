@@ -18,9 +18,16 @@ from testtools import matchers
 from vitrage.common.constants import EntityCategory
 from vitrage.common.constants import TemplateTypes as TType
 from vitrage.common.constants import VertexProperties as VProps
+from vitrage.evaluator.scenario_repository import ScenarioKeysIndex
 from vitrage.evaluator.scenario_repository import ScenarioRepository
+from vitrage.evaluator.template_data import EdgeDescription
+from vitrage.evaluator.template_fields import TemplateFields as TFields
 from vitrage.evaluator.template_validation.template_syntax_validator import \
     syntax_validation
+from vitrage.graph.algo_driver.sub_graph_matching import NEG_CONDITION
+from vitrage.graph import Direction
+from vitrage.graph import Edge
+from vitrage.graph.filter import check_filter
 from vitrage.graph import Vertex
 from vitrage.tests import base
 from vitrage.tests.base import IsEmpty
@@ -99,10 +106,99 @@ class ScenarioRepositoryTest(base.BaseTest, TestConfiguration):
                                 self.scenario_repository.entity_scenarios)
 
     def test_get_scenario_by_edge(self):
-        pass
+        relationship_scenarios = \
+            self.scenario_repository.relationship_scenarios
+        for key in relationship_scenarios:
+            edge_desc = EdgeDescription(
+                Edge('source', 'target', key.label),
+                Vertex('source', dict(key.source)),
+                Vertex('target', dict(key.target)))
+
+            # the indexed lookup finds the same scenarios as a full scan
+            expected = [
+                (e, s) for other_key, value in relationship_scenarios.items()
+                if other_key.label == key.label and
+                check_filter(edge_desc.source.properties,
+                             dict(other_key.source)) and
+                check_filter(edge_desc.target.properties,
+                             dict(other_key.target))
+                for e, s in value if s.enabled]
+            self.assert_is_not_empty(expected)
+            self.assertEqual(
+                expected,
+                self.scenario_repository.get_scenarios_by_edge(edge_desc))
 
     def test_get_scenario_by_entity(self):
-        pass
+        entity_scenarios = self.scenario_repository.entity_scenarios
+        for key in entity_scenarios:
+            vertex = Vertex('vertex', dict(key))
+
+            # the indexed lookup finds the same scenarios as a full scan
+            expected = [
+                (e, s) for other_key, value in entity_scenarios.items()
+                if check_filter(vertex.properties, dict(other_key))
+                for e, s in value if s.enabled]
+            self.assert_is_not_empty(expected)
+            self.assertEqual(
+                expected,
+                self.scenario_repository.get_scenarios_by_vertex(vertex))
+
+    def test_scenario_keys_index(self):
+        index = ScenarioKeysIndex()
+        index.add(['ALARM', 'zabbix'], 'zabbix alarm')
+        index.add(['ALARM', None], 'any alarm')
+        index.add([None, None], 'anything')
+        index.add(['RESOURCE', 'nova.host'], 'host')
+
+        self.assertEqual(['zabbix alarm', 'any alarm', 'anything'],
+                         index.candidates(['ALARM', 'zabbix']))
+        self.assertEqual(['any alarm', 'anything'],
+                         index.candidates(['ALARM', ['unhashable']]))
+        self.assertEqual(['anything'], index.candidates([None, 'nova.host']))
+
+    def test_subgraph_plans(self):
+        for scenario in self.scenario_repository._all_scenarios:
+            self.assertEqual(len(scenario.subgraphs),
+                             len(scenario.subgraph_plans))
+            for subgraph, plan in zip(scenario.subgraphs,
+                                      scenario.subgraph_plans):
+                self.assertIs(subgraph, plan.subgraph)
+                for action in scenario.actions:
+                    target = action.targets[TFields.TARGET]
+                    if not subgraph.get_vertex(target):
+                        self.assertEqual(frozenset(),
+                                         plan.connected_component(target))
+                        continue
+                    component = subgraph.algo.graph_query_vertices(
+                        root_id=target,
+                        edge_query_dict={'!=': {NEG_CONDITION: True}})
+                    self.assertEqual(
+                        set(v.vertex_id for v in component.get_vertices()),
+                        plan.connected_component(target))
+
+                for v in subgraph.get_vertices():
+                    for e in subgraph.get_edges(v.vertex_id,
+                                                direction=Direction.OUT):
+                        self.assertEqual(e, plan.get_edge(e.source_id,
+                                                          e.target_id,
+                                                          e.label))
+                        if e.get(NEG_CONDITION):
+                            switched_edge, switched_plan = plan.switched(e)
+                            self.assertFalse(switched_edge.get(NEG_CONDITION))
+                            switched = [
+                                pe.edge for pe_list in switched_plan.edges
+                                for pe in pe_list
+                                if (pe.edge.source_id, pe.edge.target_id,
+                                    pe.edge.label) ==
+                                (e.source_id, e.target_id, e.label)]
+                            self.assertTrue(switched)
+                            for plan_edge in switched:
+                                self.assertFalse(
+                                    plan_edge.get(NEG_CONDITION))
+                            # the sub-graph itself is not changed
+                            self.assertTrue(subgraph.get_edge(
+                                e.source_id, e.target_id,
+                                e.label).get(NEG_CONDITION))
 
     def test_add_template(self):
         pass
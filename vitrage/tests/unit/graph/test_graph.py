@@ -22,6 +22,7 @@ from testtools import matchers
 
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.graph import Direction
+from vitrage.graph.driver.elements import Vertex
 from vitrage.graph.filter import check_filter
 from vitrage.graph import utils
 from vitrage.tests.base import IsEmpty
@@ -427,6 +428,105 @@ class TestGraph(GraphTestBase):
         self.assertEqual(OPENSTACK_CLUSTER, found_vertex[VProps.VITRAGE_TYPE],
                          'get_vertices check node vertex')
 
+    def test_get_vertices_indexed_properties(self):
+        g = NXGraph('test_get_vertices_indexed_properties')
+        g.add_vertex(v_node)
+        g.add_vertex(v_host)
+        g.add_vertex(v_instance)
+        g.add_vertex(v_alarm)
+
+        resources_query = {'and': [
+            {'==': {VProps.VITRAGE_CATEGORY: RESOURCE}},
+            {'==': {VProps.VITRAGE_IS_DELETED: False}}]}
+        self.assertThat(g.get_vertices(query_dict=resources_query),
+                        matchers.HasLength(3),
+                        'get_vertices __len__ resources')
+
+        # Change an indexed property
+        updated_host = g.get_vertex(v_host.vertex_id)
+        updated_host[VProps.VITRAGE_IS_DELETED] = True
+        g.update_vertex(updated_host)
+        resources = g.get_vertices(query_dict=resources_query)
+        self.assertThat(resources, matchers.HasLength(2),
+                        'get_vertices __len__ after update')
+        self.assertNotIn(v_host.vertex_id,
+                         [v.vertex_id for v in resources])
+
+        # Remove an indexed property
+        g.update_vertex(Vertex(v_instance.vertex_id,
+                               {VProps.VITRAGE_CATEGORY: None}))
+        self.assertThat(g.get_vertices(query_dict=resources_query),
+                        matchers.HasLength(1),
+                        'get_vertices __len__ after property removal')
+        self.assertThat(
+            g.get_vertices(vertex_attr_filter={VProps.VITRAGE_CATEGORY: None}),
+            matchers.HasLength(1),
+            'get_vertices __len__ of missing property')
+
+        # 'or' of indexed terms and a filter with a list of values
+        types_query = {'or': [
+            {'==': {VProps.VITRAGE_TYPE: OPENSTACK_CLUSTER}},
+            {'==': {VProps.VITRAGE_TYPE: ALARM_ON_VM}}]}
+        self.assertThat(g.get_vertices(query_dict=types_query),
+                        matchers.HasLength(2),
+                        'get_vertices __len__ or query')
+        self.assertThat(
+            g.get_vertices(vertex_attr_filter={
+                VProps.VITRAGE_TYPE: [OPENSTACK_CLUSTER, ALARM_ON_VM]}),
+            matchers.HasLength(2),
+            'get_vertices __len__ list filter')
+
+        # Remove a vertex, and make sure copies keep their indexes
+        g.remove_vertex(v_alarm)
+        g_copy = g.copy()
+        for graph in (g, g_copy):
+            self.assertThat(graph.get_vertices(query_dict=types_query),
+                            matchers.HasLength(1),
+                            'get_vertices __len__ after remove')
+            self.assertThat(
+                graph.get_vertices(
+                    vertex_attr_filter={VProps.VITRAGE_CATEGORY: ALARM}),
+                IsEmpty(),
+                'get_vertices of removed vertex')
+
+    def test_read_only_views(self):
+        g = NXGraph('test_read_only_views')
+        g.add_vertex(v_node)
+        g.add_vertex(v_host)
+        g.add_edge(e_node_to_host)
+
+        view = g.get_vertex(v_host.vertex_id, read_only=True)
+        self.assertEqual(v_host.properties, view.properties)
+        self.assertRaises(TypeError, view.__setitem__, VProps.NAME, 'name')
+        self.assertRaises(TypeError, view.__delitem__, VProps.ID)
+
+        # A view reflects the changes in the graph, and its copy does not
+        updated_host = view.copy()
+        updated_host[VProps.NAME] = 'new_name'
+        g.update_vertex(updated_host)
+        self.assertEqual('new_name', view[VProps.NAME])
+        view_copy = view.copy()
+        g.update_vertex(Vertex(v_host.vertex_id, {VProps.NAME: 'newer'}))
+        self.assertEqual('new_name', view_copy[VProps.NAME])
+
+        views = g.get_vertices(
+            vertex_attr_filter={VProps.VITRAGE_TYPE: OPENSTACK_CLUSTER},
+            read_only=True)
+        self.assertThat(views, matchers.HasLength(1))
+        self.assertRaises(TypeError, views[0].__setitem__, VProps.NAME, 'n')
+
+        neighbors = g.neighbors(v_node.vertex_id, read_only=True)
+        self.assertThat(neighbors, matchers.HasLength(1))
+        self.assertEqual('newer', neighbors[0][VProps.NAME])
+
+        edge = g.get_edge(e_node_to_host.source_id, e_node_to_host.target_id,
+                          e_node_to_host.label, read_only=True)
+        self.assertEqual(e_node_to_host.properties, edge.properties)
+        self.assertRaises(TypeError, edge.__setitem__,
+                          EProps.VITRAGE_IS_DELETED, True)
+        edges = g.get_edges(v_node.vertex_id, read_only=True)
+        self.assertEqual({edge}, edges)
+
     def _check_callbacks_result(self, msg, exp_prev, exp_curr):
 
         def assert_none_or_equals(exp, act, message):
@@ -24,7 +24,9 @@ from vitrage.common.constants import EdgeLabel
 from vitrage.common.constants import EdgeProperties as EProps
 from vitrage.datasources.heat.stack import HEAT_STACK_DATASOURCE
 from vitrage.datasources.neutron.network import NEUTRON_NETWORK_DATASOURCE
+from vitrage.evaluator.scenario_repository import SubGraphPlan
 from vitrage.graph.algo_driver.algorithm import Mapping
+from vitrage.graph.algo_driver.sub_graph_matching import MatchingPlan
 from vitrage.graph.algo_driver.sub_graph_matching import \
     NEG_CONDITION
 from vitrage.graph.algo_driver.sub_graph_matching import subgraph_matching
@@ -1408,3 +1410,234 @@ class GraphAlgorithmTest(GraphTestBase):
         network_vm_edge = graph_utils.create_edge(
             network_vertex.vertex_id, vm.vertex_id, ELabel.CONNECT)
         temp_entity_graph.update_edge(network_vm_edge)
+
+
+class SubGraphMatchingTest(GraphTestBase):
+    """Sub-graph matching of small templates, with a compiled MatchingPlan
+
+    The expected mappings are the ones found by the matching engine that
+    copied the sub-graph for every partial mapping.
+    """
+
+    def setUp(self):
+        super(SubGraphMatchingTest, self).setUp()
+        # cluster c contains hosts h1 and h2, which both use switch s.
+        # h1 contains v1 and v2, h2 contains v3.
+        # alarms a1 and a3 are on v1 and v3, and ha1 is on h1.
+        self.graph = NXGraph('graph')
+        for v_id, category, v_type in (
+                ('c', RESOURCE, OPENSTACK_CLUSTER),
+                ('h1', RESOURCE, NOVA_HOST_DATASOURCE),
+                ('h2', RESOURCE, NOVA_HOST_DATASOURCE),
+                ('s', RESOURCE, SWITCH),
+                ('v1', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+                ('v2', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+                ('v3', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+                ('a1', ALARM, ALARM_ON_VM),
+                ('a3', ALARM, ALARM_ON_VM),
+                ('ha1', ALARM, ALARM_ON_HOST)):
+            self.graph.add_vertex(graph_utils.create_vertex(
+                v_id, vitrage_category=category, vitrage_type=v_type))
+        for source_id, target_id, label in (
+                ('c', 'h1', ELabel.CONTAINS),
+                ('c', 'h2', ELabel.CONTAINS),
+                ('h1', 's', 'USES'),
+                ('h2', 's', 'USES'),
+                ('h1', 'v1', ELabel.CONTAINS),
+                ('h1', 'v2', ELabel.CONTAINS),
+                ('h2', 'v3', ELabel.CONTAINS),
+                ('a1', 'v1', ELabel.ON),
+                ('a3', 'v3', ELabel.ON),
+                ('ha1', 'h1', ELabel.ON)):
+            self.graph.add_edge(
+                graph_utils.create_edge(source_id, target_id, label))
+
+    @staticmethod
+    def _template(vertices, edges):
+        """A template graph
+
+        :param vertices: (template id, vitrage category, vitrage type)
+        :param edges: (source id, target id, label, negative)
+        """
+        template = NXGraph('template')
+        for v_id, category, v_type in vertices:
+            vertex = graph_utils.create_vertex(
+                v_id, vitrage_category=category, vitrage_type=v_type)
+            del vertex[VProps.VITRAGE_ID]
+            template.add_vertex(vertex)
+        for source_id, target_id, label, negative in edges:
+            edge = graph_utils.create_edge(source_id, target_id, label,
+                                           vitrage_is_deleted=negative)
+            if negative:
+                edge[NEG_CONDITION] = True
+            template.add_edge(edge)
+        return template
+
+    def _host_vms_template(self, negative_alarm=False):
+        return self._template(
+            [('cluster', RESOURCE, OPENSTACK_CLUSTER),
+             ('host', RESOURCE, NOVA_HOST_DATASOURCE),
+             ('switch', RESOURCE, SWITCH),
+             ('vm', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+             ('alarm', ALARM, ALARM_ON_VM)],
+            [('cluster', 'host', ELabel.CONTAINS, False),
+             ('host', 'switch', 'USES', False),
+             ('host', 'vm', ELabel.CONTAINS, False),
+             ('alarm', 'vm', ELabel.ON, negative_alarm)])
+
+    def _match(self, template, subgraph_id, graph_id, plan=None):
+        return subgraph_matching(
+            self.graph, template,
+            [Mapping(template.get_vertex(subgraph_id),
+                     self.graph.get_vertex(graph_id),
+                     is_vertex=True)],
+            plan=plan)
+
+    @staticmethod
+    def _ids(mappings):
+        return sorted(sorted((sub_id, v.vertex_id)
+                             for sub_id, v in mapping.items())
+                      for mapping in mappings)
+
+    def test_template_matching_results(self):
+        host_alarm_template = self._template(
+            [('host_alarm', ALARM, ALARM_ON_HOST),
+             ('host', RESOURCE, NOVA_HOST_DATASOURCE),
+             ('vm', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+             ('vm_alarm', ALARM, ALARM_ON_VM)],
+            [('host_alarm', 'host', ELabel.ON, False),
+             ('host', 'vm', ELabel.CONTAINS, False),
+             ('vm_alarm', 'vm', ELabel.ON, False)])
+        self.assertEqual(
+            [[('host', 'h1'), ('host_alarm', 'ha1'), ('vm', 'v1'),
+              ('vm_alarm', 'a1')]],
+            self._ids(self._match(host_alarm_template, 'host_alarm', 'ha1')))
+        self.assertEqual(
+            [], self._ids(self._match(host_alarm_template, 'vm', 'v3')))
+
+        template = self._host_vms_template()
+        self.assertEqual(
+            [[('alarm', 'a1'), ('cluster', 'c'), ('host', 'h1'),
+              ('switch', 's'), ('vm', 'v1')],
+             [('alarm', 'a3'), ('cluster', 'c'), ('host', 'h2'),
+              ('switch', 's'), ('vm', 'v3')]],
+            self._ids(self._match(template, 'switch', 's')))
+        self.assertEqual(
+            [[('alarm', 'a3'), ('cluster', 'c'), ('host', 'h2'),
+              ('switch', 's'), ('vm', 'v3')]],
+            self._ids(self._match(template, 'alarm', 'a3')))
+
+        two_vms_template = self._template(
+            [('cluster', RESOURCE, OPENSTACK_CLUSTER),
+             ('host', RESOURCE, NOVA_HOST_DATASOURCE),
+             ('switch', RESOURCE, SWITCH),
+             ('vm_a', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+             ('vm_b', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+             ('alarm', ALARM, ALARM_ON_VM)],
+            [('cluster', 'host', ELabel.CONTAINS, False),
+             ('host', 'switch', 'USES', False),
+             ('host', 'vm_a', ELabel.CONTAINS, False),
+             ('host', 'vm_b', ELabel.CONTAINS, False),
+             ('alarm', 'vm_a', ELabel.ON, False)])
+        self.assertEqual(
+            [[('alarm', 'a1'), ('cluster', 'c'), ('host', 'h1'),
+              ('switch', 's'), ('vm_a', 'v1'), ('vm_b', 'v2')]],
+            self._ids(self._match(two_vms_template, 'cluster', 'c')))
+
+    def test_template_matching_negative_edge(self):
+        template = self._host_vms_template(negative_alarm=True)
+
+        # only v2 has no alarm, and the negative alarm is not in the result
+        self.assertEqual(
+            [[('cluster', 'c'), ('host', 'h1'), ('switch', 's'),
+              ('vm', 'v2')]],
+            self._ids(self._match(template, 'cluster', 'c')))
+        self.assertEqual([], self._ids(self._match(template, 'vm', 'v1')))
+        self.assertEqual(
+            [[('cluster', 'c'), ('host', 'h1'), ('switch', 's'),
+              ('vm', 'v2')]],
+            self._ids(self._match(template, 'vm', 'v2')))
+
+    def test_template_matching_switched_plan(self):
+        template = self._host_vms_template(negative_alarm=True)
+        negative_edge = template.get_edge('alarm', 'vm', ELabel.ON)
+        plan = SubGraphPlan(template, ['vm'])
+        switched_edge, switched_plan = plan.switched(negative_edge)
+        graph_edge = self.graph.get_edge('a1', 'v1', ELabel.ON)
+
+        # An event on the negative edge is matched as if it was positive
+        mappings = self.graph.algo.sub_graph_matching(
+            template,
+            Mapping(switched_edge, graph_edge, is_vertex=False),
+            plan=switched_plan)
+
+        # the same as matching a template where the edge is positive
+        positive_template = self._host_vms_template()
+        self.assertEqual(
+            [[('alarm', 'a1'), ('cluster', 'c'), ('host', 'h1'),
+              ('switch', 's'), ('vm', 'v1')]],
+            self._ids(mappings))
+        self.assertEqual(
+            self._ids(mappings),
+            self._ids(self.graph.algo.sub_graph_matching(
+                positive_template,
+                Mapping(positive_template.get_edge('alarm', 'vm', ELabel.ON),
+                        graph_edge, is_vertex=False))))
+
+        # the template itself is not changed
+        self.assertTrue(negative_edge.get(NEG_CONDITION))
+        self.assertEqual(
+            negative_edge,
+            template.get_edge('alarm', 'vm', ELabel.ON))
+        self.assertEqual(
+            [[('cluster', 'c'), ('host', 'h1'), ('switch', 's'),
+              ('vm', 'v2')]],
+            self._ids(self._match(template, 'cluster', 'c',
+                                  plan=plan.matching_plan)))
+
+    def test_template_matching_plan_reuse(self):
+        template = self._host_vms_template()
+        plan = MatchingPlan(template)
+        neighbors = [list(n) for n in plan.neighbors]
+
+        for subgraph_id, graph_id in (('switch', 's'), ('host', 'h2'),
+                                      ('vm', 'v2'), ('switch', 's')):
+            self.assertEqual(
+                self._ids(self._match(template, subgraph_id, graph_id)),
+                self._ids(self._match(template, subgraph_id, graph_id,
+                                      plan=plan)))
+
+        self.graph.add_edge(graph_utils.create_edge('a3', 'v2', ELabel.ON))
+        self.assertEqual(
+            [[('alarm', 'a1'), ('cluster', 'c'), ('host', 'h1'),
+              ('switch', 's'), ('vm', 'v1')],
+             [('alarm', 'a3'), ('cluster', 'c'), ('host', 'h1'),
+              ('switch', 's'), ('vm', 'v2')]],
+            self._ids(self._match(template, 'host', 'h1', plan=plan)))
+        self.assertEqual(neighbors, [list(n) for n in plan.neighbors])
+
+    def test_template_matching_vertex_is_mapped_once(self):
+        template = self._template(
+            [('host', RESOURCE, NOVA_HOST_DATASOURCE),
+             ('vm_a', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+             ('vm_b', RESOURCE, NOVA_INSTANCE_DATASOURCE),
+             ('vm_c', RESOURCE, NOVA_INSTANCE_DATASOURCE)],
+            [('host', 'vm_a', ELabel.CONTAINS, False),
+             ('host', 'vm_b', ELabel.CONTAINS, False),
+             ('host', 'vm_c', ELabel.CONTAINS, False)])
+
+        # h1 contains only two vms
+        self.assertEqual([], self._ids(self._match(template, 'host', 'h1')))
+
+        self.graph.add_vertex(graph_utils.create_vertex(
+            'v4', vitrage_category=RESOURCE,
+            vitrage_type=NOVA_INSTANCE_DATASOURCE))
+        self.graph.add_edge(
+            graph_utils.create_edge('h1', 'v4', ELabel.CONTAINS))
+        mappings = self._ids(self._match(template, 'host', 'h1'))
+
+        # every permutation of the three vms, each mapped once
+        self.assertThat(mappings, matchers.HasLength(6))
+        for mapping in mappings:
+            self.assertEqual(['h1', 'v1', 'v2', 'v4'],
+                             sorted(graph_id for _, graph_id in mapping))
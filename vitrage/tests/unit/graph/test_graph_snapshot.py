@@ -0,0 +1,157 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime
+
+import msgpack
+
+from vitrage.common.constants import EdgeLabel as ELabel
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.common.exception import VitrageError
+from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import Vertex
+from vitrage.graph.driver import graph_snapshot
+from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.tests import base
+
+HOST_ID = u'host-\u05d0'
+
+
+def _vertex(v_id, v_type, **kwargs):
+    properties = {VProps.VITRAGE_TYPE: v_type,
+                  VProps.VITRAGE_IS_DELETED: False}
+    properties.update(kwargs)
+    return Vertex(v_id, properties)
+
+
+def _edge(source_id, target_id, label, **kwargs):
+    properties = {EProps.RELATIONSHIP_TYPE: label,
+                  EProps.VITRAGE_IS_DELETED: False}
+    properties.update(kwargs)
+    return Edge(source_id, target_id, label, properties)
+
+
+class TestGraphSnapshot(base.BaseTest):
+
+    def setUp(self):
+        super(TestGraphSnapshot, self).setUp()
+        self.graph = NXGraph('entity graph')
+        self.graph.add_vertex(_vertex('zone', 'nova.zone'))
+        self.graph.add_vertex(_vertex(HOST_ID, 'nova.host',
+                                      name=u'\u05d1', tags=['a', 'b'],
+                                      metadata={'rack': 3}))
+        self.graph.add_vertex(_vertex('vm', 'nova.instance',
+                                      created=datetime(2018, 1, 2, 3, 4, 5)))
+        self.graph.add_vertex(Vertex('empty'))
+        self.graph.add_edge(_edge('zone', HOST_ID, ELabel.CONTAINS))
+        self.graph.add_edge(_edge(HOST_ID, 'vm', ELabel.CONTAINS))
+        self.graph.add_edge(_edge(HOST_ID, 'vm', ELabel.ATTACHED))
+
+    @staticmethod
+    def _write(graph, metadata=None, changes=None):
+        return b''.join(graph_snapshot.write_snapshot(graph, metadata,
+                                                      changes))
+
+    def _load(self, data):
+        graph = NXGraph('loaded')
+        kind, metadata = graph_snapshot.read_snapshot(data, graph)
+        self.assertEqual(graph_snapshot.BASE, kind)
+        return graph, metadata
+
+    def test_base_snapshot(self):
+        data = self._write(self.graph, {'ids': {'a': 'b'}})
+
+        self.assertTrue(graph_snapshot.is_snapshot(data))
+        loaded, metadata = self._load(data)
+        self.assertEqual({'ids': {'a': 'b'}}, metadata)
+        self.assert_graph_equal(self.graph, loaded)
+        self.assertEqual(
+            [HOST_ID],
+            [v.vertex_id for v in loaded.get_vertices(
+                vertex_attr_filter={VProps.VITRAGE_TYPE: 'nova.host'})])
+
+    def test_many_rows(self):
+        for i in range(graph_snapshot.ROWS_PER_TABLE * 2 + 1):
+            self.graph.add_vertex(_vertex('vm%s' % i, 'nova.instance',
+                                          **{'prop%s' % (i % 7): i}))
+            self.graph.add_edge(_edge(HOST_ID, 'vm%s' % i, ELabel.CONTAINS))
+
+        loaded, _ = self._load(self._write(self.graph))
+
+        self.assert_graph_equal(self.graph, loaded)
+
+    def test_delta_snapshot(self):
+        base_data = self._write(self.graph)
+        changes = graph_snapshot.GraphChanges()
+        self.graph.subscribe(changes.add)
+
+        vm = self.graph.get_vertex('vm')
+        vm[VProps.STATE] = 'ERROR'
+        del vm.properties['created']
+        self.graph.remove_vertex(vm)
+        self.graph.add_vertex(vm)
+        self.graph.add_edge(_edge('zone', 'vm', ELabel.CONTAINS))
+        self.graph.update_vertex(Vertex('zone', {'name': 'z'}))
+        self.graph.remove_edge(_edge('zone', HOST_ID, ELabel.CONTAINS))
+        self.graph.add_vertex(_vertex('vm2', 'nova.instance'))
+        self.graph.add_edge(_edge(HOST_ID, 'vm2', ELabel.CONTAINS))
+        self.graph.remove_vertex(Vertex('empty'))
+        self.graph.add_vertex(_vertex('removed', 'nova.instance'))
+        self.graph.remove_vertex(Vertex('removed'))
+
+        delta = self._write(self.graph, {'delta': 1}, changes.pop())
+        self.assertEqual(0, len(changes))
+
+        loaded, _ = self._load(base_data)
+        kind, metadata = graph_snapshot.read_snapshot(delta, loaded)
+        self.assertEqual(graph_snapshot.DELTA, kind)
+        self.assertEqual({'delta': 1}, metadata)
+        self.assertEqual((kind, metadata),
+                         graph_snapshot.read_snapshot_header(delta))
+        self.assert_graph_equal(self.graph, loaded)
+        self.assertEqual(
+            ['vm', 'vm2'],
+            sorted(v.vertex_id for v in loaded.get_vertices(
+                vertex_attr_filter={VProps.VITRAGE_TYPE: 'nova.instance'})))
+
+    def test_changes_merge(self):
+        changes = graph_snapshot.GraphChanges()
+        self.graph.subscribe(changes.add)
+        self.graph.remove_vertex(Vertex('vm'))
+
+        popped = changes.pop()
+        self.graph.update_vertex(Vertex('zone', {'name': 'z'}))
+        changes.merge(popped)
+
+        self.assertEqual({'vm', 'zone'}, changes.vertices)
+        self.assertEqual({'vm'}, changes.removed_vertices)
+
+    def test_invalid_snapshots(self):
+        data = self._write(self.graph)
+        pickled = self.graph.write_gpickle()
+        graph = NXGraph()
+
+        self.assertFalse(graph_snapshot.is_snapshot(pickled))
+        self.assertRaises(VitrageError, graph_snapshot.read_snapshot,
+                          pickled, graph)
+        self.assertRaises(VitrageError, graph_snapshot.read_snapshot,
+                          data[:-10], graph)
+
+        newer = msgpack.packb([graph_snapshot.MAGIC,
+                               graph_snapshot.VERSION + 1,
+                               graph_snapshot.BASE, {}], use_bin_type=True)
+        self.assertRaises(VitrageError, graph_snapshot.read_snapshot,
+                          newer, graph)
+        self.assertEqual(0, graph.num_vertices())
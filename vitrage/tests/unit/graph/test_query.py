@@ -0,0 +1,82 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from vitrage.common.exception import VitrageError
+from vitrage.graph.query import create_predicate
+from vitrage.tests import base
+
+
+class TestQuery(base.BaseTest):
+
+    QUERY = {
+        'and': [
+            {'==': {'vitrage_category': 'ALARM'}},
+            {'or': [
+                {'>': {'time': 150}},
+                {'==': {'vitrage_is_deleted': True}}
+            ]}
+        ]
+    }
+
+    def test_predicate(self):
+        match = create_predicate(self.QUERY)
+
+        self.assertTrue(match({'vitrage_category': 'ALARM', 'time': 151}))
+        self.assertTrue(match({'vitrage_category': 'ALARM', 'time': 100,
+                               'vitrage_is_deleted': True}))
+        self.assertFalse(match({'vitrage_category': 'ALARM', 'time': 100,
+                                'vitrage_is_deleted': False}))
+        self.assertFalse(match({'vitrage_category': 'RESOURCE',
+                                'time': 151}))
+
+    def test_predicate_with_quotes(self):
+        match = create_predicate({'==': {'name': "it's') or ('1"}})
+
+        self.assertTrue(match({'name': "it's') or ('1"}))
+        self.assertFalse(match({'name': 'other'}))
+
+    def test_predicate_cache(self):
+        match = create_predicate(self.QUERY)
+        same_query = {
+            'and': [
+                {'==': {'vitrage_category': 'ALARM'}},
+                {'or': [
+                    {'>': {'time': 150}},
+                    {'==': {'vitrage_is_deleted': True}}
+                ]}
+            ]
+        }
+        self.assertIs(match, create_predicate(same_query))
+
+        # equal values of different types are different queries
+        self.assertIsNot(create_predicate({'==': {'value': 1}}),
+                         create_predicate({'==': {'value': True}}))
+
+    def test_index_terms(self):
+        match = create_predicate(self.QUERY)
+        self.assertEqual(('and', [('==', (('vitrage_category', 'ALARM'),))]),
+                         match.index_terms)
+
+        match = create_predicate({'or': [{'==': {'a': 1}},
+                                         {'==': {'b': 2}}]})
+        self.assertEqual(('or', [('==', (('a', 1),)), ('==', (('b', 2),))]),
+                         match.index_terms)
+
+        match = create_predicate({'or': [{'==': {'a': 1}},
+                                         {'!=': {'b': 2}}]})
+        self.assertIsNone(match.index_terms)
+
+    def test_invalid_query(self):
+        self.assertRaises(VitrageError, create_predicate, {'=': {'a': 1}})
+        self.assertRaises(VitrageError, create_predicate, {'and': {'a': 1}})
@@ -0,0 +1,236 @@
+# Copyright 2018 - Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import fixtures
+
+from vitrage.common.constants import EdgeLabel as ELabel
+from vitrage.common.constants import EdgeProperties as EProps
+from vitrage.common.constants import EntityCategory
+from vitrage.common.constants import VertexProperties as VProps
+from vitrage.graph.driver.elements import Edge
+from vitrage.graph.driver.elements import Vertex
+from vitrage.graph.driver.graph import Direction
+from vitrage.graph.driver.networkx_graph import NXGraph
+from vitrage.graph.driver.shared_graph import SharedGraph
+from vitrage.tests import base
+
+# a non ascii vertex id
+HOST_ID = u'host-\u05d0'
+
+
+def _vertex(v_id, category, v_type, **kwargs):
+    properties = {VProps.VITRAGE_CATEGORY: category,
+                  VProps.VITRAGE_TYPE: v_type,
+                  VProps.VITRAGE_IS_DELETED: False}
+    properties.update(kwargs)
+    return Vertex(v_id, properties)
+
+
+def _edge(source_id, target_id, label):
+    return Edge(source_id, target_id, label,
+                {EProps.RELATIONSHIP_TYPE: label,
+                 EProps.VITRAGE_IS_DELETED: False})
+
+
+class TestSharedGraph(base.BaseTest):
+
+    RESOURCES_QUERY = {'and': [
+        {'==': {VProps.VITRAGE_CATEGORY: EntityCategory.RESOURCE}},
+        {'==': {VProps.VITRAGE_IS_DELETED: False}}]}
+
+    def setUp(self):
+        super(TestSharedGraph, self).setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.graph = NXGraph('entity graph')
+        self.graph.add_vertex(_vertex('zone', EntityCategory.RESOURCE,
+                                      'nova.zone'))
+        self.graph.add_vertex(_vertex(HOST_ID, EntityCategory.RESOURCE,
+                                      'nova.host', tags=['unhashable']))
+        self.graph.add_vertex(_vertex('vm', EntityCategory.RESOURCE,
+                                      'nova.instance', project_id='p1'))
+        self.graph.add_vertex(_vertex('alarm', EntityCategory.ALARM,
+                                      'zabbix', project_id='p1'))
+        self.graph.add_edge(_edge('zone', HOST_ID, ELabel.CONTAINS))
+        self.graph.add_edge(_edge(HOST_ID, 'vm', ELabel.CONTAINS))
+        self.graph.add_edge(_edge('alarm', 'vm', ELabel.ON))
+        self.graph.add_edge(_edge('alarm', 'vm', ELabel.CAUSES))
+
+    def _shared_graph(self, name='graph'):
+        path = os.path.join(self.tmp_dir, name)
+        SharedGraph.write_snapshot(self.graph, path)
+        return SharedGraph(path)
+
+    def _assert_same_graph(self, shared_graph):
+        self.assert_graph_equal(self.graph, shared_graph.copy())
+        for v_id in ('zone', HOST_ID, 'vm', 'alarm', 'missing'):
+            self.assertEqual(self.graph.get_vertex(v_id),
+                             shared_graph.get_vertex(v_id))
+            for direction in (Direction.IN, Direction.OUT, Direction.BOTH):
+                self.assertEqual(
+                    set(self.graph.get_edges(v_id, direction=direction)),
+                    set(shared_graph.get_edges(v_id, direction=direction)))
+                self.assertEqual(
+                    sorted(v.vertex_id for v in self.graph.neighbors(
+                        v_id, direction=direction)),
+                    sorted(v.vertex_id for v in shared_graph.neighbors(
+                        v_id, direction=direction)))
+
+        for query in ({}, self.RESOURCES_QUERY,
+                      {'==': {VProps.PROJECT_ID: 'p1'}},
+                      {'==': {'tags': ['unhashable']}}):
+            self.assertEqual(
+                sorted(v.vertex_id for v in
+                       self.graph.get_vertices(query_dict=query)),
+                sorted(v.vertex_id for v in
+                       shared_graph.get_vertices(query_dict=query)))
+        self.assertEqual(
+            self.graph.get_vertices(
+                vertex_attr_filter={VProps.VITRAGE_TYPE: 'nova.host'}),
+            shared_graph.get_vertices(
+                vertex_attr_filter={VProps.VITRAGE_TYPE: 'nova.host'}))
+
+    def test_read_snapshot(self):
+        shared_graph = self._shared_graph()
+
+        self.assertEqual(4, shared_graph.num_vertices())
+        self.assertEqual(4, shared_graph.num_edges())
+        self.assertEqual(self.graph.get_edge('alarm', 'vm', ELabel.ON),
+                         shared_graph.get_edge('alarm', 'vm', ELabel.ON))
+        self.assertIsNone(shared_graph.get_edge('vm', 'alarm', ELabel.ON))
+        self._assert_same_graph(shared_graph)
+
+    def test_changes_on_top_of_snapshot(self):
+        shared_graph = self._shared_graph()
+
+        changes = [
+            (self.graph.add_vertex,
+             _vertex('vm', EntityCategory.RESOURCE, 'nova.instance',
+                     state='ERROR')),
+            (self.graph.add_vertex,
+             _vertex('vm2', EntityCategory.RESOURCE, 'nova.instance')),
+            (self.graph.add_edge,
+             _edge(HOST_ID, 'vm2', ELabel.CONTAINS)),
+            (self.graph.update_edge,
+             Edge('alarm', 'vm', ELabel.ON,
+                  {EProps.VITRAGE_IS_DELETED: True})),
+            (self.graph.remove_edge, _edge('alarm', 'vm', ELabel.CAUSES)),
+            (self.graph.remove_vertex, Vertex('zone')),
+            # a vertex that is implicitly added by an edge
+            (self.graph.add_edge, _edge('alarm', 'new', ELabel.ON)),
+        ]
+        for change, item in changes:
+            change(item)
+            getattr(shared_graph, change.__name__)(item)
+            self._assert_same_graph(shared_graph)
+
+        self.assertEqual(self.graph.num_vertices(),
+                         shared_graph.num_vertices())
+        self.assertEqual(self.graph.num_edges(), shared_graph.num_edges())
+
+        self.graph.remove_vertex(Vertex('vm'))
+        shared_graph.remove_vertex(Vertex('vm'))
+        self.graph.add_vertex(_vertex('vm', EntityCategory.ALARM, 'zabbix'))
+        shared_graph.add_vertex(_vertex('vm', EntityCategory.ALARM, 'zabbix'))
+        self._assert_same_graph(shared_graph)
+
+    def test_get_vertices_by_key(self):
+        self.graph.update_vertex(
+            Vertex('vm', {VProps.VITRAGE_CACHED_ID: 'k1'}))
+        shared_graph = self._shared_graph()
+        shared_graph.add_vertex(_vertex('vm2', EntityCategory.RESOURCE,
+                                        'nova.instance',
+                                        vitrage_cached_id='k2'))
+        self.graph.add_vertex(_vertex('vm2', EntityCategory.RESOURCE,
+                                      'nova.instance',
+                                      vitrage_cached_id='k2'))
+
+        for key in ('k1', 'k2', 'missing'):
+            self.assertEqual(self.graph.get_vertices_by_key(key),
+                             shared_graph.get_vertices_by_key(key))
+        self.assertEqual(['vm'], [v.vertex_id for v in
+                                  shared_graph.get_vertices_by_key('k1')])
+
+        shared_graph.update_vertex(
+            Vertex('vm', {VProps.VITRAGE_CACHED_ID: 'k3'}))
+        self.assertEqual([], shared_graph.get_vertices_by_key('k1'))
+        self.assertEqual(['vm'], [v.vertex_id for v in
+                                  shared_graph.get_vertices_by_key('k3')])
+
+    def test_union(self):
+        shared_graph = self._shared_graph()
+        other = NXGraph('other')
+        other.add_vertex(_vertex('vm', EntityCategory.RESOURCE,
+                                 'nova.instance', state='ERROR'))
+        other.add_vertex(_vertex('vm2', EntityCategory.RESOURCE,
+                                 'nova.instance'))
+        other.add_edge(_edge(HOST_ID, 'vm2', ELabel.CONTAINS))
+        other.add_edge(Edge('alarm', 'vm', ELabel.ON,
+                            {EProps.VITRAGE_IS_DELETED: True}))
+
+        shared_graph.union(other)
+        # the properties of the other graph are merged into the graph, also
+        # for HOST_ID and 'alarm', which other has only as edge endpoints
+        for v in other.get_vertices():
+            self.graph.add_vertex(v)
+        for v in other.get_vertices():
+            for e in other.get_edges(v.vertex_id, direction=Direction.OUT):
+                self.graph.add_edge(e)
+
+        self._assert_same_graph(shared_graph)
+        self.assertEqual(['unhashable'],
+                         shared_graph.get_vertex(HOST_ID).get('tags'))
+        self.assertEqual(('p1', 'ERROR'),
+                         (shared_graph.get_vertex('vm').get(VProps.PROJECT_ID),
+                          shared_graph.get_vertex('vm').get('state')))
+        self.assertEqual(self.graph.num_vertices(),
+                         shared_graph.num_vertices())
+        self.assertEqual(self.graph.num_edges(), shared_graph.num_edges())
+
+    def test_load_newer_snapshot(self):
+        shared_graph = self._shared_graph()
+        shared_graph.add_vertex(_vertex('vm2', EntityCategory.RESOURCE,
+                                        'nova.instance'))
+
+        self.graph.remove_vertex(Vertex('zone'))
+        newer = os.path.join(self.tmp_dir, 'newer')
+        SharedGraph.write_snapshot(self.graph, newer)
+        shared_graph.load(newer)
+
+        self.assertIsNone(shared_graph.get_vertex('vm2'))
+        self._assert_same_graph(shared_graph)
+
+    def test_algo(self):
+        shared_graph = self._shared_graph()
+        nx_algo = self.graph.algo
+        shared_algo = shared_graph.algo
+
+        self.assert_graph_equal(
+            nx_algo.graph_query_vertices('zone',
+                                         query_dict=self.RESOURCES_QUERY),
+            shared_algo.graph_query_vertices('zone',
+                                             query_dict=self.RESOURCES_QUERY))
+        self.assert_graph_equal(
+            nx_algo.create_graph_from_matching_vertices(
+                query_dict={'==': {VProps.PROJECT_ID: 'p1'}}),
+            shared_algo.create_graph_from_matching_vertices(
+                query_dict={'==': {VProps.PROJECT_ID: 'p1'}}))
+        self.assert_graph_equal(
+            nx_algo.subgraph(['zone', 'vm']),
+            shared_algo.subgraph(['zone', 'vm']))
+        self.assertEqual(
+            sorted(nx_algo.all_simple_paths('zone', 'vm')),
+            sorted(shared_algo.all_simple_paths('zone', 'vm')))
+        self.assertEqual([], list(shared_algo.all_simple_paths('vm', 'zone')))
@@ -13,14 +13,20 @@
 # under the License.
 
 import copy
-from oslo_config import cfg
+import os
 
+import fixtures
+from oslo_config import cfg
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api as snmp_api
 from pysnmp.proto.rfc1902 import Integer
 from pysnmp.proto.rfc1902 import ObjectIdentifier
 from pysnmp.proto.rfc1902 import ObjectName
 from pysnmp.proto.rfc1902 import OctetString
 from pysnmp.proto.rfc1902 import TimeTicks
 
+from vitrage.common.constants import EventProperties
+from vitrage import snmp_parsing
 from vitrage.snmp_parsing.service import SnmpParsingService
 from vitrage.tests import base
 
@@ -108,22 +114,46 @@ DICT_EXPECTED = {
 }
 
 
+MAPPING = '''
+- system_oid: 1.3.6.1.4.1.3902.4101.1.3.1.12
+  system: %s
+  event_type: %s
+'''
+
+
+def _encode_trap(var_binds):
+    p_mod = snmp_api.protoModules[snmp_api.protoVersion2c]
+    pdu = p_mod.TrapPDU()
+    p_mod.apiTrapPDU.setDefaults(pdu)
+    p_mod.apiTrapPDU.setVarBinds(pdu, var_binds)
+    msg = p_mod.Message()
+    p_mod.apiMessage.setDefaults(msg)
+    p_mod.apiMessage.setCommunity(msg, 'public')
+    p_mod.apiMessage.setPDU(msg, pdu)
+    return encoder.encode(msg)
+
+
+class _Notifier(object):
+
+    def __init__(self):
+        self.events = []
+
+    def info(self, ctxt, event_type, payload):
+        self.events.append((event_type, payload))
+
+
 class TestSnmpParsing(base.BaseTest):
-    OPTS = [
-        cfg.IntOpt('snmp_listening_port', default=8162,
-                   help='The listening port of snmp_parsing service'),
-        cfg.StrOpt('oid_mapping',
-                   default='vitrage/tests/resources/snmp_parsing/'
-                           'snmp_parsing_conf.yaml',
-                   help='The default path of oid_mapping yaml file'),
-    ]
 
     # noinspection PyPep8Naming
     @classmethod
     def setUpClass(cls):
         super(TestSnmpParsing, cls).setUpClass()
         cls.conf = cfg.ConfigOpts()
-        cls.conf.register_opts(cls.OPTS, group='snmp_parsing')
+        cls.conf.register_opts(snmp_parsing.OPTS, group='snmp_parsing')
+        cls.conf.set_override('oid_mapping',
+                              'vitrage/tests/resources/snmp_parsing/'
+                              'snmp_parsing_conf.yaml',
+                              group='snmp_parsing')
 
     def test_convert_binds_to_dict(self):
         parsing_service = SnmpParsingService(1, self.conf)
@@ -142,3 +172,44 @@ class TestSnmpParsing(base.BaseTest):
         parsing_service = SnmpParsingService(1, self.conf)
         event_type = parsing_service._get_event_type(converted_trap_diff_sys)
         self.assertIsNone(event_type)
+
+    def test_reload_modified_mapping(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            'oid_mapping.yaml')
+        with open(path, 'w') as f:
+            f.write(MAPPING % ('Tecs Director', 'first'))
+        conf = cfg.ConfigOpts()
+        conf.register_opts(snmp_parsing.OPTS, group='snmp_parsing')
+        conf.set_override('oid_mapping', path, group='snmp_parsing')
+        parsing_service = SnmpParsingService(1, conf)
+        parsing_service.oslo_notifier = _Notifier()
+        trap = _encode_trap(BINDS_REPORTED)
+
+        parsing_service._process_batch([trap, trap])
+
+        with open(path, 'w') as f:
+            f.write(MAPPING % ('Tecs Director', 'second'))
+        mtime = os.path.getmtime(path) + 10
+        os.utime(path, (mtime, mtime))
+        self.assertEqual('first',
+                         parsing_service._get_event_type(DICT_EXPECTED))
+
+        parsing_service._process_batch([trap])
+
+        self.assertEqual(['first', 'first', 'second'],
+                         [event_type for event_type, _ in
+                          parsing_service.oslo_notifier.events])
+        event = parsing_service.oslo_notifier.events[0][1]
+        self.assertEqual(DICT_EXPECTED, event[EventProperties.DETAILS])
+
+    def test_drop_traps_when_queue_is_full(self):
+        conf = cfg.ConfigOpts()
+        conf.register_opts(snmp_parsing.OPTS, group='snmp_parsing')
+        conf.set_override('traps_queue_size', 2, group='snmp_parsing')
+        parsing_service = SnmpParsingService(1, conf)
+
+        for i in range(5):
+            parsing_service.callback_func(None, None, None, b'trap')
+
+        self.assertEqual(2, parsing_service._traps.qsize())
+        self.assertEqual(3, parsing_service._dropped_traps)
@@ -14,14 +14,23 @@
 
 from __future__ import absolute_import
 
+import calendar
 from datetime import datetime
 from datetime import timedelta
 from dateutil import parser
 from oslo_utils import timeutils
+import re
 
 
 TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
 
+NS_PER_SECOND = 10 ** 9
+
+_ISO_8601_REGEX = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})'
+    r'(?:\.(\d{1,9})\d*)?'
+    r'(?:Z|([+-])(\d{2}):?(\d{2}))?$')
+
 
 def utcnow(with_timezone=True):
     """Better version of utcnow() that returns utcnow with a correct TZ."""
@@ -43,3 +52,41 @@ def change_to_utc_time_and_format(timestamp_str, new_format):
 def format_unix_timestamp(timestamp, date_format=TIMESTAMP_FORMAT):
     return datetime.fromtimestamp(float(timestamp)) \
         .strftime(date_format)
+
+
+def timestamp_ns(dt):
+    """Nanoseconds since the epoch of a datetime (naive datetimes are UTC)"""
+    offset = dt.utcoffset()
+    seconds = calendar.timegm(dt.timetuple())
+    if offset:
+        seconds -= int(offset.total_seconds())
+    return seconds * NS_PER_SECOND + dt.microsecond * 1000
+
+
+def utcnow_ns():
+    return timestamp_ns(utcnow())
+
+
+def parse_timestamp_ns(timestamp_str):
+    """Nanoseconds since the epoch of a timestamp string
+
+    The ISO-8601 timestamps used across vitrage, such as str(utcnow()) and
+    TIMESTAMP_FORMAT, are parsed with a regex. Any other format falls back to
+    dateutil. Timestamps without a timezone are considered UTC.
+    """
+    if isinstance(timestamp_str, datetime):
+        return timestamp_ns(timestamp_str)
+
+    match = _ISO_8601_REGEX.match(timestamp_str)
+    if not match:
+        return timestamp_ns(parser.parse(timestamp_str))
+
+    (year, month, day, hour, minute, second,
+     fraction, sign, offset_hours, offset_minutes) = match.groups()
+    seconds = calendar.timegm((int(year), int(month), int(day),
+                               int(hour), int(minute), int(second)))
+    if sign:
+        offset = int(offset_hours) * 3600 + int(offset_minutes) * 60
+        seconds = seconds - offset if sign == '+' else seconds + offset
+    nanoseconds = int(fraction.ljust(9, '0')) if fraction else 0
+    return seconds * NS_PER_SECOND + nanoseconds